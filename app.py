@@ -70,6 +70,11 @@ async def health_check(req: Request) -> Response:
     })
 
 
+async def stats_endpoint(req: Request) -> Response:
+    """Runtime statistics endpoint for monitoring"""
+    return web.json_response(bot.get_stats())
+
+
 def create_app() -> web.Application:
     """Create the aiohttp application"""
     app = web.Application()
@@ -78,6 +83,7 @@ def create_app() -> web.Application:
     app.router.add_post("/api/messages", handle_messages)
     app.router.add_get("/health", health_check)
     app.router.add_get("/", health_check)  # Root endpoint for Azure
+    app.router.add_get("/stats", stats_endpoint)
     
     # Add a test endpoint
     async def test_endpoint(req: Request) -> Response:
@@ -86,7 +92,8 @@ def create_app() -> web.Application:
             "status": "Bot is running",
             "endpoints": {
                 "messages": "/api/messages",
-                "health": "/health"
+                "health": "/health",
+                "stats": "/stats"
             },
             "configuration": {
                 "ANTHROPIC_API_KEY": "Set" if os.environ.get("ANTHROPIC_API_KEY") else "Not set",
@@ -105,10 +112,17 @@ def create_app() -> web.Application:
             
             # Create a minimal claude instance and get response
             from src.core import ClaudeCore
-            claude = ClaudeCore()
+            from src.core.client_factory import get_shared_client, get_shared_async_client
+            claude = ClaudeCore(
+                client=get_shared_client(),
+                async_client=get_shared_async_client(),
+                resilience=bot.resilience,
+                rate_limiter=bot.rate_limiter,
+                concurrency_limiter=bot.concurrency_limiter
+            )
             
-            # Get response from Claude
-            response_data = claude.chat(
+            # Get response from Claude without blocking the event loop
+            response_data = await claude.achat(
                 user_input=message,
                 use_code_execution=True,
                 file_attachments_info=[]
@@ -117,7 +131,8 @@ def create_app() -> web.Application:
             return web.json_response({
                 'response': response_data.get('assistant_message', 'No response'),
                 'tool_used': response_data.get('tool_used', False),
-                'generated_figures': response_data.get('generated_figures', [])
+                'generated_figures': response_data.get('generated_figures', []),
+                'rate_limit_wait': response_data.get('rate_limit_wait', 0.0)
             })
             
         except Exception as e:
@@ -150,6 +165,25 @@ def create_app() -> web.Application:
     
     app.middlewares.append(log_middleware)
     
+    # Shared pooled HTTP session for attachment downloads
+    from src.bot.http_session import start_http_session, close_http_session
+    app.on_startup.append(start_http_session)
+    
+    # Release the shared Anthropic connection pools on shutdown
+    from src.core.client_factory import close_shared_clients
+    
+    async def close_clients(app):
+        await close_shared_clients()
+    
+    app.on_cleanup.append(close_clients)
+    app.on_cleanup.append(close_http_session)
+    
+    # Write file index changes still pending from the debounce window
+    async def flush_file_index(app):
+        bot.file_index.flush()
+    
+    app.on_cleanup.append(flush_file_index)
+    
     return app
 
 
@@ -163,6 +197,7 @@ if __name__ == "__main__":
     logger.info(f"Starting bot server on port {PORT}")
     logger.info("Bot endpoint: /api/messages")
     logger.info("Health check: /health")
+    logger.info("Runtime stats: /stats")
     
     # Check required environment variables
     required_vars = ["ANTHROPIC_API_KEY"]
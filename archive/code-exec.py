@@ -8,7 +8,6 @@ import os
 import sys
 from anthropic import Anthropic
 from typing import Optional
-import json
 import readline
 import click
 try:
@@ -25,6 +24,10 @@ from rich.table import Table
 from rich.prompt import Prompt
 import sys
 
+# Share the streaming tool-input decoder with the Teams bot core
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.core.json_stream import IncrementalJSONStringExtractor
+
 class ClaudeWithCodeExecution:
     def __init__(self, api_key: Optional[str] = None, model: str = "claude-opus-4-20250514", theme: str = "monokai", console: Optional[Console] = None):
         """Initialize Claude client with code execution tool support."""
@@ -254,8 +257,9 @@ class ClaudeWithCodeExecution:
             
             # Process the streaming response
             assistant_message = ""
-            current_tool_input = ""
             in_code_block = False
+            code_decoder = None
+            query_decoder = None
             web_search_detected = False
             current_search_query = ""
             
@@ -271,11 +275,13 @@ class ClaudeWithCodeExecution:
                     if hasattr(event, 'content_block'):
                         if event.content_block.type == "server_tool_use" and event.content_block.name == "code_execution":
                             in_code_block = True
+                            code_decoder = IncrementalJSONStringExtractor("code")
                             self.console.print("\n[bold blue]📝 Executing Python code:[/bold blue]")
                             self.console.print("```python", end="", style="dim")
                         elif hasattr(event.content_block, 'name') and 'search' in event.content_block.name.lower():
                             # Track web search usage
                             web_search_detected = True
+                            query_decoder = IncrementalJSONStringExtractor("query")
                             self.console.print("\n[bold yellow]🔍 Web search detected[/bold yellow]")
                 elif event.type == "content_block_delta":
                     if hasattr(event, 'delta'):
@@ -284,56 +290,22 @@ class ClaudeWithCodeExecution:
                             self.console.print(event.delta.text, end="")
                             assistant_message += event.delta.text
                         elif hasattr(event.delta, 'partial_json'):
-                            # Tool use with partial JSON
+                            # Tool use with partial JSON; the shared decoder keeps
+                            # escape state between deltas
                             if in_code_block and event.delta.partial_json:
-                                try:
-                                    # For complete JSON
-                                    if event.delta.partial_json.startswith('{') and event.delta.partial_json.endswith('}'):
-                                        partial = json.loads(event.delta.partial_json)
-                                        if 'code' in partial:
-                                            code_chunk = partial['code'][len(current_tool_input):]
-                                            self.console.print(code_chunk, end="", style="cyan")
-                                            current_tool_input = partial['code']
-                                    else:
-                                        # For partial chunks, extract the new part
-                                        if '"code": "' in event.delta.partial_json:
-                                            # First chunk with code
-                                            start = event.delta.partial_json.find('"code": "') + 9
-                                            code_part = event.delta.partial_json[start:]
-                                            # Remove any trailing quote or brace
-                                            code_part = code_part.rstrip('"}')
-                                            # Decode escape sequences
-                                            code_part = code_part.encode('utf-8').decode('unicode_escape')
-                                            self.console.print(code_part, end="", style="cyan")
-                                            current_tool_input += code_part
-                                        elif event.delta.partial_json not in ['', '{"code": "', '"}']:
-                                            # Subsequent chunks
-                                            code_part = event.delta.partial_json.rstrip('"}')
-                                            # Decode escape sequences
-                                            code_part = code_part.encode('utf-8').decode('unicode_escape')
-                                            self.console.print(code_part, end="", style="cyan")
-                                            current_tool_input += code_part
-                                except Exception as e:
-                                    # Debug
-                                    # print(f"\nDEBUG: Error parsing: {e}", flush=True)
-                                    pass
+                                code_part = code_decoder.feed(event.delta.partial_json)
+                                if code_part:
+                                    self.console.print(code_part, end="", style="cyan", markup=False)
                             elif web_search_detected and event.delta.partial_json:
-                                # Try to extract search query from web search tool
-                                try:
-                                    if '"query"' in event.delta.partial_json:
-                                        # Extract query for tracking
-                                        import re
-                                        query_match = re.search(r'"query"\s*:\s*"([^"]+)"', event.delta.partial_json)
-                                        if query_match:
-                                            current_search_query = query_match.group(1)
-                                except:
-                                    pass
+                                # Extract query for tracking
+                                query_decoder.feed(event.delta.partial_json)
+                                if query_decoder.complete:
+                                    current_search_query = query_decoder.value
                 elif event.type == "content_block_stop":
                     if in_code_block:
                         self.console.print("\n```", style="dim")
                         in_code_block = False
-                        assistant_message += f"\n\n[Executed code:\n```python\n{current_tool_input}\n```]"
-                        current_tool_input = ""
+                        assistant_message += f"\n\n[Executed code:\n```python\n{code_decoder.value}\n```]"
                 elif event.type == "server_tool_result":
                     # Handle server tool results
                     if hasattr(event, 'result'):
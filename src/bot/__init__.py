@@ -1,4 +1,5 @@
 """Microsoft Teams bot implementation"""
 from .bot import CodeExecutionBot, create_app, adapter, bot
+from .mailbox import ConversationMailbox
 
-__all__ = ['CodeExecutionBot', 'create_app', 'adapter', 'bot']
\ No newline at end of file
+__all__ = ['CodeExecutionBot', 'create_app', 'adapter', 'bot', 'ConversationMailbox']
\ No newline at end of file
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Attachment Ingest Module
+Streams Teams attachment downloads into bounded spooled buffers: bytes stay in
+memory up to a per-file cap and spill to an anonymous temporary file beyond
+it, and the SHA-256 used by the file index is computed while downloading. A
+named local copy is only written, in a private directory, when a large table
+must be analysed locally. The attachments of one message are ingested
+concurrently.
+"""
+
+import os
+import time
+import asyncio
+import shutil
+import hashlib
+import logging
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+_LOCAL_COPY_PREFIX = 'attachment-'
+
+
+def _safe_name(name: str) -> str:
+    """Attachment name reduced to a bare file name."""
+    return os.path.basename((name or '').replace('\\', '/')) or 'attachment'
+
+
+def discard_local_copy(path: str) -> None:
+    """Remove a local copy written by SpooledAttachment.materialize() and its directory."""
+    directory = os.path.dirname(path)
+    if os.path.basename(directory).startswith(_LOCAL_COPY_PREFIX):
+        shutil.rmtree(directory, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class SpooledAttachment:
+    """A downloaded attachment held in a SpooledTemporaryFile"""
+
+    def __init__(self, name: str, max_memory: int):
+        self.name = _safe_name(name)
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the content exceeded the memory cap and moved to disk."""
+        return bool(getattr(self.file, '_rolled', False))
+
+    def materialize(self) -> str:
+        """Copy the content to a new private directory and return the file's path."""
+        directory = tempfile.mkdtemp(prefix=_LOCAL_COPY_PREFIX)
+        path = os.path.join(directory, self.name)
+        self.file.seek(0)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(self.file, f, CHUNK_SIZE)
+        return path
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class AttachmentIngest:
+    """Downloads a message's attachments concurrently into memory-capped spooled buffers"""
+
+    def __init__(self, max_memory: Optional[int] = None, max_parallel: Optional[int] = None):
+        """
+        Configure ingestion.
+
+        Args:
+            max_memory: Bytes of one attachment kept in memory before it spills
+                        to an anonymous temporary file; defaults to
+                        ATTACHMENT_SPOOL_MB (8) megabytes
+            max_parallel: Attachments of one message ingested at once; defaults
+                          to ATTACHMENT_CONCURRENCY or 4
+        """
+        self.max_memory = max_memory if max_memory is not None else int(float(os.getenv('ATTACHMENT_SPOOL_MB', '8')) * 1024 * 1024)
+        self.max_parallel = max_parallel or int(os.getenv('ATTACHMENT_CONCURRENCY', '4'))
+
+        # Statistics
+        self.batches = 0
+        self.failures = 0
+        self.total_batch_seconds = 0.0
+        self.files = 0
+        self.bytes = 0
+        self.spilled = 0
+        self.largest = 0
+        self.total_seconds = 0.0
+
+    async def spool(self, chunks: AsyncIterator[bytes], name: str) -> SpooledAttachment:
+        """
+        Consume an async byte stream (e.g. aiohttp's response.content.iter_chunked())
+        into a SpooledAttachment; the caller closes it.
+        """
+        started = time.monotonic()
+        attachment = SpooledAttachment(name, self.max_memory)
+        try:
+            async for chunk in chunks:
+                attachment.write(chunk)
+        except BaseException:
+            attachment.close()
+            raise
+        attachment.file.seek(0)
+
+        self.files += 1
+        self.bytes += attachment.size
+        self.spilled += attachment.spilled
+        self.largest = max(self.largest, attachment.size)
+        self.total_seconds += time.monotonic() - started
+        return attachment
+
+    async def ingest_all(self, items: Sequence[Any], worker: Callable[[Any], Awaitable[Any]],
+                         name_of: Callable[[Any], str] = lambda item: item.name) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """
+        Run worker over items concurrently, at most max_parallel at a time.
+
+        A worker exception fails only its own item.
+
+        Returns:
+            (results, timings) in the order of items: the worker's result or
+            None on failure, and {"file_name", "seconds", "error"} per item
+        """
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def ingest(item: Any) -> Tuple[Any, Dict[str, Any]]:
+            async with semaphore:
+                item_started = time.monotonic()
+                result, error = None, None
+                try:
+                    result = await worker(item)
+                except Exception as e:
+                    logger.error(f"Error processing attachment {name_of(item)}: {e}")
+                    error = str(e) or type(e).__name__
+                return result, {
+                    'file_name': name_of(item),
+                    'seconds': round(time.monotonic() - item_started, 2),
+                    'error': error
+                }
+
+        outcomes = await asyncio.gather(*(ingest(item) for item in items))
+        self.batches += 1
+        self.failures += sum(1 for _, timing in outcomes if timing['error'])
+        self.total_batch_seconds += time.monotonic() - started
+        return [result for result, _ in outcomes], [timing for _, timing in outcomes]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return download volume, spill and batch counters."""
+        return {
+            'max_memory_bytes': self.max_memory,
+            'max_parallel': self.max_parallel,
+            'batches': self.batches,
+            'failures': self.failures,
+            'avg_batch_seconds': round(self.total_batch_seconds / self.batches, 3) if self.batches else 0.0,
+            'files': self.files,
+            'bytes': self.bytes,
+            'spilled_to_disk': self.spilled,
+            'largest_bytes': self.largest,
+            'avg_download_seconds': round(self.total_seconds / self.files, 3) if self.files else 0.0
+        }
@@ -5,8 +5,8 @@ This module handles Teams events, file downloads, and orchestrates calls to clau
 """
 
 import os
+import asyncio
 import logging
-import aiohttp
 from typing import Dict, List, Any, Optional
 from botbuilder.core import (
     TurnContext, 
@@ -30,7 +30,25 @@ from botframework.connector.auth import MicrosoftAppCredentials
 
 # Import our core logic
 from ..core import ClaudeCore
+from ..core.client_factory import get_shared_client, get_shared_async_client, get_client_stats
+from ..core.prompt_cache import cache_hit_rate
+from ..core.compaction import ConversationCompactor
+from ..core.response_cache import ResponseCache
+from ..core.file_index import FileIndex
+from ..core.resilience import ResilienceLayer
+from ..core.rate_limit import RateLimiter
+from ..core.concurrency import AdaptiveConcurrencyLimiter
+from ..core.routing import ModelRouter, ROUTES
+from ..core.tool_prediction import ToolPredictor
+from ..core.fan_out import FanOutAnalyzer
+from ..core.map_reduce import MapReduceAnalyzer
+from ..core.progressive import ProgressiveAnalyzer
 from ..ui import TeamsFormatter
+from .commands import CommandRouter
+from .attachments import CHUNK_SIZE, AttachmentIngest, discard_local_copy
+from .http_session import get_http_session, get_http_stats, start_http_session, close_http_session
+from .mailbox import ConversationMailbox
+from .streaming import StreamingResponder, StreamingStats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -45,90 +63,320 @@ class CodeExecutionBot(ActivityHandler):
         self.conversation_state = conversation_state
         self.user_state = user_state
         
-        # Initialize Claude core
-        self.claude_core = ClaudeCore()
+        # Retries and circuit breaker shared by every conversation
+        self.resilience = ResilienceLayer()
+        
+        # Organization-wide requests/tokens per minute admission control
+        self.rate_limiter = RateLimiter()
+        
+        # In-flight stream limit tuned by 429s and time to first token
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter()
+        
+        # Sends trivial turns to a fast model, analysis to the large one
+        self.router = ModelRouter()
+        
+        # Sends the code execution tool only to turns likely to need it
+        self.tool_predictor = ToolPredictor()
+        
+        # One concurrent sub-request per file for "summarize each" turns
+        self.fan_out = FanOutAnalyzer()
+        
+        # Shards very large CSV/XLSX attachments and combines per-shard results
+        self.map_reduce = MapReduceAnalyzer()
+        
+        # Sample-first preliminary answers for large tables, replaced by the full analysis
+        self.progressive = ProgressiveAnalyzer(map_reduce=self.map_reduce)
+        self.app_id = os.environ.get("MicrosoftAppId", "")
+        self._background_tasks = set()
+        
+        # Initialize Claude core on the process-wide connection pool
+        self.claude_core = ClaudeCore(
+            client=get_shared_client(),
+            async_client=get_shared_async_client(),
+            resilience=self.resilience,
+            rate_limiter=self.rate_limiter,
+            concurrency_limiter=self.concurrency_limiter
+        )
         
         # Initialize Teams formatter
         self.formatter = TeamsFormatter()
         
         # Track conversation contexts
         self.conversation_contexts = {}
+        
+        # Serialize turns per conversation; different conversations run in parallel
+        self.mailbox = ConversationMailbox()
+        
+        # Progressive in-place updates while Claude is still streaming
+        self.streaming_enabled = os.environ.get("STREAMING_UPDATES", "true").lower() not in ("0", "false", "no")
+        self.streaming_update_interval = float(os.environ.get("STREAMING_UPDATE_INTERVAL", "1.0"))
+        self.streaming_stats = StreamingStats()
+        
+        # Summarizes long conversations in the background between turns
+        self.compactor = ConversationCompactor()
+        
+        # Answers to repeated /nocode questions, shared across conversations
+        self.response_cache = ResponseCache()
+        
+        # SHA-256 -> file_id index so re-attached files are not uploaded again
+        self.file_index = FileIndex()
+        
+        # Memory-capped spooling of attachment downloads
+        self.ingest = AttachmentIngest()
+        
+        # Slash commands served before attachments are ingested or Claude is called
+        self.commands = CommandRouter()
+        self._register_commands()
+    
+    def _register_commands(self) -> None:
+        """Register the built-in slash commands"""
+        self.commands.register('help', self._command_help, "Show this help message")
+        self.commands.register('reset', self._command_reset, "Clear conversation history", serialized=True)
+        self.commands.register('files', self._command_files, "List uploaded files")
+        self.commands.register('model', self._command_model,
+                               "Pin this chat to the fast or the analysis model, or route automatically",
+                               usage="/model quick|analysis|auto", serialized=True)
+        self.commands.register('status', self._command_status, "Show this conversation's state")
+        self.commands.register('cancel', self._command_cancel, "Stop the running request and drop queued messages")
+        self.commands.register('stats', self._command_stats, "Show bot performance statistics")
     
     async def on_message_activity(self, turn_context: TurnContext) -> None:
         """Handle incoming messages from Teams"""
+        conversation_id = turn_context.activity.conversation.id
+        
+        # Commands skip attachment ingestion and typing indicators; state-changing
+        # ones still wait for the conversation's earlier turns
+        parsed = self.commands.parse(turn_context.activity.text)
+        if parsed:
+            command, args = parsed
+            if command.serialized:
+                await self.mailbox.submit(
+                    conversation_id,
+                    lambda: self.commands.dispatch(command, turn_context, args)
+                )
+            else:
+                await self.commands.dispatch(command, turn_context, args)
+            return
+        
+        await self.mailbox.submit(
+            conversation_id,
+            lambda: self._handle_message(turn_context)
+        )
+    
+    def _get_context(self, conversation_id: str) -> Dict[str, Any]:
+        """Get or create the context (ClaudeCore and pending files) of a conversation"""
+        if conversation_id not in self.conversation_contexts:
+            self.conversation_contexts[conversation_id] = {
+                'claude_instance': ClaudeCore(
+                    response_cache=self.response_cache,
+                    client=self.claude_core.client,
+                    async_client=self.claude_core.async_client,
+                    resilience=self.resilience,
+                    rate_limiter=self.rate_limiter,
+                    concurrency_limiter=self.concurrency_limiter,
+                    router=self.router,
+                    tool_predictor=self.tool_predictor,
+                    file_index=self.file_index
+                ),
+                'pending_files': []
+            }
+        return self.conversation_contexts[conversation_id]
+    
+    async def _handle_message(self, turn_context: TurnContext) -> None:
+        """Process one message turn; runs serialized within its conversation"""
+        file_attachments = []
+        attachment_results = None
+        responder = None
         try:
             # Get conversation ID for context tracking
             conversation_id = turn_context.activity.conversation.id
             
             # Get or create conversation context
-            if conversation_id not in self.conversation_contexts:
-                self.conversation_contexts[conversation_id] = {
-                    'claude_instance': ClaudeCore(),
-                    'pending_files': []
-                }
-            
-            context = self.conversation_contexts[conversation_id]
+            context = self._get_context(conversation_id)
             claude = context['claude_instance']
             
             # Extract message text
             user_message = turn_context.activity.text or ""
             
             # Check for file attachments
-            file_attachments = []
             if hasattr(turn_context.activity, 'attachments') and turn_context.activity.attachments:
                 # Send typing indicator while processing files
                 await self._send_typing_indicator(turn_context)
                 
-                # Process attachments
-                for attachment in turn_context.activity.attachments:
-                    if attachment.content_type and not attachment.content_type.startswith('image/'):
-                        # Download and upload non-image files to Anthropic
-                        file_info = await self._process_attachment(turn_context, attachment, claude)
-                        if file_info:
-                            file_attachments.append(file_info)
+                # Download and upload non-image files concurrently, keeping message order;
+                # a lone large table is kept locally for map-reduce
+                documents = [
+                    attachment for attachment in turn_context.activity.attachments
+                    if attachment.content_type and not attachment.content_type.startswith('image/')
+                ]
+                ingested, attachment_results = await self.ingest.ingest_all(
+                    documents,
+                    lambda attachment: self._process_attachment(
+                        turn_context, attachment, claude, keep_large_table=len(documents) == 1
+                    )
+                )
+                file_attachments.extend(file_info for file_info in ingested if file_info)
             
             # Determine if code execution should be enabled
             use_code_execution = not user_message.lower().startswith('/nocode')
             if user_message.lower().startswith('/nocode'):
                 user_message = user_message[7:].strip()
             
-            # Handle special commands
-            if user_message.lower() == '/reset':
-                claude.reset_conversation()
-                await turn_context.send_activity(MessageFactory.text("✅ Conversation history cleared."))
-                return
+            # Send typing indicator while processing with Claude
+            await self._send_typing_indicator(turn_context)
             
-            elif user_message.lower() == '/files':
-                files = claude.list_files()
-                if files:
-                    card = self.formatter.create_files_list_card(files)
-                    await turn_context.send_activity(MessageFactory.attachment(card))
+            if self.streaming_enabled:
+                responder = StreamingResponder(
+                    turn_context,
+                    self.streaming_stats,
+                    min_update_interval=self.streaming_update_interval
+                )
+            
+            # Get response from Claude without blocking the event loop
+            progressive_file = None
+            if file_attachments and file_attachments[0].get('local_path'):
+                local_file = file_attachments[0]
+                if self.progressive.should_progress(local_file['local_path']):
+                    response_data = await self.progressive.preliminary(
+                        claude, user_message, local_file['local_path'], local_file['file_name'],
+                        on_progress=responder.on_progress if responder else None,
+                        use_code_execution=use_code_execution
+                    )
+                    progressive_file = local_file
                 else:
-                    await turn_context.send_activity(MessageFactory.text("📁 No files uploaded yet."))
-                return
+                    response_data = await self.map_reduce.run(
+                        claude, user_message, local_file['local_path'], local_file['file_name'],
+                        on_progress=responder.on_progress if responder else None,
+                        use_code_execution=use_code_execution
+                    )
+            elif self.fan_out.should_fan_out(user_message, file_attachments):
+                response_data = await self.fan_out.run(
+                    claude, user_message, use_code_execution, file_attachments,
+                    on_progress=responder.on_progress if responder else None
+                )
+            else:
+                response_data = await claude.achat(
+                    user_input=user_message,
+                    use_code_execution=use_code_execution,
+                    file_attachments_info=file_attachments,
+                    on_progress=responder.on_progress if responder else None
+                )
             
-            elif user_message.lower() == '/help':
-                help_card = self.formatter.create_help_card()
-                await turn_context.send_activity(MessageFactory.attachment(help_card))
-                return
+            if attachment_results:
+                response_data['attachment_results'] = attachment_results
             
-            # Send typing indicator while processing with Claude
-            await self._send_typing_indicator(turn_context)
+            # Format and send response, replacing the streamed placeholder if any
+            activity_id = await self._send_formatted_response(turn_context, response_data, user_message, responder)
             
-            # Get response from Claude
-            response_data = claude.chat(
-                user_input=user_message,
-                use_code_execution=use_code_execution,
-                file_attachments_info=file_attachments
-            )
+            # The full analysis replaces the preliminary card when it finishes; it owns the local copy now.
+            # A failed sample run has no "preliminary" and starts nothing
+            if progressive_file and response_data.get('preliminary'):
+                self._run_in_background(self._complete_progressive(
+                    turn_context, claude, user_message, progressive_file.pop('local_path'),
+                    progressive_file['file_name'], response_data, activity_id, use_code_execution
+                ))
             
-            # Format and send response
-            await self._send_formatted_response(turn_context, response_data, user_message)
+            # Fold older turns into a summary now that the user has their answer
+            self.compactor.schedule(claude)
             
+        except asyncio.CancelledError:
+            # /cancel: stop the placeholder updates; achat() already dropped the unanswered turn
+            logger.info(f"Turn cancelled in conversation {turn_context.activity.conversation.id}")
+            if responder is not None:
+                await responder.cancel()
+            raise
         except Exception as e:
             logger.error(f"Error in on_message_activity: {str(e)}")
             error_message = f"❌ An error occurred: {str(e)}"
             await turn_context.send_activity(MessageFactory.text(error_message))
+        finally:
+            # Local copies kept for map-reduce
+            for file_info in file_attachments:
+                if file_info.get('local_path'):
+                    discard_local_copy(file_info['local_path'])
+    
+    async def _command_help(self, turn_context: TurnContext, args: str) -> None:
+        """/help: list the registered commands"""
+        commands = [(command.usage, command.description) for command in self.commands.commands()]
+        commands.append(("/nocode <message>", "Send message without code execution"))
+        help_card = self.formatter.create_help_card(commands)
+        await turn_context.send_activity(MessageFactory.attachment(help_card))
+    
+    async def _command_reset(self, turn_context: TurnContext, args: str) -> None:
+        """/reset: clear the conversation history"""
+        context = self.conversation_contexts.get(turn_context.activity.conversation.id)
+        if context:
+            context['claude_instance'].reset_conversation()
+        await turn_context.send_activity(MessageFactory.text("✅ Conversation history cleared."))
+    
+    async def _command_files(self, turn_context: TurnContext, args: str) -> None:
+        """/files: list the conversation's uploaded files"""
+        context = self.conversation_contexts.get(turn_context.activity.conversation.id)
+        files = context['claude_instance'].list_files() if context else []
+        if files:
+            card = self.formatter.create_files_list_card(files)
+            await turn_context.send_activity(MessageFactory.attachment(card))
+        else:
+            await turn_context.send_activity(MessageFactory.text("📁 No files uploaded yet."))
+    
+    async def _command_model(self, turn_context: TurnContext, args: str) -> None:
+        """/model: pin or unpin the conversation's model route"""
+        choice = args.lower()
+        if choice in ROUTES or choice == 'auto':
+            claude = self._get_context(turn_context.activity.conversation.id)['claude_instance']
+            claude.set_route_override(None if choice == 'auto' else choice)
+            await turn_context.send_activity(MessageFactory.text(f"✅ Model routing set to: {choice}"))
+        else:
+            await turn_context.send_activity(MessageFactory.text("Usage: /model quick|analysis|auto"))
+    
+    async def _command_status(self, turn_context: TurnContext, args: str) -> None:
+        """/status: summarize the conversation's state"""
+        conversation_id = turn_context.activity.conversation.id
+        context = self.conversation_contexts.get(conversation_id)
+        depth = self.mailbox.queue_depth(conversation_id)
+        lines = [f"**Requests in progress or queued:** {depth}"]
+        if context:
+            claude = context['claude_instance']
+            usage = claude.usage_totals
+            lines += [
+                f"**Messages in history:** {len(claude.conversation_history)}",
+                f"**Uploaded files:** {len(claude.uploaded_files)}",
+                f"**Model routing:** {claude.route_override or 'auto'}",
+                f"**Tokens used:** {usage.get('input_tokens', 0):,} in / {usage.get('output_tokens', 0):,} out"
+            ]
+        else:
+            lines.append("No messages yet in this conversation.")
+        await turn_context.send_activity(MessageFactory.text("\n\n".join(lines)))
+    
+    async def _command_cancel(self, turn_context: TurnContext, args: str) -> None:
+        """/cancel: stop the conversation's running request and drop queued ones"""
+        cancelled = self.mailbox.cancel(turn_context.activity.conversation.id)
+        if not cancelled['running'] and not cancelled['queued']:
+            text = "Nothing to cancel."
+        else:
+            parts = []
+            if cancelled['running']:
+                parts.append("the running request")
+            if cancelled['queued']:
+                parts.append(f"{cancelled['queued']} queued message(s)")
+            text = f"🛑 Cancelled {' and '.join(parts)}."
+        await turn_context.send_activity(MessageFactory.text(text))
+    
+    async def _command_stats(self, turn_context: TurnContext, args: str) -> None:
+        """/stats: headline performance figures (the full set is served at /stats)"""
+        stats = self.get_stats()
+        mailbox = stats['mailbox']
+        streaming = stats['streaming']['time_to_first_visible_token']
+        lines = [
+            f"**Conversations:** {stats['conversations']} ({mailbox['active_conversations']} active, "
+            f"{mailbox['queued_turns']} queued turns)",
+            f"**Avg queue wait:** {mailbox['avg_wait_seconds']}s",
+            f"**Time to first token (p50/p95):** {streaming['p50_seconds']}s / {streaming['p95_seconds']}s",
+            f"**Response cache hit rate:** {stats['response_cache']['hit_rate']:.0%}",
+            f"**File index hit rate:** {stats['file_index']['hit_rate']:.0%}",
+            f"**Prompt cache hit rate:** {stats['usage']['cache_hit_rate']:.0%}"
+        ]
+        await turn_context.send_activity(MessageFactory.text("\n\n".join(lines)))
     
     async def _send_typing_indicator(self, turn_context: TurnContext) -> None:
         """Send typing indicator to show bot is processing"""
@@ -137,87 +385,190 @@ class CodeExecutionBot(ActivityHandler):
         await turn_context.send_activity(typing_activity)
     
     async def _process_attachment(self, turn_context: TurnContext, attachment: Attachment, 
-                                  claude: ClaudeCore) -> Optional[Dict[str, str]]:
-        """Download attachment from Teams and upload to Anthropic"""
-        try:
-            # Get the attachment data
-            connector = turn_context.adapter.create_connector_client(
-                turn_context.activity.service_url
+                                  claude: ClaudeCore, keep_large_table: bool = False) -> Dict[str, str]:
+        """
+        Download attachment from Teams and upload to Anthropic; raises on failure.
+        
+        The download is spooled in memory up to ATTACHMENT_SPOOL_MB and uploaded
+        from the buffer. With keep_large_table, a table big enough for a
+        progressive or map-reduce answer is not uploaded; a private local copy
+        is returned as 'local_path' instead.
+        """
+        # Stream the download through the shared session into a memory-capped spooled buffer
+        async with get_http_session().get(attachment.content_url) as response:
+            if response.status != 200:
+                raise RuntimeError(f"download failed (HTTP {response.status})")
+            spooled = await self.ingest.spool(
+                response.content.iter_chunked(CHUNK_SIZE), attachment.name
             )
+        
+        try:
+            if keep_large_table and (self.progressive.should_progress(spooled.name, spooled.size) or
+                                     self.map_reduce.should_map_reduce(spooled.name, spooled.size)):
+                return {
+                    'file_name': attachment.name,
+                    'local_path': await asyncio.to_thread(spooled.materialize)
+                }
             
-            # Download attachment
-            attachment_data = await connector.attachments.get_attachment_info(
-                attachment.name
+            # Upload to Anthropic straight from the buffer
+            file_id = await asyncio.to_thread(
+                claude.upload_fileobj, spooled.file, attachment.name, spooled.sha256
             )
+        finally:
+            spooled.close()
+        
+        if not file_id:
+            raise RuntimeError("upload failed")
+        return {
+            'file_id': file_id,
+            'file_name': attachment.name
+        }
+    
+    async def _send_formatted_response(self, turn_context: TurnContext, 
+                                       response_data: Dict[str, Any], 
+                                       user_query: str,
+                                       responder: Optional[StreamingResponder] = None) -> Optional[str]:
+        """Send formatted response based on the type of output; returns the sent activity's id"""
+        activity = self._build_response_activity(turn_context, response_data, user_query)
+        
+        if responder:
+            activity_id = await responder.finish(activity)
+        else:
+            response = await turn_context.send_activity(activity)
+            activity_id = getattr(response, 'id', None)
+        
+        # If there are generated figures, we might need to handle them separately
+        # depending on Teams' capabilities
+        if response_data.get('generated_figures'):
+            for figure in response_data['generated_figures']:
+                # In a real implementation, you'd upload these to a accessible location
+                # and include URLs in the card
+                logger.info(f"Generated figure: {figure['figure_name']}")
+        
+        return activity_id
+    
+    def _run_in_background(self, coroutine) -> None:
+        """Run a task after the turn returns, keeping a reference until it finishes"""
+        task = asyncio.ensure_future(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _complete_progressive(self, turn_context: TurnContext, claude: ClaudeCore,
+                                    user_query: str, file_path: str, file_name: str,
+                                    preliminary: Dict[str, Any], activity_id: Optional[str],
+                                    use_code_execution: bool = True) -> None:
+        """Run the full analysis of a progressive turn and replace its preliminary card"""
+        try:
+            try:
+                response_data = await self.progressive.complete(
+                    claude, user_query, file_path, file_name, use_code_execution=use_code_execution
+                )
+                
+                # Record it in the conversation's turn order, never inside a running turn
+                async def apply() -> None:
+                    self.progressive.apply(claude, user_query, file_name, preliminary, response_data)
+                
+                await self.mailbox.submit(turn_context.activity.conversation.id, apply)
+            except Exception as e:
+                logger.error(f"Full analysis of {file_name} failed: {e}")
+                response_data = preliminary
+                response_data['preliminary'] = dict(preliminary['preliminary'], failed=True)
+            response_data['attachment_results'] = preliminary.get('attachment_results')
+            activity = self._build_response_activity(turn_context, response_data, user_query)
             
-            # Download file content
-            async with aiohttp.ClientSession() as session:
-                async with session.get(attachment.content_url) as response:
-                    if response.status == 200:
-                        file_content = await response.read()
-                        
-                        # Save temporarily
-                        temp_path = f"/tmp/{attachment.name}"
-                        with open(temp_path, 'wb') as f:
-                            f.write(file_content)
-                        
-                        # Upload to Anthropic
-                        file_id = claude.upload_file(temp_path)
-                        
-                        # Clean up temp file
-                        os.remove(temp_path)
-                        
-                        if file_id:
-                            return {
-                                'file_id': file_id,
-                                'file_name': attachment.name
-                            }
+            reference = TurnContext.get_conversation_reference(turn_context.activity)
             
-            return None
+            async def deliver(context: TurnContext) -> None:
+                if activity_id:
+                    activity.id = activity_id
+                    try:
+                        await context.update_activity(activity)
+                        return
+                    except Exception as e:
+                        logger.warning(f"Could not replace preliminary card, sending a new one: {e}")
+                        activity.id = None
+                await context.send_activity(activity)
             
+            await turn_context.adapter.continue_conversation(reference, deliver, self.app_id)
         except Exception as e:
-            logger.error(f"Error processing attachment: {str(e)}")
-            return None
+            logger.error(f"Could not deliver the full analysis of {file_name}: {e}")
+        finally:
+            discard_local_copy(file_path)
     
-    async def _send_formatted_response(self, turn_context: TurnContext, 
-                                       response_data: Dict[str, Any], 
-                                       user_query: str) -> None:
-        """Send formatted response based on the type of output"""
+    def _build_response_activity(self, turn_context: TurnContext,
+                                 response_data: Dict[str, Any],
+                                 user_query: str) -> Activity:
+        """Build the final reply activity: plain text or a detailed report card"""
+        
+        # Upstream outage: fail with a friendly card instead of a raw error
+        if response_data.get('unavailable'):
+            return MessageFactory.attachment(
+                self.formatter.create_service_unavailable_card(response_data['assistant_message'])
+            )
         
         # Check if this is a simple text response
         if (not response_data.get('tool_used') and 
             not response_data.get('web_searches') and 
-            not response_data.get('generated_figures')):
+            not response_data.get('generated_figures') and
+            not response_data.get('file_results') and
+            not response_data.get('attachment_results') and
+            not response_data.get('preliminary')):
+            if response_data.get('cached'):
+                # Let users know this answer was reused rather than freshly generated
+                return MessageFactory.attachment(self.formatter.create_simple_text_card(
+                    response_data['assistant_message'],
+                    footnote="⚡ Cached answer - send /reset or rephrase for a fresh response"
+                ))
             # Simple text response
-            await turn_context.send_activity(
-                MessageFactory.text(response_data['assistant_message'])
-            )
-        else:
-            # Create job details for report
-            job_details = {
-                'description': user_query[:100] + "..." if len(user_query) > 100 else user_query,
-                'client': turn_context.activity.from_property.name or "Teams User",
-                'job_reference': f"TEAMS-{turn_context.activity.id[:8]}",
-                'project': "Code Execution Assistant",
-                'by': "Claude AI Assistant"
-            }
-            
-            # Create detailed report card
-            report_card = self.formatter.create_detailed_report_card(
-                response_data, 
-                job_details
-            )
-            
-            # Send the card
-            await turn_context.send_activity(MessageFactory.attachment(report_card))
-            
-            # If there are generated figures, we might need to handle them separately
-            # depending on Teams' capabilities
-            if response_data.get('generated_figures'):
-                for figure in response_data['generated_figures']:
-                    # In a real implementation, you'd upload these to a accessible location
-                    # and include URLs in the card
-                    logger.info(f"Generated figure: {figure['figure_name']}")
+            return MessageFactory.text(response_data['assistant_message'])
+        
+        # Create job details for report
+        job_details = {
+            'description': user_query[:100] + "..." if len(user_query) > 100 else user_query,
+            'client': turn_context.activity.from_property.name or "Teams User",
+            'job_reference': f"TEAMS-{turn_context.activity.id[:8]}",
+            'project': "Code Execution Assistant",
+            'by': "Claude AI Assistant"
+        }
+        
+        # Create detailed report card
+        report_card = self.formatter.create_detailed_report_card(
+            response_data, 
+            job_details
+        )
+        
+        return MessageFactory.attachment(report_card)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return runtime statistics for monitoring"""
+        usage = {}
+        for context in self.conversation_contexts.values():
+            for field, value in context['claude_instance'].get_usage_stats().items():
+                if field != 'cache_hit_rate':
+                    usage[field] = usage.get(field, 0) + value
+        usage['cache_hit_rate'] = cache_hit_rate(usage)
+        
+        return {
+            'conversations': len(self.conversation_contexts),
+            'usage': usage,
+            'mailbox': self.mailbox.get_stats(),
+            'streaming': self.streaming_stats.get_stats(),
+            'compaction': self.compactor.get_stats(),
+            'response_cache': self.response_cache.get_stats(),
+            'file_index': self.file_index.get_stats(),
+            'ingest': self.ingest.get_stats(),
+            'commands': self.commands.get_stats(),
+            'http_clients': get_client_stats(),
+            'http_session': get_http_stats(),
+            'resilience': self.resilience.get_stats(),
+            'rate_limit': self.rate_limiter.get_stats(),
+            'concurrency': self.concurrency_limiter.get_stats(),
+            'routing': self.router.get_stats(),
+            'tool_prediction': self.tool_predictor.get_stats(),
+            'fan_out': self.fan_out.get_stats(),
+            'map_reduce': self.map_reduce.get_stats(),
+            'progressive': self.progressive.get_stats()
+        }
     
     async def on_members_added_activity(self, members_added: List[ChannelAccount], 
                                         turn_context: TurnContext) -> None:
@@ -342,6 +693,13 @@ if __name__ == "__main__":
     # Create the application
     app = web.Application()
     app.router.add_post("/api/messages", handle_messages)
+    app.on_startup.append(start_http_session)
+    app.on_cleanup.append(close_http_session)
+    
+    async def flush_file_index(app):
+        bot.file_index.flush()
+    
+    app.on_cleanup.append(flush_file_index)
     
     # Start the server
     try:
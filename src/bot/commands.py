@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Command Router Module
+Recognises slash commands before any attachment is downloaded or Claude is
+called, and serves them from a registry of handlers with per-command latency
+statistics. Unregistered slash-prefixed text (e.g. /nocode) is left to the
+normal message path.
+"""
+
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# handler(turn_context, args) where args is the text after the command name
+CommandHandler = Callable[[Any, str], Awaitable[None]]
+
+
+class Command:
+    """A registered slash command and its latency statistics"""
+
+    __slots__ = ('name', 'handler', 'description', 'usage', 'serialized', 'calls', 'errors',
+                 'total_seconds', 'samples')
+
+    def __init__(self, name: str, handler: CommandHandler, description: str, usage: Optional[str],
+                 serialized: bool, max_samples: int):
+        self.name = name
+        self.handler = handler
+        self.description = description
+        self.usage = usage or f"/{name}"
+        self.serialized = serialized
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return call counts and latency percentiles."""
+        samples = sorted(self.samples)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not samples:
+                return None
+            index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+            return round(samples[index] * 1000, 2)
+
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'avg_ms': round(self.total_seconds / self.calls * 1000, 2) if self.calls else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95)
+        }
+
+
+class CommandRouter:
+    """Registry and dispatcher for slash commands"""
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Initialize an empty registry.
+
+        Args:
+            max_samples: Recent latency samples kept per command
+        """
+        self.max_samples = max_samples
+        self._commands: Dict[str, Command] = {}
+
+    def register(self, name: str, handler: CommandHandler, description: str = "",
+                 usage: Optional[str] = None, serialized: bool = False) -> Command:
+        """
+        Register a command.
+
+        Args:
+            name: Command name without the slash; matched case-insensitively
+            handler: Coroutine function called with (turn_context, args)
+            description: One line shown by /help
+            usage: Usage shown by /help; defaults to "/name"
+            serialized: Run in the conversation's turn order (for commands that
+                        change conversation state) instead of immediately
+        """
+        command = Command(name.lower(), handler, description, usage, serialized, self.max_samples)
+        self._commands[command.name] = command
+        return command
+
+    def parse(self, text: Optional[str]) -> Optional[Tuple[Command, str]]:
+        """Return (command, args) if text invokes a registered command, else None."""
+        text = (text or "").strip()
+        if not text.startswith('/'):
+            return None
+        name, _, args = text[1:].partition(' ')
+        command = self._commands.get(name.lower())
+        if command is None:
+            return None
+        return command, args.strip()
+
+    async def dispatch(self, command: Command, turn_context: Any, args: str = "") -> None:
+        """Run a command's handler, recording its latency; handler errors are re-raised."""
+        started = time.monotonic()
+        try:
+            await command.handler(turn_context, args)
+        except Exception:
+            command.errors += 1
+            raise
+        finally:
+            seconds = time.monotonic() - started
+            command.calls += 1
+            command.total_seconds += seconds
+            command.samples.append(seconds)
+        logger.info(f"Served /{command.name} in {seconds * 1000:.1f}ms")
+
+    def commands(self) -> List[Command]:
+        """Registered commands in registration order."""
+        return list(self._commands.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-command call counts and latency."""
+        return {name: command.get_stats() for name, command in self._commands.items()}
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Session
+One application-scoped aiohttp ClientSession for the bot's outbound HTTP
+(Teams attachment downloads), so requests reuse pooled keep-alive connections
+and cached DNS lookups instead of paying for a resolver round trip and TLS
+handshake per file. Created on application startup and closed on cleanup.
+"""
+
+import os
+import asyncio
+import logging
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_session: Optional[aiohttp.ClientSession] = None
+_stats = {
+    'sessions_created': 0,
+    'requests': 0,
+    'request_errors': 0,
+    'in_flight': 0,
+    'connections_created': 0,
+    'connections_reused': 0,
+    'dns_cache_hits': 0,
+    'dns_cache_misses': 0
+}
+
+
+def session_settings() -> Dict[str, Any]:
+    """Connection pool and timeout settings, overridable through environment variables."""
+    return {
+        'limit': int(os.getenv('HTTP_POOL_LIMIT', '100')),
+        'limit_per_host': int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '10')),
+        'keepalive_timeout': float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30')),
+        'dns_cache_ttl': int(os.getenv('HTTP_DNS_CACHE_TTL', '300')),
+        'total_timeout': float(os.getenv('HTTP_TOTAL_TIMEOUT', '300')),
+        'connect_timeout': float(os.getenv('HTTP_CONNECT_TIMEOUT', '10')),
+        'read_timeout': float(os.getenv('HTTP_READ_TIMEOUT', '60'))
+    }
+
+
+def _counter(name: str, delta: int = 1):
+    """Trace callback adding delta to a stats counter."""
+    async def callback(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+        _stats[name] += delta
+    return callback
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """Trace hooks feeding the pool usage counters."""
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_counter('requests'))
+    trace.on_request_start.append(_counter('in_flight'))
+    trace.on_request_end.append(_counter('in_flight', -1))
+    trace.on_request_exception.append(_counter('in_flight', -1))
+    trace.on_request_exception.append(_counter('request_errors'))
+    trace.on_connection_create_end.append(_counter('connections_created'))
+    trace.on_connection_reuseconn.append(_counter('connections_reused'))
+    trace.on_dns_cache_hit.append(_counter('dns_cache_hits'))
+    trace.on_dns_cache_miss.append(_counter('dns_cache_misses'))
+    return trace
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Return the shared session, creating it if startup did not.
+
+    Must be called from the event loop the session is used on (the single
+    aiohttp loop in the bot process).
+    """
+    global _session
+    if _session is None or _session.closed:
+        settings = session_settings()
+        connector = aiohttp.TCPConnector(
+            limit=settings['limit'],
+            limit_per_host=settings['limit_per_host'],
+            keepalive_timeout=settings['keepalive_timeout'],
+            ttl_dns_cache=settings['dns_cache_ttl'],
+            use_dns_cache=True
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=settings['total_timeout'],
+                connect=settings['connect_timeout'],
+                sock_read=settings['read_timeout']
+            ),
+            trace_configs=[_trace_config()]
+        )
+        _stats['sessions_created'] += 1
+        logger.info(f"Created shared HTTP session ({settings})")
+    return _session
+
+
+async def start_http_session(app: Any = None) -> None:
+    """aiohttp on_startup hook creating the shared session."""
+    get_http_session()
+
+
+async def close_http_session(app: Any = None) -> None:
+    """aiohttp on_cleanup hook closing the shared session and its connections."""
+    global _session
+    session, _session = _session, None
+    if session is not None and not session.closed:
+        await session.close()
+        # Give SSL transports a moment to shut down cleanly
+        await asyncio.sleep(0)
+
+
+def get_http_stats() -> Dict[str, Any]:
+    """Return request, connection reuse and DNS cache counters and pool settings."""
+    stats = dict(_stats)
+    opened = stats['connections_created'] + stats['connections_reused']
+    stats['connection_reuse_rate'] = round(stats['connections_reused'] / opened, 4) if opened else 0.0
+    stats['open'] = _session is not None and not _session.closed
+    stats['pool'] = session_settings()
+    return stats
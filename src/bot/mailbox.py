@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Conversation Mailbox Module
+Serializes turns within a Teams conversation while letting different
+conversations run in parallel on the same event loop.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ConversationMailbox:
+    """Per-conversation actor mailbox for bot turns"""
+
+    def __init__(self, slow_wait_seconds: float = 5.0):
+        """
+        Initialize an empty mailbox.
+
+        Args:
+            slow_wait_seconds: Queue wait above which a head-of-line warning is logged
+        """
+        self.slow_wait_seconds = slow_wait_seconds
+
+        # conversation_id -> pending (handler, future, enqueued_at) entries
+        self._mailboxes: Dict[str, Deque[Tuple[Callable[[], Awaitable[Any]], asyncio.Future, float]]] = {}
+        # conversation_id -> worker task draining that mailbox
+        self._workers: Dict[str, asyncio.Task] = {}
+        # conversation_ids whose handler is executing right now
+        self._running = set()
+        # conversation_id -> task running the current handler
+        self._current: Dict[str, asyncio.Task] = {}
+
+        # Aggregate statistics
+        self.turns_submitted = 0
+        self.turns_completed = 0
+        self.turns_failed = 0
+        self.turns_cancelled = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.last_wait_seconds = 0.0
+        self.max_queue_depth = 0
+
+    async def submit(self, conversation_id: str, handler: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run handler after every earlier turn of the same conversation has finished.
+
+        Args:
+            conversation_id: Key that turns are serialized on
+            handler: Zero-argument coroutine function performing the turn
+
+        Returns:
+            Whatever the handler returns, or None if the turn was cancelled;
+            exceptions from the handler are re-raised
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        mailbox = self._mailboxes.setdefault(conversation_id, deque())
+        mailbox.append((handler, future, time.monotonic()))
+        self.turns_submitted += 1
+
+        depth = self.queue_depth(conversation_id)
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+        if conversation_id not in self._workers:
+            self._workers[conversation_id] = loop.create_task(self._drain(conversation_id))
+
+        return await future
+
+    async def _drain(self, conversation_id: str) -> None:
+        """Process queued turns for one conversation strictly in arrival order."""
+        mailbox = self._mailboxes[conversation_id]
+        try:
+            while mailbox:
+                handler, future, enqueued_at = mailbox.popleft()
+                if future.cancelled():
+                    continue
+
+                wait = time.monotonic() - enqueued_at
+                self._record_wait(conversation_id, wait)
+
+                self._running.add(conversation_id)
+                # The handler runs as its own task so cancel() can stop it
+                task = asyncio.ensure_future(handler())
+                self._current[conversation_id] = task
+                try:
+                    await asyncio.wait({task})
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                finally:
+                    self._running.discard(conversation_id)
+                    self._current.pop(conversation_id, None)
+
+                if task.cancelled():
+                    self.turns_cancelled += 1
+                    if not future.done():
+                        future.set_result(None)
+                elif task.exception() is not None:
+                    self.turns_failed += 1
+                    if not future.cancelled():
+                        future.set_exception(task.exception())
+                else:
+                    self.turns_completed += 1
+                    if not future.cancelled():
+                        future.set_result(task.result())
+        finally:
+            # No await between the empty check and cleanup, so a concurrent
+            # submit either lands in this mailbox or starts a fresh worker.
+            self._workers.pop(conversation_id, None)
+            if not mailbox:
+                self._mailboxes.pop(conversation_id, None)
+
+    def _record_wait(self, conversation_id: str, wait: float) -> None:
+        """Update wait-time statistics for a turn that is about to start."""
+        self.last_wait_seconds = wait
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        if wait >= self.slow_wait_seconds:
+            logger.warning(
+                f"Turn for conversation {conversation_id} waited {wait:.2f}s "
+                f"behind {self.queue_depth(conversation_id)} queued turn(s)"
+            )
+
+    def cancel(self, conversation_id: str) -> Dict[str, int]:
+        """
+        Cancel a conversation's queued turns and its running turn.
+
+        Their submit() calls return None.
+
+        Returns:
+            {"queued": turns dropped before starting, "running": 1 if a running turn was cancelled}
+        """
+        queued = 0
+        mailbox = self._mailboxes.get(conversation_id, ())
+        while mailbox:
+            _, future, _ = mailbox.popleft()
+            if not future.done():
+                future.set_result(None)
+                queued += 1
+        self.turns_cancelled += queued
+
+        running = 0
+        task = self._current.get(conversation_id)
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            running = 1
+        return {'queued': queued, 'running': running}
+
+    def queue_depth(self, conversation_id: str) -> int:
+        """Number of turns queued for a conversation, including the one running."""
+        depth = len(self._mailboxes.get(conversation_id, ()))
+        if conversation_id in self._running:
+            depth += 1
+        return depth
+
+    def is_busy(self, conversation_id: str) -> bool:
+        """Whether a turn is currently running or queued for the conversation."""
+        return conversation_id in self._workers
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return mailbox statistics for monitoring head-of-line blocking."""
+        started = self.turns_completed + self.turns_failed
+        return {
+            'active_conversations': len(self._workers),
+            'queued_turns': sum(len(mailbox) for mailbox in self._mailboxes.values()),
+            'queue_depths': {
+                conversation_id: self.queue_depth(conversation_id)
+                for conversation_id in self._workers
+            },
+            'max_queue_depth': self.max_queue_depth,
+            'turns_submitted': self.turns_submitted,
+            'turns_completed': self.turns_completed,
+            'turns_failed': self.turns_failed,
+            'turns_cancelled': self.turns_cancelled,
+            'avg_wait_seconds': round(self.total_wait_seconds / started, 4) if started else 0.0,
+            'max_wait_seconds': round(self.max_wait_seconds, 4),
+            'last_wait_seconds': round(self.last_wait_seconds, 4)
+        }
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Streaming Delivery Module
+Shows Claude's reply in Teams while it is still streaming: a placeholder
+message is posted on the first visible delta, updated in place at a throttled
+cadence, and finally replaced by the formatted response.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from botbuilder.core import TurnContext, MessageFactory
+from botbuilder.schema import Activity
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Teams rejects very large message bodies; keep interim updates well below that
+MAX_PREVIEW_CHARS = 6000
+MAX_CODE_PREVIEW_CHARS = 2500
+
+
+class StreamingStats:
+    """Process-wide latency statistics for streaming delivery"""
+
+    def __init__(self, max_samples: int = 1000):
+        """Initialize empty statistics keeping the most recent samples"""
+        self.first_visible_samples: Deque[float] = deque(maxlen=max_samples)
+        self.streams_started = 0
+        self.streams_without_deltas = 0
+        self.updates_sent = 0
+        self.update_failures = 0
+
+    def record_first_visible(self, seconds: float) -> None:
+        """Record a time-to-first-visible-token sample"""
+        self.first_visible_samples.append(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return time-to-first-visible-token percentiles and update counters"""
+        samples = sorted(self.first_visible_samples)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not samples:
+                return None
+            index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+            return round(samples[index], 4)
+
+        return {
+            'streams_started': self.streams_started,
+            'streams_without_deltas': self.streams_without_deltas,
+            'updates_sent': self.updates_sent,
+            'update_failures': self.update_failures,
+            'time_to_first_visible_token': {
+                'samples': len(samples),
+                'avg_seconds': round(sum(samples) / len(samples), 4) if samples else None,
+                'p50_seconds': percentile(0.5),
+                'p95_seconds': percentile(0.95)
+            }
+        }
+
+
+class StreamingResponder:
+    """Delivers one streaming turn to Teams as a message that is updated in place"""
+
+    def __init__(self, turn_context: TurnContext, stats: StreamingStats,
+                 min_update_interval: float = 1.0):
+        """
+        Prepare a responder for a single turn.
+
+        Args:
+            turn_context: Turn the reply belongs to
+            stats: Shared statistics the responder reports into
+            min_update_interval: Minimum seconds between in-place updates
+        """
+        self.turn_context = turn_context
+        self.stats = stats
+        self.min_update_interval = min_update_interval
+        self.started_at = time.monotonic()
+        self.first_visible_seconds: Optional[float] = None
+
+        self.activity_id: Optional[str] = None
+        self._text_parts: List[str] = []
+        self._code_parts: List[str] = []
+        self._dirty = False
+        self._failed = False
+        self._pump: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+
+    def on_progress(self, kind: str, text: str) -> None:
+        """ClaudeCore.achat progress callback; records deltas without blocking"""
+        if kind == "text":
+            self._text_parts.append(text)
+        elif kind == "code":
+            self._code_parts.append(text)
+        elif kind == "code_start":
+            self._code_parts = []
+        elif kind == "reset":
+            self._text_parts = []
+            self._code_parts = []
+        self._dirty = True
+
+        if self._pump is None and not self._failed and (self._text_parts or self._code_parts):
+            self.stats.streams_started += 1
+            self._pump = asyncio.ensure_future(self._run())
+
+    def render(self) -> str:
+        """Render the text and latest code received so far"""
+        text = ''.join(self._text_parts)
+        if len(text) > MAX_PREVIEW_CHARS:
+            text = "…" + text[-MAX_PREVIEW_CHARS:]
+        code = ''.join(self._code_parts)
+        if code:
+            if len(code) > MAX_CODE_PREVIEW_CHARS:
+                code = "…\n" + code[-MAX_CODE_PREVIEW_CHARS:]
+            text += f"\n\n```python\n{code}\n```"
+        return text + " ▌"
+
+    async def _run(self) -> None:
+        """Post the placeholder, then push throttled updates until finished"""
+        try:
+            self._dirty = False
+            response = await self.turn_context.send_activity(MessageFactory.text(self.render()))
+            self.activity_id = getattr(response, 'id', None)
+            self.first_visible_seconds = time.monotonic() - self.started_at
+            self.stats.record_first_visible(self.first_visible_seconds)
+            if not self.activity_id:
+                self._failed = True
+                return
+
+            while not self._closed.is_set():
+                try:
+                    await asyncio.wait_for(self._closed.wait(), timeout=self.min_update_interval)
+                except asyncio.TimeoutError:
+                    pass
+                if self._closed.is_set() or not self._dirty:
+                    continue
+                self._dirty = False
+                await self._update(MessageFactory.text(self.render()))
+        except Exception as e:
+            logger.error(f"Streaming delivery failed, falling back to a single reply: {e}")
+            self._failed = True
+
+    async def _update(self, activity: Activity) -> bool:
+        """Replace the placeholder message with activity"""
+        activity.id = self.activity_id
+        try:
+            await self.turn_context.update_activity(activity)
+            self.stats.updates_sent += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to update streaming message: {e}")
+            self.stats.update_failures += 1
+            return False
+
+    async def finish(self, final_activity: Activity) -> Optional[str]:
+        """Swap in the final reply, or send it normally if nothing was streamed; returns its activity id"""
+        self._closed.set()
+        if self._pump is not None:
+            await self._pump
+        else:
+            self.stats.streams_without_deltas += 1
+
+        if self.activity_id and not self._failed:
+            if await self._update(final_activity):
+                return self.activity_id
+        final_activity.id = None
+        response = await self.turn_context.send_activity(final_activity)
+        return getattr(response, 'id', None)
+
+    async def cancel(self, text: str = "⏹️ Cancelled.") -> None:
+        """Stop updates and replace a posted placeholder with text; nothing is sent otherwise"""
+        self._closed.set()
+        if self._pump is not None:
+            await self._pump
+        if self.activity_id and not self._failed:
+            await self._update(MessageFactory.text(text))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Activity Log Module
+Bounded ring buffer for per-conversation activity (files accessed, web
+searches). Entries are stored as compact tuples with a sequence number, so
+callers can ask for what is new since a cursor or page through the retained
+history instead of copying all of it every turn.
+"""
+
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Tuple, Union
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class ActivityLog:
+    """Fixed-size log of (seq, time, *fields) records exposed as dicts"""
+
+    def __init__(self, fields: Tuple[str, ...], maxlen: int = 100):
+        """
+        Create an empty log.
+
+        Args:
+            fields: Names of the values passed to append(), in order
+            maxlen: Records retained; the oldest are dropped beyond this
+        """
+        self.fields = tuple(fields)
+        self.maxlen = maxlen
+        self._records: Deque[Tuple[Any, ...]] = deque(maxlen=maxlen)
+        # Sequence number of the last record appended; records are numbered from 1
+        self.cursor = 0
+
+    def append(self, *values: Any) -> int:
+        """Record an entry; returns its sequence number."""
+        if len(values) != len(self.fields):
+            raise ValueError(f"Expected {len(self.fields)} values ({', '.join(self.fields)})")
+        self.cursor += 1
+        self._records.append((self.cursor, time.time()) + values)
+        return self.cursor
+
+    @property
+    def dropped(self) -> int:
+        """Records evicted from the ring buffer so far."""
+        return self.cursor - len(self._records)
+
+    def _view(self, record: Tuple[Any, ...]) -> Dict[str, Any]:
+        entry = dict(zip(self.fields, record[2:]))
+        entry['timestamp'] = datetime.fromtimestamp(record[1]).strftime(TIMESTAMP_FORMAT)
+        return entry
+
+    def since(self, cursor: int) -> List[Dict[str, Any]]:
+        """Entries appended after the given cursor that are still retained."""
+        new = self.cursor - cursor
+        if new <= 0:
+            return []
+        start = max(0, len(self._records) - new)
+        return [self._view(self._records[i]) for i in range(start, len(self._records))]
+
+    def page(self, page: int = 0, page_size: int = 20) -> Dict[str, Any]:
+        """
+        One page of retained history, newest first.
+
+        Returns:
+            Dict with the page's "entries" plus "page", "page_size",
+            "total" (retained), "dropped" and "has_more"
+        """
+        page = max(0, page)
+        page_size = max(1, page_size)
+        total = len(self._records)
+        newest = total - page * page_size
+        oldest = max(0, newest - page_size)
+        entries = [self._view(self._records[i]) for i in range(newest - 1, oldest - 1, -1)] if newest > 0 else []
+        return {
+            'entries': entries,
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'dropped': self.dropped,
+            'has_more': oldest > 0
+        }
+
+    def clear(self) -> None:
+        """Drop all retained records; the cursor keeps counting."""
+        self._records.clear()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self._view(record) for record in self._records)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        if isinstance(index, slice):
+            return [self._view(record) for record in list(self._records)[index]]
+        return self._view(self._records[index])
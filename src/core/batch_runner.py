@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Batch Runner Module
+Runs an analysis prompt over many uploaded files offline through the Message
+Batches API (half the price of interactive turns). A manifest of prompts and
+file IDs is turned into ClaudeCore-style requests, submitted in batches,
+polled with exponential backoff and the results are streamed to JSONL.
+
+Usage:
+    python -m src.core.batch_runner manifest.jsonl --output results.jsonl
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import logging
+from typing import Any, Callable, Dict, IO, List, Optional
+
+from .client_factory import BETAS
+from .prompt_cache import add_usage, empty_usage, read_usage
+from .routing import estimate_cost
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batch requests are billed at half the interactive price
+BATCH_DISCOUNT = 0.5
+RESULT_TYPES = ('succeeded', 'errored', 'canceled', 'expired')
+_CUSTOM_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """
+    Load and normalize a batch manifest.
+
+    A .jsonl manifest has one item per line. A .json manifest is either a
+    list of items or an object with an "items" list plus defaults ("prompt",
+    "model", "use_code_execution") applied to every item. Each item has an
+    optional "custom_id", a "prompt" and "file_ids" (or "files" with
+    "file_id"/"file_name" dicts).
+
+    Returns:
+        Items with custom_id, prompt, files, model and use_code_execution set
+
+    Raises:
+        ValueError: For items without a prompt or with invalid/duplicate custom_ids
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            raw, defaults = [json.loads(line) for line in f if line.strip()], {}
+        else:
+            data = json.load(f)
+            raw, defaults = (data, {}) if isinstance(data, list) else (data.get('items', []), data)
+    return normalize_items(raw, defaults)
+
+
+def normalize_items(raw: List[Dict[str, Any]], defaults: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Apply manifest defaults to raw items and validate them (see load_manifest)."""
+    defaults = defaults or {}
+    items = []
+    seen = set()
+    for index, entry in enumerate(raw):
+        custom_id = str(entry.get('custom_id') or f"item-{index}")
+        if not _CUSTOM_ID.match(custom_id):
+            raise ValueError(f"Invalid custom_id {custom_id!r}: use 1-64 letters, digits, '-' or '_'")
+        if custom_id in seen:
+            raise ValueError(f"Duplicate custom_id {custom_id!r}")
+        seen.add(custom_id)
+
+        prompt = entry.get('prompt') or defaults.get('prompt')
+        if not prompt:
+            raise ValueError(f"Item {custom_id!r} has no prompt")
+        files = list(entry.get('files') or [])
+        files += [{'file_id': file_id, 'file_name': file_id} for file_id in entry.get('file_ids') or []]
+
+        items.append({
+            'custom_id': custom_id,
+            'prompt': prompt,
+            'files': files,
+            'model': entry.get('model') or defaults.get('model'),
+            'use_code_execution': entry.get('use_code_execution', defaults.get('use_code_execution', True))
+        })
+    return items
+
+
+class BatchRunner:
+    """Submits manifest items as Message Batches and collects their results"""
+
+    def __init__(self, claude: Any, poll_interval: Optional[float] = None,
+                 max_poll_interval: Optional[float] = None, backoff: float = 2.0,
+                 timeout: Optional[float] = None, max_batch_size: Optional[int] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Configure the runner.
+
+        Args:
+            claude: ClaudeCore supplying the client, resilience layer and
+                    request construction
+            poll_interval: First wait between status checks; defaults to
+                           BATCH_POLL_INTERVAL or 10 seconds
+            max_poll_interval: Longest wait between checks; defaults to
+                               BATCH_MAX_POLL_INTERVAL or 300 seconds
+            backoff: Multiplier applied to the wait after each check
+            timeout: Give up waiting for a batch after this many seconds;
+                     defaults to BATCH_TIMEOUT or 24 hours
+            max_batch_size: Requests per submitted batch; defaults to
+                            BATCH_MAX_REQUESTS or 10000
+            sleep: Sleep function (replaced in tests)
+        """
+        self.claude = claude
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('BATCH_POLL_INTERVAL', '10'))
+        self.max_poll_interval = max_poll_interval if max_poll_interval is not None else float(os.getenv('BATCH_MAX_POLL_INTERVAL', '300'))
+        self.backoff = backoff
+        self.timeout = timeout if timeout is not None else float(os.getenv('BATCH_TIMEOUT', '86400'))
+        self.max_batch_size = max_batch_size or int(os.getenv('BATCH_MAX_REQUESTS', '10000'))
+        self.sleep = sleep
+
+        # Statistics
+        self.batches_submitted = 0
+        self.requests_submitted = 0
+        self.polls = 0
+        self.results = {result_type: 0 for result_type in RESULT_TYPES}
+        self.usage = empty_usage()
+        self.cost_usd = 0.0
+
+    @property
+    def _batches(self) -> Any:
+        return self.claude.client.beta.messages.batches
+
+    def build_requests(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Turn normalized manifest items into batch requests."""
+        return [
+            {
+                'custom_id': item['custom_id'],
+                'params': self.claude.build_request(
+                    item['prompt'], item.get('use_code_execution', True), item.get('files'), item.get('model')
+                )
+            }
+            for item in items
+        ]
+
+    def submit(self, items: List[Dict[str, Any]]) -> List[str]:
+        """Submit items in batches of at most max_batch_size; returns the batch IDs."""
+        requests = self.build_requests(items)
+        batch_ids = []
+        for start in range(0, len(requests), self.max_batch_size):
+            chunk = requests[start:start + self.max_batch_size]
+            batch = self.claude.resilience.call(lambda: self._batches.create(requests=chunk, betas=BETAS))
+            batch_ids.append(batch.id)
+            self.batches_submitted += 1
+            self.requests_submitted += len(chunk)
+            logger.info(f"Submitted batch {batch.id} with {len(chunk)} requests")
+        return batch_ids
+
+    def wait(self, batch_id: str) -> Any:
+        """
+        Poll a batch with exponential backoff until it has ended.
+
+        Raises:
+            TimeoutError: If the batch is still processing after timeout seconds
+        """
+        deadline = time.monotonic() + self.timeout
+        interval = self.poll_interval
+        while True:
+            batch = self.claude.resilience.call(lambda: self._batches.retrieve(batch_id, betas=BETAS))
+            self.polls += 1
+            if batch.processing_status == 'ended':
+                return batch
+            counts = getattr(batch, 'request_counts', None)
+            logger.info(
+                f"Batch {batch_id} {batch.processing_status}: "
+                f"{getattr(counts, 'processing', '?')} requests processing; next check in {interval:.0f}s"
+            )
+            if time.monotonic() + interval > deadline:
+                raise TimeoutError(f"Batch {batch_id} did not finish within {self.timeout:.0f}s")
+            self.sleep(interval)
+            interval = min(interval * self.backoff, self.max_poll_interval)
+
+    def write_results(self, batch_id: str, output: IO[str]) -> Dict[str, int]:
+        """Stream an ended batch's results to output as JSONL; returns counts by result type."""
+        counts = {result_type: 0 for result_type in RESULT_TYPES}
+        entries = self.claude.resilience.call(lambda: self._batches.results(batch_id, betas=BETAS))
+        for entry in entries:
+            record = self._result_record(batch_id, entry)
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+            output.write(json.dumps(record) + '\n')
+        output.flush()
+        for result_type, count in counts.items():
+            self.results[result_type] = self.results.get(result_type, 0) + count
+        return counts
+
+    def _result_record(self, batch_id: str, entry: Any) -> Dict[str, Any]:
+        """Flatten one individual batch response into a JSONL record."""
+        result = entry.result
+        record = {
+            'custom_id': entry.custom_id,
+            'batch_id': batch_id,
+            'status': result.type,
+            'model': None,
+            'text': None,
+            'executed_code': None,
+            'code_output': None,
+            'stop_reason': None,
+            'usage': None,
+            'cost_usd': None,
+            'error': None
+        }
+        if result.type == 'succeeded':
+            message = result.message
+            text, code, output = [], [], []
+            for block in message.content or []:
+                if block.type == 'text':
+                    text.append(block.text)
+                elif block.type == 'server_tool_use' and isinstance(getattr(block, 'input', None), dict):
+                    code.append(block.input.get('code', ''))
+                elif block.type == 'code_execution_tool_result':
+                    stdout = getattr(getattr(block, 'content', None), 'stdout', None)
+                    if stdout:
+                        output.append(stdout)
+            usage = empty_usage()
+            read_usage(message.usage, usage)
+            cost = estimate_cost(message.model, usage) * BATCH_DISCOUNT
+            add_usage(self.usage, usage)
+            self.cost_usd += cost
+            record.update({
+                'model': message.model,
+                'text': ''.join(text),
+                'executed_code': '\n\n'.join(code) or None,
+                'code_output': '\n'.join(output) or None,
+                'stop_reason': message.stop_reason,
+                'usage': usage,
+                'cost_usd': round(cost, 6)
+            })
+        elif result.type == 'errored':
+            error = getattr(result, 'error', None)
+            detail = getattr(error, 'error', error)
+            record['error'] = {
+                'type': getattr(detail, 'type', None),
+                'message': getattr(detail, 'message', str(detail))
+            }
+        return record
+
+    def run(self, items: List[Dict[str, Any]], output_path: str) -> Dict[str, Any]:
+        """
+        Submit items, wait for every batch and write all results to output_path.
+
+        Returns:
+            Summary with the batch IDs, result counts, usage and estimated cost
+        """
+        started = time.monotonic()
+        batch_ids = self.submit(items)
+        counts = {result_type: 0 for result_type in RESULT_TYPES}
+        with open(output_path, 'w', encoding='utf-8') as output:
+            for batch_id in batch_ids:
+                self.wait(batch_id)
+                for result_type, count in self.write_results(batch_id, output).items():
+                    counts[result_type] = counts.get(result_type, 0) + count
+        summary = {
+            'batch_ids': batch_ids,
+            'requests': len(items),
+            'results': counts,
+            'output': output_path,
+            'elapsed_seconds': round(time.monotonic() - started, 2)
+        }
+        logger.info(f"Batch run finished: {summary}")
+        return summary
+
+    def cancel(self, batch_id: str) -> Any:
+        """Request cancellation of a batch that is still processing."""
+        return self.claude.resilience.call(lambda: self._batches.cancel(batch_id, betas=BETAS))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return submission, polling and result counters with usage and cost."""
+        return {
+            'batches_submitted': self.batches_submitted,
+            'requests_submitted': self.requests_submitted,
+            'polls': self.polls,
+            'results': dict(self.results),
+            'usage': dict(self.usage),
+            'cost_usd': round(self.cost_usd, 6)
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .claude_core import ClaudeCore
+    from .client_factory import get_shared_client
+
+    parser = argparse.ArgumentParser(description="Run a prompt manifest through the Message Batches API")
+    parser.add_argument('manifest', help=".json or .jsonl manifest of prompts and file IDs")
+    parser.add_argument('--output', default='batch_results.jsonl', help="JSONL results file")
+    parser.add_argument('--model', help="Default model for items without one")
+    parser.add_argument('--no-code-execution', action='store_true', help="Do not send the code execution tool")
+    args = parser.parse_args(argv)
+
+    items = load_manifest(args.manifest)
+    for item in items:
+        if args.no_code_execution:
+            item['use_code_execution'] = False
+    claude = ClaudeCore(model=args.model or "claude-opus-4-20250514", client=get_shared_client())
+    runner = BatchRunner(claude)
+    summary = runner.run(items, args.output)
+    print(json.dumps(dict(summary, **runner.get_stats()), indent=2))
+    return 0 if not summary['results'].get('errored') else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,38 +7,147 @@ code execution, web searches, and file management without any UI dependencies.
 
 import os
 import json
+import time
+import asyncio
+import itertools
 import logging
-from typing import Optional, Dict, List, Any
-from datetime import datetime
-from anthropic import Anthropic
+from typing import Optional, Dict, List, Any, BinaryIO, Callable
+from anthropic import Anthropic, AsyncAnthropic, APIStatusError, NotFoundError
 import requests
 
+from .activity_log import ActivityLog
+from .client_factory import BETA_HEADERS
+from .file_index import FileIndex, make_key, scope_for_api_key, sha256_fileobj
+from .stream_processor import ChatResult, StreamProcessor
+from .tokens import TOOL_DEFINITION_TOKENS, fit_to_budget, input_budget_for_model
+from .response_cache import ResponseCache, context_fingerprint
+from .concurrency import AdaptiveConcurrencyLimiter, is_overload
+from .routing import ModelRouter
+from .tool_prediction import ToolPredictor
+from .rate_limit import RateLimiter, RateLimitExceeded
+from .resilience import CircuitOpenError, ResilienceLayer, is_retryable
+from .prompt_cache import add_usage, apply_cache_breakpoints, cache_hit_rate, empty_usage
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CODE_EXECUTION_TOOL = {
+    "type": "code_execution_20250522",
+    "name": "code_execution"
+}
+
 
 class ClaudeCore:
     """Core Claude functionality without UI dependencies."""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "claude-opus-4-20250514"):
-        """Initialize Claude client with code execution tool support."""
+    def __init__(self, api_key: Optional[str] = None, model: str = "claude-opus-4-20250514",
+                 prompt_cache_breakpoints: Optional[int] = None,
+                 prompt_cache_ttl: Optional[str] = None,
+                 max_input_tokens: Optional[int] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 client: Optional[Anthropic] = None,
+                 async_client: Optional[AsyncAnthropic] = None,
+                 resilience: Optional[ResilienceLayer] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 router: Optional[ModelRouter] = None,
+                 tool_predictor: Optional[ToolPredictor] = None,
+                 activity_history_size: Optional[int] = None,
+                 file_index: Optional[FileIndex] = None):
+        """
+        Initialize Claude client with code execution tool support.
+        
+        Args:
+            api_key: Anthropic API key; defaults to ANTHROPIC_API_KEY
+            model: Model used for chat turns
+            prompt_cache_breakpoints: Recent user turns to mark for prompt caching
+                                      (0 disables caching); defaults to
+                                      PROMPT_CACHE_BREAKPOINTS or 2
+            prompt_cache_ttl: Optional cache lifetime such as "1h"; defaults to
+                              PROMPT_CACHE_TTL or the API default
+            max_input_tokens: Estimated input token budget per request; defaults
+                              to a per-model budget (MAX_INPUT_TOKENS overrides)
+            response_cache: Optional cache (may be shared between instances)
+                            answering repeated tool-free turns
+            client: Optional pre-built client, e.g. the process-wide shared one
+                    from client_factory; a private client is created otherwise
+            async_client: Optional pre-built async client, as for client
+            resilience: Retry/circuit breaker layer (may be shared between
+                        instances); a private one is created otherwise
+            rate_limiter: Optional process-wide RPM/TPM limiter admitting turns
+            concurrency_limiter: Optional process-wide AIMD limit on in-flight
+                                 streams (used by achat())
+            router: Optional ModelRouter choosing a quick or analysis model per
+                    turn; without one every turn uses model
+            tool_predictor: Optional ToolPredictor sending the code execution
+                            tool only to turns likely to need it; without one
+                            the tool is sent unless use_code_execution is False
+            activity_history_size: Web searches and file accesses retained per
+                                   conversation; defaults to
+                                   ACTIVITY_HISTORY_SIZE or 100
+            file_index: Optional content-addressed FileIndex (may be shared
+                        between instances) reusing the file_id of bytes
+                        uploaded before
+        """
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY not found. Set it as an environment variable or pass it to the constructor.")
         
-        self.client = Anthropic(
+        # SDK retries are disabled; self.resilience owns retry policy
+        self.client = client or Anthropic(
             api_key=self.api_key,
-            default_headers={
-                "anthropic-beta": "code-execution-2025-05-22,files-api-2025-04-14"
-            }
+            default_headers=BETA_HEADERS,
+            max_retries=0
+        )
+        
+        # Async client used by achat() so streaming never blocks the event loop
+        self.async_client = async_client or AsyncAnthropic(
+            api_key=self.api_key,
+            default_headers=BETA_HEADERS,
+            max_retries=0
         )
+        self.resilience = resilience or ResilienceLayer()
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        
+        # Per-turn model routing; route_override pins "quick" or "analysis"
+        self.router = router
+        self.route_override = None
+        
+        # Lazy code execution tool inclusion
+        self.tool_predictor = tool_predictor
+        self.turns_since_tool_use = None
         
         self.conversation_history = []
         self.model = model
+        self.max_tokens = 4096
+        self.max_input_tokens = max_input_tokens
         self.uploaded_files = {}  # Store file IDs and their info
-        self.web_searches = []  # Track web search queries and results
-        self.files_accessed = []  # Track files accessed during conversations
+        self.file_index = file_index
+        
+        # Bounded web search and file access history; responses carry only
+        # file accesses newer than _files_reported
+        if activity_history_size is None:
+            activity_history_size = int(os.getenv('ACTIVITY_HISTORY_SIZE', '100'))
+        self.web_searches = ActivityLog(('query', 'results'), activity_history_size)
+        self.files_accessed = ActivityLog(('file_name', 'action'), activity_history_size)
+        self._files_reported = 0
+        
+        # Prompt caching configuration and cumulative token usage
+        if prompt_cache_breakpoints is None:
+            prompt_cache_breakpoints = int(os.getenv('PROMPT_CACHE_BREAKPOINTS', '2'))
+        self.prompt_cache_breakpoints = prompt_cache_breakpoints
+        self.prompt_cache_ttl = prompt_cache_ttl or os.getenv('PROMPT_CACHE_TTL') or None
+        self.usage_totals = empty_usage()
+        
+        # Original turns replaced by compaction summaries, kept for audit
+        self.history_archive = []
+        
+        # Optional cache of tool-free answers; reset_conversation() moves this
+        # conversation to a private namespace so earlier answers are not reused
+        self.response_cache = response_cache
+        self.cache_namespace = ''
     
     def add_message(self, role: str, content: str) -> None:
         """Add a message to the conversation history."""
@@ -64,36 +173,102 @@ class ClaudeCore:
         """Upload a file using the Files API. Returns file_id if successful."""
         try:
             with open(file_path, 'rb') as file:
-                file_upload = self.client.files.create(
-                    file=file,
-                    purpose="user_request"
-                )
+                return self.upload_fileobj(file, os.path.basename(file_path), file_path=file_path)
+        except OSError as e:
+            logger.error(f"Error uploading file {file_path}: {e}")
+            return None
+    
+    def upload_fileobj(self, fileobj: BinaryIO, file_name: str, sha256: Optional[str] = None,
+                       file_path: Optional[str] = None) -> Optional[str]:
+        """
+        Upload a seekable binary file object (e.g. a spooled download) using
+        the Files API. Returns file_id if successful.
+        
+        With a file_index, bytes uploaded before reuse their file_id.
+        
+        Args:
+            fileobj: Content to upload; rewound before each attempt
+            file_name: Name sent with the upload and listed in uploaded_files
+            sha256: Hex digest of the content if already known, saving a
+                    hashing pass for the file index
+            file_path: Source recorded in uploaded_files; defaults to file_name
+        """
+        try:
+            file_type = self.get_file_type(file_name)
+            key = None
+            if self.file_index is not None:
+                key = make_key(sha256 or sha256_fileobj(fileobj), scope_for_api_key(self.api_key))
             
-            file_name = os.path.basename(file_path)
-            file_type = self.get_file_type(file_path)
+            file_id = self._indexed_file_id(key) if key else None
+            if file_id:
+                logger.info(f"Reusing uploaded file: {file_name} ({file_type}) - ID: {file_id}")
+            else:
+                def create_file():
+                    fileobj.seek(0)
+                    return self.client.files.create(
+                        file=(file_name, fileobj),
+                        purpose="user_request"
+                    )
+                
+                file_id = self.resilience.call(create_file).id
+                if key:
+                    self.file_index.add(key, file_id, file_name, fileobj.seek(0, os.SEEK_END))
+                logger.info(f"Uploaded file: {file_name} ({file_type}) - ID: {file_id}")
+            
+            # A re-used name no longer holds the file_id it pointed at before
+            previous = self.uploaded_files.get(file_name)
+            if key and previous:
+                self.file_index.release(previous['file_id'])
             self.uploaded_files[file_name] = {
-                'file_id': file_upload.id,
-                'file_path': file_path,
+                'file_id': file_id,
+                'file_path': file_path or file_name,
                 'file_type': file_type
             }
-            
-            logger.info(f"Uploaded file: {file_name} ({file_type}) - ID: {file_upload.id}")
-            return file_upload.id
+            return file_id
             
         except Exception as e:
-            logger.error(f"Error uploading file {file_path}: {e}")
+            logger.error(f"Error uploading file {file_name}: {e}")
             return None
     
+    def _indexed_file_id(self, key: str) -> Optional[str]:
+        """file_id indexed for key, confirming it still exists once it is due for a check."""
+        entry = self.file_index.lookup(key)
+        if entry is None:
+            return None
+        if not self.file_index.needs_check(entry):
+            return self.file_index.confirm(key)
+        try:
+            self.resilience.call(lambda: self.client.files.retrieve_metadata(entry['file_id']))
+        except NotFoundError:
+            logger.info(f"Indexed file {entry['file_id']} no longer exists; uploading again")
+            self.file_index.invalidate(key)
+            return None
+        except Exception as e:
+            logger.warning(f"Could not confirm indexed file {entry['file_id']}: {e}; uploading again")
+            return None
+        return self.file_index.confirm(key, verified=True)
+    
     def delete_file(self, file_name: str) -> bool:
-        """Delete an uploaded file. Returns True if successful."""
+        """
+        Delete an uploaded file. Returns True if successful.
+        
+        With a file_index, a file_id still held by another conversation (or
+        another name) is only forgotten here, not deleted from the Files API.
+        """
         if file_name not in self.uploaded_files:
             logger.error(f"File '{file_name}' not found in uploaded files.")
             return False
             
         try:
             file_id = self.uploaded_files[file_name]['file_id']
+            if self.file_index is not None and self.file_index.release(file_id):
+                del self.uploaded_files[file_name]
+                logger.info(f"Forgot file: {file_name} (file_id {file_id} is still in use)")
+                return True
             self.client.files.delete(file_id)
             del self.uploaded_files[file_name]
+            if self.file_index is not None:
+                self.file_index.discard_file_id(file_id)
             logger.info(f"Deleted file: {file_name}")
             return True
         except Exception as e:
@@ -114,21 +289,19 @@ class ClaudeCore:
     
     def track_web_search(self, query: str, results: list = None) -> None:
         """Track a web search query and its results."""
-        search_entry = {
-            'query': query,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'results': results or []
-        }
-        self.web_searches.append(search_entry)
+        self.web_searches.append(query, results or [])
     
     def track_file_access(self, file_name: str, action: str = "accessed") -> None:
         """Track when a file is accessed or used."""
-        access_entry = {
-            'file_name': file_name,
-            'action': action,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        self.files_accessed.append(access_entry)
+        self.files_accessed.append(file_name, action)
+
+    def get_files_accessed(self, page: int = 0, page_size: int = 20) -> Dict[str, Any]:
+        """Return one page of retained file access history, newest first."""
+        return self.files_accessed.page(page, page_size)
+
+    def get_web_searches(self, page: int = 0, page_size: int = 20) -> Dict[str, Any]:
+        """Return one page of retained web search history, newest first."""
+        return self.web_searches.page(page, page_size)
     
     def parse_search_results(self, result_text: str) -> List[Dict[str, str]]:
         """Parse web search results from tool output."""
@@ -174,6 +347,329 @@ class ClaudeCore:
         
         return results
     
+    def _select_model(self, user_input: str, use_code_execution: bool,
+                      file_attachments_info: Optional[List[Dict[str, str]]]) -> tuple:
+        """Pick the model for a turn; returns (model, route), route is None without a router."""
+        if self.router is None:
+            return self.model, None
+        model, route, reason = self.router.select(
+            user_input, use_code_execution, file_attachments_info,
+            has_file_context=bool(self.files_accessed), override=self.route_override
+        )
+        logger.info(f"Routing turn to {route} model {model} ({reason})")
+        return model, route
+    
+    def _predict_tool(self, user_input: str, use_code_execution: bool,
+                      file_attachments_info: Optional[List[Dict[str, str]]]) -> bool:
+        """Whether this turn is sent with the code execution tool."""
+        if not use_code_execution or self.tool_predictor is None:
+            return use_code_execution
+        include, reason = self.tool_predictor.predict(
+            user_input, file_attachments_info, self.turns_since_tool_use
+        )
+        if not include:
+            logger.info(f"Sending turn without code execution tool ({reason})")
+        return include
+    
+    def _with_code_execution(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of request kwargs with the code execution tool added."""
+        tools = [dict(CODE_EXECUTION_TOOL)]
+        if self.prompt_cache_breakpoints > 0:
+            _, tools = apply_cache_breakpoints([], tools, 0, self.prompt_cache_ttl)
+        return dict(kwargs, tools=tools)
+    
+    def _should_retry_with_tool(self, kwargs: Dict[str, Any], use_code_execution: bool,
+                                state: StreamProcessor) -> bool:
+        """Whether a turn sent without the tool must be repeated with it."""
+        if not use_code_execution or "tools" in kwargs or self.tool_predictor is None:
+            return False
+        retry = self.tool_predictor.needs_tool(state.assistant_message)
+        self.tool_predictor.record_outcome(retry)
+        if retry:
+            logger.info("Tool-free answer asked for computation; retrying with code execution")
+        return retry
+    
+    def _record_route(self, model: str, route: Optional[str], started: float,
+                      response_data: Dict[str, Any], error: bool = False) -> None:
+        """Report a finished turn's latency and usage to the router."""
+        if route is not None:
+            self.router.record(route, model, time.monotonic() - started, response_data["usage"], error)
+    
+    def _message_content(self, user_input: str,
+                         file_attachments_info: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+        """Build a user turn's content blocks: the text plus any attached files."""
+        message_content = [{"type": "text", "text": user_input}]
+        for file_info in file_attachments_info or []:
+            message_content.append({
+                "type": "file", 
+                "file": {"file_id": file_info['file_id']}
+            })
+        return message_content
+    
+    def _tools(self, use_code_execution: bool) -> List[Dict[str, Any]]:
+        """Tool definitions sent with a turn."""
+        return [dict(CODE_EXECUTION_TOOL)] if use_code_execution else []
+    
+    def build_request(self, user_input: str, use_code_execution: bool = True,
+                      file_attachments_info: Optional[List[Dict[str, str]]] = None,
+                      model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build standalone (history-free, non-streaming) Messages API params for
+        one prompt, e.g. for a Message Batches request.
+        
+        Args:
+            user_input: The prompt
+            use_code_execution: Whether to send the code execution tool
+            file_attachments_info: List of dicts with 'file_id' (and 'file_name')
+            model: Model to use; defaults to self.model
+        """
+        params = {
+            "model": model or self.model,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": self._message_content(user_input, file_attachments_info)}]
+        }
+        tools = self._tools(use_code_execution)
+        if tools:
+            params["tools"] = tools
+        return params
+    
+    def _prepare_chat(self, user_input: str, use_code_execution: bool,
+                      file_attachments_info: Optional[List[Dict[str, str]]],
+                      model: Optional[str] = None, route: Optional[str] = None) -> tuple:
+        """Record the user turn and build the API kwargs and empty response_data."""
+        model = model or self.model
+        message_content = self._message_content(user_input, file_attachments_info)
+        
+        # Track file access
+        for file_info in file_attachments_info or []:
+            file_name = file_info.get('file_name', file_info.get('file_id', 'Unknown file'))
+            self.track_file_access(file_name, "attached to message")
+        
+        self.conversation_history.append({"role": "user", "content": message_content})
+        
+        # Prepare tools based on user preference
+        tools = self._tools(use_code_execution)
+        
+        # Keep the request inside the model's input budget by dropping (or, for a
+        # single oversized turn, truncating) the oldest history entries
+        budget = self.max_input_tokens or input_budget_for_model(model, self.max_tokens)
+        if tools:
+            budget -= TOOL_DEFINITION_TOKENS
+        window, window_info = fit_to_budget(self.conversation_history, budget)
+        if window_info['dropped_messages'] or window_info['truncated']:
+            logger.info(
+                f"Context window: dropped {window_info['dropped_messages']} oldest messages"
+                f"{' and truncated the latest turn' if window_info['truncated'] else ''} "
+                f"to fit {budget} tokens"
+            )
+        
+        # Initialize response structure with the file accesses new since the last turn
+        new_files = self.files_accessed.since(self._files_reported)
+        self._files_reported = self.files_accessed.cursor
+        response_data = ChatResult(
+            files_accessed=new_files,
+            context_window=window_info,
+            model=model,
+            route=route
+        )
+        
+        # Send only role and content; history entries may carry private bookkeeping keys
+        messages = [
+            {"role": message["role"], "content": message["content"]}
+            for message in window
+        ]
+        
+        # Mark the stable prefix (tools, earlier turns, attachments) for prompt caching
+        if self.prompt_cache_breakpoints > 0:
+            messages, tools = apply_cache_breakpoints(
+                messages,
+                tools,
+                message_breakpoints=self.prompt_cache_breakpoints,
+                ttl=self.prompt_cache_ttl
+            )
+        
+        # Build kwargs for API call
+        kwargs = {
+            "model": model,
+            "max_tokens": self.max_tokens,
+            "messages": messages,
+            "stream": True
+        }
+        
+        # Only add tools if there are any
+        if tools:
+            kwargs["tools"] = tools
+        
+        return kwargs, response_data
+    
+    def _response_cache_key(self, user_input: str, use_code_execution: bool,
+                            file_attachments_info: Optional[List[Dict[str, str]]],
+                            model: Optional[str] = None) -> Optional[str]:
+        """Cache key for a tool-free turn, computed before the turn joins the history."""
+        if self.response_cache is None or use_code_execution:
+            return None
+        file_ids = [info['file_id'] for info in file_attachments_info or []]
+        return self.response_cache.make_key(
+            model or self.model, user_input, file_ids, context_fingerprint(self.conversation_history),
+            self.cache_namespace
+        )
+    
+    def _finish_cached(self, cached: Dict[str, Any], response_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete a turn from a cached answer without calling the API."""
+        response_data["assistant_message"] = cached["assistant_message"]
+        response_data["cached"] = True
+        self.add_message("assistant", cached["assistant_message"])
+        logger.info("Answered from response cache")
+        return response_data
+    
+    def _store_cached(self, cache_key: Optional[str], response_data: Dict[str, Any]) -> None:
+        """Remember a completed tool-free answer."""
+        if cache_key and not response_data.get("tool_used") and response_data["assistant_message"]:
+            self.response_cache.put(cache_key, {"assistant_message": response_data["assistant_message"]})
+    
+    def _new_stream_processor(self, response_data: ChatResult,
+                              on_progress: Optional[Callable[[str, str], None]] = None) -> StreamProcessor:
+        """Create the per-stream parser shared by chat() and achat()."""
+        return StreamProcessor(response_data, on_progress, self._record_search)
+    
+    def _record_search(self, query: str, result_text: str) -> List[Dict[str, str]]:
+        """Parse a finished web search's results and track the query."""
+        search_results = self.parse_search_results(result_text)
+        if query:
+            self.track_web_search(query, search_results)
+        return search_results
+    
+    def _open_stream(self, kwargs: Dict[str, Any], response_data: Dict[str, Any]) -> Any:
+        """
+        Start a streaming request and wait for its first event; returns
+        (events, rate_limit_reservation).
+        
+        This connect step is what the resilience layer retries; once events
+        are flowing, partial output may already have been shown, so
+        mid-stream failures are not retried. Every attempt is charged to the
+        rate limiter.
+        """
+        reservation = None
+        if self.rate_limiter is not None:
+            reservation = self.rate_limiter.acquire_sync(*self._rate_limit_cost(kwargs, response_data))
+            response_data["rate_limit_wait"] += round(reservation["wait"], 3)
+        try:
+            events = iter(self.client.messages.create(**kwargs))
+            first = next(events, None)
+        except Exception as e:
+            self._refund_attempt(reservation, e)
+            raise
+        return (events if first is None else itertools.chain([first], events)), reservation
+    
+    async def _aopen_stream(self, kwargs: Dict[str, Any], response_data: Dict[str, Any]) -> Any:
+        """
+        Async variant of _open_stream(); returns (stream, events, first_event,
+        rate_limit_reservation, ttft). Hedged attempts are charged too.
+        
+        ttft is timed for this attempt alone, from sending the request to its
+        first event, so retry backoff, hedge delay and rate limit waits do not
+        read as upstream congestion.
+        """
+        reservation = None
+        if self.rate_limiter is not None:
+            reservation = await self.rate_limiter.acquire(*self._rate_limit_cost(kwargs, response_data))
+            response_data["rate_limit_wait"] += round(reservation["wait"], 3)
+        try:
+            sent = time.monotonic()
+            stream = await self.async_client.messages.create(**kwargs)
+            events = stream.__aiter__()
+            try:
+                first = await events.__anext__()
+            except StopAsyncIteration:
+                first = None
+            ttft = time.monotonic() - sent
+        except Exception as e:
+            # Every overloaded attempt is a congestion signal, even if a retry succeeds
+            if self.concurrency_limiter is not None and is_overload(e):
+                self.concurrency_limiter.record_overload()
+            self._refund_attempt(reservation, e)
+            raise
+        except asyncio.CancelledError as e:
+            # A losing hedge or /cancel; the attempt produced nothing
+            self._refund_attempt(reservation, e)
+            raise
+        return stream, events, first, reservation, ttft
+    
+    @staticmethod
+    async def _aclose_stream(opened: Any) -> None:
+        """Close a stream opened by a losing hedged attempt."""
+        close = getattr(opened[0], 'close', None)
+        if close is not None:
+            await close()
+    
+    def _rate_limit_cost(self, kwargs: Dict[str, Any], response_data: Dict[str, Any]) -> Any:
+        """Estimated (input, output) tokens of a request for the rate limiter."""
+        input_tokens = response_data["context_window"]["estimated_tokens"]
+        if kwargs.get("tools"):
+            input_tokens += TOOL_DEFINITION_TOKENS
+        return input_tokens, self.rate_limiter.estimate_output_tokens(kwargs["max_tokens"])
+    
+    def _refund_attempt(self, reservation: Optional[Dict[str, Any]], error: BaseException) -> None:
+        """
+        Refund a failed attempt's reservation: its tokens were not consumed,
+        and unless the API answered with an error status no request was made.
+        """
+        if reservation is not None:
+            self.rate_limiter.release(reservation, keep_request=isinstance(error, APIStatusError))
+    
+    def _settle_rate_limit(self, reservation: Optional[Dict[str, Any]], response_data: Dict[str, Any]) -> None:
+        """Report a finished turn's actual usage to the rate limiter."""
+        if reservation is None:
+            return
+        usage = response_data["usage"]
+        # Cache reads do not count towards input token rate limits
+        self.rate_limiter.settle(
+            reservation,
+            usage["input_tokens"] + usage["cache_creation_input_tokens"],
+            usage["output_tokens"]
+        )
+    
+    def _finish_chat(self, state: StreamProcessor, response_data: ChatResult) -> ChatResult:
+        """Record the assistant turn and finalize response_data."""
+        assistant_message = state.assistant_message
+        response_data.assistant_message = assistant_message
+        self.add_message("assistant", assistant_message)
+        if response_data.tool_used == "code_execution":
+            self.turns_since_tool_use = 0
+        elif self.turns_since_tool_use is not None:
+            self.turns_since_tool_use += 1
+        add_usage(self.usage_totals, response_data["usage"])
+        return response_data
+    
+    def _error_response(self, error: Exception,
+                        files_accessed: Optional[List[Dict[str, str]]] = None) -> ChatResult:
+        """
+        Build the response_data returned when a chat turn fails.
+        
+        Every failure is flagged with "error"; upstream outages (open circuit,
+        retries exhausted or a full rate limit queue) are also flagged with
+        "unavailable" and "retry_in" so the UI can show a friendly message.
+        """
+        logger.error(f"Error in chat: {str(error)}")
+        if isinstance(error, RateLimitExceeded):
+            retry_in = error.retry_in
+            message = ("The assistant is handling a lot of requests right now. "
+                       f"Please try again in about {retry_in:.0f} seconds.")
+        elif isinstance(error, CircuitOpenError) or is_retryable(error):
+            retry_in = getattr(error, 'retry_in', None) or self.resilience.breaker.reset_timeout
+            message = ("Claude is temporarily unavailable or overloaded. "
+                       f"Please try again in about {retry_in:.0f} seconds.")
+        else:
+            message = f"Error: {str(error)}"
+            retry_in = None
+        return ChatResult(
+            assistant_message=message,
+            unavailable=retry_in is not None,
+            retry_in=retry_in,
+            error=True,
+            files_accessed=files_accessed or []
+        )
+    
     def chat(self, user_input: str, use_code_execution: bool = True, 
              file_attachments_info: List[Dict[str, str]] = None) -> Dict[str, Any]:
         """
@@ -194,194 +690,216 @@ class ClaudeCore:
                 "generated_figures": List[Dict[str, str]],
                 "code_errors": str | None,
                 "web_searches": List[Dict[str, Any]],
-                "files_accessed": List[Dict[str, str]]
+                "files_accessed": List[Dict[str, str]],  # new since the previous turn
+                "usage": Dict[str, int],  # input/output and cache read/write tokens
+                "context_window": Dict[str, Any],  # messages dropped/truncated to fit the budget
+                "cached": bool,  # answered from the response cache
+                "rate_limit_wait": float,  # seconds queued for rate limit budget
+                "concurrency_wait": float,  # seconds queued for an in-flight slot (achat)
+                "model": str,  # model that answered the turn
+                "route": "quick" | "analysis" | None,  # router decision, None without a router
+                "error": bool  # the turn failed; assistant_message explains why
             }
         """
-        # Prepare message content
-        message_content = [{"type": "text", "text": user_input}]
+        model, route = self._select_model(user_input, use_code_execution, file_attachments_info)
+        include_tool = self._predict_tool(user_input, use_code_execution, file_attachments_info)
+        cache_key = self._response_cache_key(user_input, include_tool, file_attachments_info, model)
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        kwargs, response_data = self._prepare_chat(user_input, include_tool, file_attachments_info, model, route)
+        if cached is not None:
+            return self._finish_cached(cached, response_data)
         
-        # Add file attachments if provided
-        if file_attachments_info:
-            for file_info in file_attachments_info:
-                message_content.append({
-                    "type": "file", 
-                    "file": {"file_id": file_info['file_id']}
-                })
-                # Track file access
-                file_name = file_info.get('file_name', file_info.get('file_id', 'Unknown file'))
-                self.track_file_access(file_name, "attached to message")
+        started = time.monotonic()
+        try:
+            state = self._stream_turn(kwargs, response_data)
+            if self._should_retry_with_tool(kwargs, use_code_execution, state):
+                first_usage = response_data["usage"]
+                response_data["usage"] = empty_usage()
+                state = self._stream_turn(self._with_code_execution(kwargs), response_data)
+                add_usage(response_data["usage"], first_usage)
+            
+            self._finish_chat(state, response_data)
+            self._record_route(model, route, started, response_data)
+            self._store_cached(cache_key, response_data)
+            return response_data
+            
+        except Exception as e:
+            response_data = self._error_response(e, response_data.files_accessed)
+            self._record_route(model, route, started, response_data, error=True)
+            return response_data
+    
+    def _stream_turn(self, kwargs: Dict[str, Any], response_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one streaming request for chat() and return the final stream state."""
+        # Use streaming; the connect step (including its rate limit wait) is retried on transient errors
+        events, reservation = self.resilience.call(lambda: self._open_stream(kwargs, response_data))
         
-        self.conversation_history.append({"role": "user", "content": message_content})
+        # Process the streaming response
+        state = self._new_stream_processor(response_data)
+        process = state.process
+        for event in events:
+            process(event)
         
-        # Prepare tools based on user preference
-        tools = []
-        if use_code_execution:
-            tools.append({
-                "type": "code_execution_20250522",
-                "name": "code_execution"
-            })
+        self._settle_rate_limit(reservation, response_data)
+        return state
+    
+    async def achat(self, user_input: str, use_code_execution: bool = True,
+                    file_attachments_info: List[Dict[str, str]] = None,
+                    on_progress: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """
+        Async variant of chat() built on the AsyncAnthropic client.
         
-        # Initialize response structure
-        response_data = {
-            "assistant_message": "",
-            "tool_used": None,
-            "executed_code": None,
-            "code_output": None,
-            "generated_figures": [],
-            "code_errors": None,
-            "web_searches": [],
-            "files_accessed": list(self.files_accessed)  # Include current file access history
-        }
+        Awaits the stream instead of blocking on it, so an aiohttp worker can
+        serve other conversations while this turn is in flight. Accepts the
+        same arguments and returns the same response_data dictionary as chat().
         
+        Args:
+            on_progress: Optional callback invoked synchronously as deltas arrive
+                         with (kind, text), where kind is "text", "code",
+                         "code_start" (a new code block begins) or "reset" (the
+                         turn restarts with the code execution tool; discard
+                         what was shown so far). It must not block.
+        """
+        model, route = self._select_model(user_input, use_code_execution, file_attachments_info)
+        include_tool = self._predict_tool(user_input, use_code_execution, file_attachments_info)
+        cache_key = self._response_cache_key(user_input, include_tool, file_attachments_info, model)
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        kwargs, response_data = self._prepare_chat(user_input, include_tool, file_attachments_info, model, route)
+        if cached is not None:
+            return self._finish_cached(cached, response_data)
+        
+        pending_turn = self.conversation_history[-1]
+        started = time.monotonic()
         try:
-            # Use streaming
-            # Build kwargs for API call
-            kwargs = {
-                "model": self.model,
-                "max_tokens": 4096,
-                "messages": self.conversation_history,
-                "stream": True
-            }
-            
-            # Only add tools if there are any
-            if tools:
-                kwargs["tools"] = tools
-            
-            stream = self.client.messages.create(**kwargs)
-            
-            # Process the streaming response
-            assistant_message = ""
-            current_tool_input = ""
-            in_code_block = False
-            web_search_detected = False
-            current_search_query = ""
-            
-            for event in stream:
-                if event.type == "content_block_start":
-                    if hasattr(event, 'content_block'):
-                        if event.content_block.type == "server_tool_use" and event.content_block.name == "code_execution":
-                            in_code_block = True
-                            response_data["tool_used"] = "code_execution"
-                        elif hasattr(event.content_block, 'name') and 'search' in event.content_block.name.lower():
-                            web_search_detected = True
-                            response_data["tool_used"] = "web_search"
-                            
-                elif event.type == "content_block_delta":
-                    if hasattr(event, 'delta'):
-                        if hasattr(event.delta, 'text'):
-                            # Regular text
-                            assistant_message += event.delta.text
-                        elif hasattr(event.delta, 'partial_json'):
-                            # Tool use with partial JSON
-                            if in_code_block and event.delta.partial_json:
-                                try:
-                                    # Extract code from partial JSON
-                                    if '"code": "' in event.delta.partial_json:
-                                        start = event.delta.partial_json.find('"code": "') + 9
-                                        code_part = event.delta.partial_json[start:]
-                                        code_part = code_part.rstrip('"}')
-                                        code_part = code_part.encode('utf-8').decode('unicode_escape')
-                                        current_tool_input += code_part
-                                    elif event.delta.partial_json not in ['', '{"code": "', '"}']:
-                                        code_part = event.delta.partial_json.rstrip('"}')
-                                        code_part = code_part.encode('utf-8').decode('unicode_escape')
-                                        current_tool_input += code_part
-                                except:
-                                    pass
-                            elif web_search_detected and event.delta.partial_json:
-                                # Extract search query
-                                try:
-                                    if '"query"' in event.delta.partial_json:
-                                        import re
-                                        query_match = re.search(r'"query"\s*:\s*"([^"]+)"', event.delta.partial_json)
-                                        if query_match:
-                                            current_search_query = query_match.group(1)
-                                except:
-                                    pass
-                                    
-                elif event.type == "content_block_stop":
-                    if in_code_block:
-                        response_data["executed_code"] = current_tool_input
-                        assistant_message += f"\n\n[Executed code:\n```python\n{current_tool_input}\n```]"
-                        in_code_block = False
-                        current_tool_input = ""
-                        
-                elif event.type == "server_tool_result":
-                    # Handle server tool results
-                    if hasattr(event, 'result'):
-                        if web_search_detected:
-                            # Handle web search results
-                            try:
-                                if hasattr(event.result, 'content') and event.result.content:
-                                    result_text = event.result.content
-                                    search_results = self.parse_search_results(result_text)
-                                    if current_search_query:
-                                        self.track_web_search(current_search_query, search_results)
-                                        response_data["web_searches"].append({
-                                            "query": current_search_query,
-                                            "results": search_results
-                                        })
-                                        current_search_query = ""
-                                    web_search_detected = False
-                            except:
-                                pass
-                        else:
-                            # Handle code execution results
-                            if hasattr(event.result, 'stdout'):
-                                if event.result.stdout:
-                                    response_data["code_output"] = event.result.stdout
-                                    assistant_message += f"\n[Code Output]:\n{event.result.stdout}"
-                                    
-                                    # Check for generated figures
-                                    # Look for patterns like "Figure saved to:" or "Plot saved as:"
-                                    import re
-                                    figure_patterns = [
-                                        r'(?:Figure|Plot|Graph|Chart|Image)\s+saved\s+(?:to|as):\s*(.+)',
-                                        r'Saved\s+(?:figure|plot|graph|chart|image)\s+to:\s*(.+)',
-                                        r'(?:Generated|Created)\s+(.+\.(?:png|jpg|jpeg|svg|pdf))'
-                                    ]
-                                    
-                                    for pattern in figure_patterns:
-                                        matches = re.findall(pattern, event.result.stdout, re.IGNORECASE)
-                                        for match in matches:
-                                            figure_path = match.strip()
-                                            figure_name = os.path.basename(figure_path)
-                                            response_data["generated_figures"].append({
-                                                "figure_name": figure_name,
-                                                "path_or_url": figure_path
-                                            })
-                                            
-                            if hasattr(event.result, 'stderr') and event.result.stderr:
-                                response_data["code_errors"] = event.result.stderr
-                                assistant_message += f"\n[Errors]:\n{event.result.stderr}"
+            state = await self._astream_turn(kwargs, response_data, on_progress)
+            if self._should_retry_with_tool(kwargs, use_code_execution, state):
+                if on_progress:
+                    on_progress("reset", "")
+                first_usage = response_data["usage"]
+                response_data["usage"] = empty_usage()
+                state = await self._astream_turn(self._with_code_execution(kwargs), response_data, on_progress)
+                add_usage(response_data["usage"], first_usage)
             
-            response_data["assistant_message"] = assistant_message
-            self.add_message("assistant", assistant_message)
+            self._finish_chat(state, response_data)
+            self._record_route(model, route, started, response_data)
+            self._store_cached(cache_key, response_data)
+            return response_data
             
+        except asyncio.CancelledError:
+            # A cancelled turn gets no answer; drop it so roles keep alternating
+            self._discard_turn(pending_turn)
+            raise
+        except Exception as e:
+            response_data = self._error_response(e, response_data.files_accessed)
+            self._record_route(model, route, started, response_data, error=True)
             return response_data
+    
+    def _discard_turn(self, turn: Dict[str, Any]) -> None:
+        """Remove an unanswered user turn from the history (compaction may have moved it)."""
+        for index in range(len(self.conversation_history) - 1, -1, -1):
+            if self.conversation_history[index] is turn:
+                del self.conversation_history[index]
+                logger.info("Dropped the cancelled turn from the conversation history")
+                return
+    
+    async def _astream_turn(self, kwargs: Dict[str, Any], response_data: Dict[str, Any],
+                            on_progress: Optional[Callable[[str, str], None]]) -> Dict[str, Any]:
+        """Send one streaming request for achat() and return the final stream state."""
+        limiter = self.concurrency_limiter
+        if limiter is not None:
+            response_data["concurrency_wait"] += round(await limiter.acquire(), 3)
+        
+        ttft = None
+        succeeded = False
+        try:
+            _, events, first, reservation, ttft = await self.resilience.acall(
+                lambda: self._aopen_stream(kwargs, response_data), hedge=True, discard=self._aclose_stream
+            )
             
+            state = self._new_stream_processor(response_data, on_progress)
+            process = state.process
+            if first is not None:
+                process(first)
+            async for event in events:
+                process(event)
+            succeeded = True
         except Exception as e:
-            logger.error(f"Error in chat: {str(e)}")
-            return {
-                "assistant_message": f"Error: {str(e)}",
-                "tool_used": None,
-                "executed_code": None,
-                "code_output": None,
-                "generated_figures": [],
-                "code_errors": None,
-                "web_searches": [],
-                "files_accessed": list(self.files_accessed)
-            }
+            # Connect failures were already reported per attempt
+            if ttft is not None and limiter is not None and is_overload(e):
+                limiter.record_overload()
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release(ttft, succeeded, key=response_data.get("route") or kwargs["model"])
+        
+        self._settle_rate_limit(reservation, response_data)
+        return state
+    
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """Return cumulative token usage and the prompt cache hit rate."""
+        stats = dict(self.usage_totals)
+        stats['cache_hit_rate'] = cache_hit_rate(self.usage_totals)
+        return stats
     
     def reset_conversation(self) -> None:
-        """Reset the conversation history."""
+        """Reset the conversation history; later turns get fresh, not cached, answers."""
         self.conversation_history = []
+        self.cache_namespace = os.urandom(8).hex()
         logger.info("Conversation history cleared.")
     
+    def set_route_override(self, route: Optional[str]) -> None:
+        """Pin this conversation to the "quick" or "analysis" route; None restores automatic routing."""
+        self.route_override = route
+        logger.info(f"Route override set to: {route or 'auto'}")
+    
     def set_model(self, model: str) -> None:
         """Change the model being used."""
         self.model = model
         logger.info(f"Model changed to: {model}")
+
+    def record_turn(self, user_input: str, file_attachments_info: Optional[List[Dict[str, str]]],
+                    response_data: ChatResult, action: str = "attached to message") -> None:
+        """
+        Record a turn answered outside chat()/achat() (e.g. by sub-requests)
+        in the history, file tracking and usage totals.
+        """
+        for file_info in file_attachments_info or []:
+            self.track_file_access(file_info.get('file_name', file_info.get('file_id', 'Unknown file')), action)
+        response_data.files_accessed = self.files_accessed.since(self._files_reported)
+        self._files_reported = self.files_accessed.cursor
+        self.conversation_history.append({
+            "role": "user",
+            "content": self._message_content(user_input, file_attachments_info)
+        })
+        self.add_message("assistant", response_data.assistant_message)
+        add_usage(self.usage_totals, response_data.usage)
+        if response_data.tool_used == "code_execution":
+            self.turns_since_tool_use = 0
+        elif self.turns_since_tool_use is not None:
+            self.turns_since_tool_use += 1
+
+    def spawn(self) -> 'ClaudeCore':
+        """
+        Create a history-free instance sharing this one's clients, resilience,
+        limiters, router and settings, e.g. for parallel sub-requests.
+        """
+        child = ClaudeCore(
+            api_key=self.api_key,
+            model=self.model,
+            prompt_cache_breakpoints=self.prompt_cache_breakpoints,
+            prompt_cache_ttl=self.prompt_cache_ttl,
+            max_input_tokens=self.max_input_tokens,
+            client=self.client,
+            async_client=self.async_client,
+            resilience=self.resilience,
+            rate_limiter=self.rate_limiter,
+            concurrency_limiter=self.concurrency_limiter,
+            router=self.router,
+            activity_history_size=self.files_accessed.maxlen,
+            file_index=self.file_index
+        )
+        child.max_tokens = self.max_tokens
+        child.route_override = self.route_override
+        return child
     
     def get_files_by_type(self, file_type: str) -> List[Dict[str, Any]]:
         """Get all uploaded files of a specific type."""
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Anthropic Client Factory
+Process-wide shared Anthropic clients so every ClaudeCore instance reuses one
+HTTP connection pool (keep-alive, HTTP/2 where available) instead of paying
+for a new pool and TLS handshake per conversation. SDK retries are disabled;
+retries are handled by the resilience layer.
+"""
+
+import os
+import threading
+import importlib.util
+import logging
+from typing import Any, Dict, Optional, Tuple
+import httpx
+from anthropic import Anthropic, AsyncAnthropic, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BETAS = ["code-execution-2025-05-22", "files-api-2025-04-14"]
+BETA_HEADERS = {
+    "anthropic-beta": ",".join(BETAS)
+}
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, Optional[str]], Anthropic] = {}
+_async_clients: Dict[Tuple[str, Optional[str]], AsyncAnthropic] = {}
+_stats = {'clients_created': 0, 'async_clients_created': 0, 'reuses': 0}
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def pool_settings() -> Dict[str, Any]:
+    """Connection pool settings, overridable through environment variables."""
+    http2 = os.getenv('ANTHROPIC_HTTP2', 'auto').lower()
+    return {
+        'max_connections': int(os.getenv('ANTHROPIC_MAX_CONNECTIONS', '100')),
+        'max_keepalive_connections': int(os.getenv('ANTHROPIC_MAX_KEEPALIVE', '20')),
+        'keepalive_expiry': float(os.getenv('ANTHROPIC_KEEPALIVE_EXPIRY', '60')),
+        'http2': http2_available() if http2 == 'auto' else http2 in ('1', 'true', 'yes')
+    }
+
+
+def _http_client_kwargs() -> Dict[str, Any]:
+    """Keyword arguments for the SDK's default httpx client classes."""
+    settings = pool_settings()
+    return {
+        'limits': httpx.Limits(
+            max_connections=settings['max_connections'],
+            max_keepalive_connections=settings['max_keepalive_connections'],
+            keepalive_expiry=settings['keepalive_expiry']
+        ),
+        'http2': settings['http2']
+    }
+
+
+def _resolve(api_key: Optional[str], base_url: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Resolve the cache key for a client."""
+    api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY not found. Set it as an environment variable or pass it to the constructor.")
+    return api_key, base_url
+
+
+def get_shared_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> Anthropic:
+    """Return the process-wide synchronous client for api_key, creating it once."""
+    key = _resolve(api_key, base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = Anthropic(
+                api_key=key[0],
+                base_url=base_url,
+                default_headers=BETA_HEADERS,
+                max_retries=0,
+                http_client=DefaultHttpxClient(**_http_client_kwargs())
+            )
+            _clients[key] = client
+            _stats['clients_created'] += 1
+            logger.info(f"Created shared Anthropic client ({pool_settings()})")
+        else:
+            _stats['reuses'] += 1
+        return client
+
+
+def get_shared_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncAnthropic:
+    """
+    Return the process-wide async client for api_key, creating it once.
+
+    The async pool belongs to the event loop it is first used on, which is the
+    single aiohttp loop in the bot process.
+    """
+    key = _resolve(api_key, base_url)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            client = AsyncAnthropic(
+                api_key=key[0],
+                base_url=base_url,
+                default_headers=BETA_HEADERS,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(**_http_client_kwargs())
+            )
+            _async_clients[key] = client
+            _stats['async_clients_created'] += 1
+        else:
+            _stats['reuses'] += 1
+        return client
+
+
+async def close_shared_clients() -> None:
+    """Close every shared client; call on application shutdown."""
+    with _lock:
+        clients = list(_clients.values())
+        async_clients = list(_async_clients.values())
+        _clients.clear()
+        _async_clients.clear()
+    for client in clients:
+        client.close()
+    for async_client in async_clients:
+        await async_client.close()
+
+
+def get_client_stats() -> Dict[str, Any]:
+    """Return shared client counters and pool settings."""
+    with _lock:
+        stats = dict(_stats)
+        stats['shared_clients'] = len(_clients)
+        stats['shared_async_clients'] = len(_async_clients)
+    stats['pool'] = pool_settings()
+    return stats
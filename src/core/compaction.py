@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Conversation Compaction Module
+Summarizes older turns of a long conversation in the background, between
+user turns, so later requests send a summary plus the recent turns instead of
+the full history. Replaced turns are kept in ClaudeCore.history_archive.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from .tokens import estimate_history_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain the working memory of a data-analysis assistant. Summarize the "
+    "conversation transcript you are given so the assistant can continue it "
+    "without the original messages. Keep every fact, number, file name, decision, "
+    "open question and user preference; keep short code snippets that later turns "
+    "may build on. Write compact bullet points, no preamble."
+)
+
+SUMMARY_HEADER = "[Summary of earlier conversation]"
+SUMMARY_ACK = "Understood. I'll continue from this summary."
+
+
+class ConversationCompactor:
+    """Background summarizer for ClaudeCore conversation history"""
+
+    def __init__(self, token_threshold: Optional[int] = None, keep_recent_turns: int = 4,
+                 summary_model: Optional[str] = None, max_summary_tokens: int = 1024):
+        """
+        Configure when and how conversations are compacted.
+
+        Args:
+            token_threshold: Estimated history size that triggers compaction;
+                             defaults to COMPACTION_TOKEN_THRESHOLD or 60000
+            keep_recent_turns: User/assistant exchanges kept verbatim
+            summary_model: Model used for summaries; defaults to the conversation's model
+            max_summary_tokens: Output budget for the summary
+        """
+        if token_threshold is None:
+            token_threshold = int(os.getenv('COMPACTION_TOKEN_THRESHOLD', '60000'))
+        self.token_threshold = token_threshold
+        self.keep_recent_turns = keep_recent_turns
+        self.summary_model = summary_model or os.getenv('COMPACTION_MODEL') or None
+        self.max_summary_tokens = max_summary_tokens
+
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+        # Statistics
+        self.compactions = 0
+        self.failures = 0
+        self.aborted = 0
+        self.tokens_removed = 0
+        self.last_duration_seconds = 0.0
+
+    def needs_compaction(self, claude: Any) -> bool:
+        """Whether the conversation is over budget and has turns old enough to fold."""
+        return (
+            self._split_index(claude.conversation_history) > 0
+            and estimate_history_tokens(claude.conversation_history) > self.token_threshold
+        )
+
+    def schedule(self, claude: Any) -> Optional[asyncio.Task]:
+        """
+        Start a background compaction for claude if needed and not already running.
+
+        Call this after a turn's reply has been sent so summarization stays off
+        the user's critical path.
+        """
+        key = id(claude)
+        running = self._tasks.get(key)
+        if running is not None and not running.done():
+            return running
+        if not self.needs_compaction(claude):
+            return None
+
+        task = asyncio.ensure_future(self.compact(claude))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return task
+
+    def _split_index(self, history: List[Dict[str, Any]]) -> int:
+        """Index of the first kept entry; the kept tail always starts on a user turn."""
+        split = len(history) - 2 * self.keep_recent_turns
+        while split > 0 and history[split].get('role') != 'user':
+            split -= 1
+        # Folding only an existing summary pair gains nothing
+        if split <= 2 and history and history[0].get('_summary'):
+            return 0
+        return max(split, 0)
+
+    async def compact(self, claude: Any) -> bool:
+        """
+        Summarize the older part of claude's history and splice the summary in.
+
+        The summary is computed from a snapshot; it is only applied if those
+        entries are still the head of the live history (turns only append,
+        and /reset replaces the list), so a concurrent turn is never lost.
+
+        Returns:
+            True if the history was compacted
+        """
+        history = claude.conversation_history
+        split = self._split_index(history)
+        if split <= 0:
+            return False
+        prefix = history[:split]
+        tokens_before = estimate_history_tokens(prefix)
+
+        started = time.monotonic()
+        try:
+            summary = await self._summarize(claude, prefix)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Conversation compaction failed: {e}")
+            return False
+
+        live = claude.conversation_history
+        if live is not history or len(live) < split or any(a is not b for a, b in zip(live, prefix)):
+            self.aborted += 1
+            logger.info("Conversation changed during compaction; summary discarded")
+            return False
+
+        summary_entries = self._summary_entries(summary, prefix)
+        claude.history_archive.extend(entry for entry in prefix if not entry.get('_summary'))
+        live[:split] = summary_entries
+
+        self.compactions += 1
+        self.tokens_removed += max(tokens_before - estimate_history_tokens(summary_entries), 0)
+        self.last_duration_seconds = time.monotonic() - started
+        logger.info(
+            f"Compacted {split} history entries (~{tokens_before} tokens) "
+            f"in {self.last_duration_seconds:.1f}s"
+        )
+        return True
+
+    async def _summarize(self, claude: Any, prefix: List[Dict[str, Any]]) -> str:
+        """Ask the model for a summary of the given history entries."""
+        response = await claude.resilience.acall(
+            lambda: claude.async_client.messages.create(
+                model=self.summary_model or claude.model,
+                max_tokens=self.max_summary_tokens,
+                system=SUMMARY_SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": render_transcript(prefix)}]
+            )
+        )
+        return ''.join(
+            getattr(block, 'text', '') for block in response.content
+            if getattr(block, 'type', None) == 'text'
+        ).strip()
+
+    def _summary_entries(self, summary: str, prefix: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build the user/assistant pair that replaces the folded prefix."""
+        content = [{"type": "text", "text": f"{SUMMARY_HEADER}\n{summary}"}]
+
+        # Keep earlier attachments reachable after their turns are folded
+        seen = set()
+        for entry in prefix:
+            if not isinstance(entry.get('content'), list):
+                continue
+            for block in entry['content']:
+                if isinstance(block, dict) and block.get('type') == 'file':
+                    file_id = block.get('file', {}).get('file_id')
+                    if file_id and file_id not in seen:
+                        seen.add(file_id)
+                        content.append({"type": "file", "file": {"file_id": file_id}})
+
+        return [
+            {"role": "user", "content": content, "_summary": True},
+            {"role": "assistant", "content": SUMMARY_ACK, "_summary": True}
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return compaction statistics."""
+        return {
+            'token_threshold': self.token_threshold,
+            'running': sum(1 for task in self._tasks.values() if not task.done()),
+            'compactions': self.compactions,
+            'failures': self.failures,
+            'aborted': self.aborted,
+            'tokens_removed': self.tokens_removed,
+            'last_duration_seconds': round(self.last_duration_seconds, 3)
+        }
+
+
+def render_transcript(history: List[Dict[str, Any]]) -> str:
+    """Render history entries as plain text for the summarizer."""
+    lines = []
+    for entry in history:
+        content = entry.get('content')
+        if isinstance(content, str):
+            text = content
+        else:
+            parts = []
+            for block in content or []:
+                if not isinstance(block, dict):
+                    continue
+                if block.get('type') == 'text':
+                    parts.append(block.get('text', ''))
+                elif block.get('type') == 'file':
+                    parts.append(f"[attached file {block.get('file', {}).get('file_id', '')}]")
+            text = '\n'.join(parts)
+        lines.append(f"{entry.get('role', 'user').upper()}: {text}")
+    return '\n\n'.join(lines)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Adaptive Concurrency Module
+AIMD (additive increase, multiplicative decrease) limit on in-flight Claude
+streams. The limit grows by about one slot per window of healthy responses
+and is halved on 429/overload responses or when time to first token degrades
+well beyond its baseline.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from anthropic import APIStatusError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OVERLOAD_STATUS_CODES = {429, 503, 529}
+
+
+def is_overload(error: Exception) -> bool:
+    """Whether an error means upstream is shedding load."""
+    return isinstance(error, APIStatusError) and error.status_code in OVERLOAD_STATUS_CODES
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD-controlled semaphore for upstream streaming calls"""
+
+    def __init__(self, initial_limit: Optional[int] = None, min_limit: Optional[int] = None,
+                 max_limit: Optional[int] = None, backoff_ratio: float = 0.5,
+                 ttft_tolerance: float = 2.0, decrease_cooldown: float = 2.0,
+                 max_history: int = 100):
+        """
+        Configure the controller.
+
+        Args:
+            initial_limit: Starting limit; defaults to CONCURRENCY_INITIAL or 8
+            min_limit: Floor; defaults to CONCURRENCY_MIN or 1
+            max_limit: Ceiling; defaults to CONCURRENCY_MAX or 64
+            backoff_ratio: Multiplier applied on a decrease
+            ttft_tolerance: TTFT above baseline * tolerance counts as degraded
+            decrease_cooldown: Seconds after a decrease during which further
+                               congestion signals are ignored (they are usually
+                               the same event seen by concurrent streams)
+            max_history: Limit changes kept for metrics
+        """
+        self.min_limit = min_limit if min_limit is not None else int(os.getenv('CONCURRENCY_MIN', '1'))
+        self.max_limit = max_limit if max_limit is not None else int(os.getenv('CONCURRENCY_MAX', '64'))
+        initial = initial_limit if initial_limit is not None else int(os.getenv('CONCURRENCY_INITIAL', '8'))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff_ratio = backoff_ratio
+        self.ttft_tolerance = ttft_tolerance
+        self.decrease_cooldown = decrease_cooldown
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = float('-inf')
+        # Slow-moving average of healthy time-to-first-token samples per route;
+        # a quick model's TTFT says nothing about an analysis model's
+        self.ttft_baselines: Dict[str, float] = {}
+
+        # Statistics
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=max_history)
+        self.increases = 0
+        self.decreases = 0
+        self.overloads = 0
+        self.degraded = 0
+        self.total_wait_seconds = 0.0
+        self.acquired = 0
+
+    async def acquire(self) -> float:
+        """Wait for a free slot (first come, first served); returns seconds waited."""
+        started = time.monotonic()
+        if self.in_flight >= int(self.limit) or self._waiters:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                elif future.done() and not future.cancelled():
+                    # Slot was handed over just as we were cancelled; pass it on
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        else:
+            self.in_flight += 1
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait_seconds += waited
+        return waited
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters in arrival order."""
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def release(self, ttft: Optional[float] = None, success: bool = True, key: str = 'default') -> None:
+        """
+        Return a slot and feed the controller.
+
+        Args:
+            ttft: Time to first token of the attempt that answered, if the
+                  stream got that far
+            success: Whether the stream completed without error
+            key: Route or model the TTFT is compared against
+        """
+        saturated = self.in_flight >= self.limit / 2
+        self.in_flight -= 1
+        if success and ttft is not None:
+            baseline = self.ttft_baselines.get(key)
+            if baseline is not None and ttft > baseline * self.ttft_tolerance:
+                self.degraded += 1
+                self._decrease('ttft_degraded')
+            else:
+                self.ttft_baselines[key] = ttft if baseline is None else 0.9 * baseline + 0.1 * ttft
+                # Only grow while the limit is actually being used
+                if saturated and self.limit < self.max_limit:
+                    self._increase()
+        self._wake()
+
+    def record_overload(self) -> None:
+        """Report a 429/overloaded response from any attempt."""
+        self.overloads += 1
+        self._decrease('overload')
+
+    def _increase(self) -> None:
+        before = int(self.limit)
+        self.limit = min(self.limit + 1.0 / self.limit, float(self.max_limit))
+        if int(self.limit) > before:
+            self.increases += 1
+            self._record('increase')
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+        self.decreases += 1
+        self._record(reason)
+        logger.info(f"Concurrency limit lowered to {int(self.limit)} ({reason})")
+
+    def _record(self, reason: str) -> None:
+        self.history.append({'time': time.time(), 'limit': int(self.limit), 'reason': reason})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the current limit, occupancy and recent limit history."""
+        return {
+            'limit': int(self.limit),
+            'in_flight': self.in_flight,
+            'queued': len(self._waiters),
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'overloads': self.overloads,
+            'ttft_degraded': self.degraded,
+            'ttft_baseline_seconds': {key: round(value, 4) for key, value in self.ttft_baselines.items()},
+            'avg_wait_seconds': round(self.total_wait_seconds / self.acquired, 4) if self.acquired else 0.0,
+            'history': list(self.history)
+        }
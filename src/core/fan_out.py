@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Fan-Out Module
+Answers "summarize each"-style turns over several attachments with one
+concurrent sub-request per file instead of one serial request, then merges
+the per-file answers into a single response. Wall-clock time drops to roughly
+that of the slowest file.
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from .prompt_cache import add_usage, empty_usage
+from .stream_processor import ChatResult
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Only phrasing about the files themselves: "compare every column across these
+# files" is a cross-file question that isolated per-file runs cannot answer
+_FILE_NOUNS = r"(?:files?|attachments?|documents?|spreadsheets?|workbooks?|sheets?|csvs?|reports?)"
+_PER_FILE_TERMS = re.compile(
+    rf"\b(?:(?:for\s+)?(?:each|every)\s+(?:one\s+of\s+(?:the|these|those|my)\s+)?(?:(?:of\s+)?(?:the|these|those|my)\s+)?"
+    rf"(?:attached\s+|uploaded\s+)?{_FILE_NOUNS}|per[- ](?:file|attachment|document)|file[- ]by[- ]file"
+    rf"|{_FILE_NOUNS}\s+(?:individually|separately|one\s+by\s+one))\b",
+    re.IGNORECASE
+)
+
+
+class FanOutAnalyzer:
+    """Runs one sub-request per attached file and merges the results"""
+
+    def __init__(self, max_parallel: Optional[int] = None, enabled: Optional[bool] = None,
+                 min_files: int = 2):
+        """
+        Configure fan-out.
+
+        Args:
+            max_parallel: Concurrent sub-requests per turn; defaults to
+                          FAN_OUT_CONCURRENCY or 4
+            enabled: Fan out at all; defaults to FAN_OUT (true)
+            min_files: Fewest attachments worth fanning out
+        """
+        self.max_parallel = max_parallel or int(os.getenv('FAN_OUT_CONCURRENCY', '4'))
+        if enabled is None:
+            enabled = os.getenv('FAN_OUT', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+        self.min_files = min_files
+
+        # Statistics
+        self.runs = 0
+        self.files = 0
+        self.failed_files = 0
+        self.total_wall_seconds = 0.0
+        self.total_file_seconds = 0.0
+
+    def should_fan_out(self, user_input: str, file_attachments_info: Optional[List[Dict[str, str]]]) -> bool:
+        """Whether a turn asks for a per-file answer over enough attachments."""
+        return (
+            self.enabled
+            and len(file_attachments_info or []) >= self.min_files
+            and bool(_PER_FILE_TERMS.search(user_input or ''))
+        )
+
+    async def run(self, claude: Any, user_input: str, use_code_execution: bool,
+                  file_attachments_info: List[Dict[str, str]],
+                  on_progress: Optional[Callable[[str, str], None]] = None) -> ChatResult:
+        """
+        Analyse each file in its own sub-request and merge the answers.
+
+        Sub-requests run on history-free ClaudeCore.spawn() instances, so they
+        share the parent's clients, rate and concurrency limits. The user turn
+        and the merged answer are recorded in the parent's history.
+
+        Args:
+            claude: The conversation's ClaudeCore
+            on_progress: Optional (kind, text) callback; receives a "text" line
+                         as each file finishes
+
+        Returns:
+            Merged response_data whose "file_results" lists per-file name,
+            seconds, model and error flag
+        """
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        started = time.monotonic()
+
+        async def analyse(file_info: Dict[str, str]) -> Dict[str, Any]:
+            name = file_info.get('file_name', file_info.get('file_id', 'file'))
+            async with semaphore:
+                file_started = time.monotonic()
+                try:
+                    result = await claude.spawn().achat(
+                        user_input=f"{user_input}\n\n(Answer for the attached file {name} only.)",
+                        use_code_execution=use_code_execution,
+                        file_attachments_info=[file_info]
+                    )
+                except Exception as e:
+                    # achat() reports API outages itself; this is a local failure of one file
+                    logger.error(f"Fan-out analysis of {name} failed: {e}")
+                    result = ChatResult(assistant_message=f"Error: {e}", error=True)
+                seconds = time.monotonic() - file_started
+            if on_progress:
+                on_progress("text", f"✅ {name} ({seconds:.1f}s)\n")
+            return {'file_name': name, 'seconds': seconds, 'result': result}
+
+        outcomes = await asyncio.gather(*(analyse(file_info) for file_info in file_attachments_info))
+        wall = time.monotonic() - started
+
+        merged = self._merge(outcomes)
+        if all(entry['error'] for entry in merged.file_results):
+            # Like achat(), never record a failure as the assistant's answer
+            logger.warning(f"Fan-out over {len(outcomes)} files failed for every file; turn not recorded")
+        else:
+            claude.record_turn(user_input, file_attachments_info, merged, "analysed in parallel")
+
+        self.runs += 1
+        self.files += len(outcomes)
+        self.failed_files += sum(1 for entry in merged.file_results if entry['error'])
+        self.total_wall_seconds += wall
+        self.total_file_seconds += sum(outcome['seconds'] for outcome in outcomes)
+        logger.info(f"Fan-out over {len(outcomes)} files took {wall:.1f}s "
+                    f"(slowest file {max(o['seconds'] for o in outcomes):.1f}s)")
+        return merged
+
+    def _merge(self, outcomes: List[Dict[str, Any]]) -> ChatResult:
+        """Combine per-file results into one response_data, keeping file order."""
+        merged = ChatResult(usage=empty_usage(), file_results=[])
+        messages, code, output, errors = [], [], [], []
+        for outcome in outcomes:
+            name, result = outcome['file_name'], outcome['result']
+            failed = bool(result.get('error') or result.get('unavailable'))
+            messages.append(f"**{name}**\n\n{self._summary(result.get('assistant_message', ''))}")
+            if result.get('executed_code'):
+                code.append(f"# {name}\n{result['executed_code']}")
+            if result.get('code_output'):
+                output.append(f"[{name}]\n{result['code_output']}")
+            if result.get('code_errors'):
+                errors.append(f"[{name}]\n{result['code_errors']}")
+            merged.generated_figures.extend(result.get('generated_figures') or [])
+            merged.web_searches.extend(result.get('web_searches') or [])
+            add_usage(merged.usage, result.get('usage') or {})
+            if result.get('tool_used') and not merged.tool_used:
+                merged.tool_used = result['tool_used']
+            merged.model = merged.model or result.get('model')
+            merged.route = merged.route or result.get('route')
+            merged.file_results.append({
+                'file_name': name,
+                'seconds': round(outcome['seconds'], 2),
+                'model': result.get('model'),
+                'error': failed
+            })
+
+        merged.assistant_message = '\n\n'.join(messages)
+        merged.executed_code = '\n\n'.join(code) or None
+        merged.code_output = '\n\n'.join(output) or None
+        merged.code_errors = '\n\n'.join(errors) or None
+        if all(entry['error'] for entry in merged.file_results):
+            merged.error = True
+        if all(outcome['result'].get('unavailable') for outcome in outcomes):
+            merged.unavailable = True
+            merged.retry_in = max((outcome['result'].get('retry_in') or 0) for outcome in outcomes) or None
+        return merged
+
+    @staticmethod
+    def _summary(assistant_message: str) -> str:
+        """Reply text before the inline code transcript, as the report card shows it."""
+        return assistant_message.split('[Executed code:')[0].strip() or "See the code output below."
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return run counts and the average speedup over serial processing."""
+        return {
+            'enabled': self.enabled,
+            'max_parallel': self.max_parallel,
+            'runs': self.runs,
+            'files': self.files,
+            'failed_files': self.failed_files,
+            'avg_wall_seconds': round(self.total_wall_seconds / self.runs, 3) if self.runs else 0.0,
+            'speedup': round(self.total_file_seconds / self.total_wall_seconds, 2) if self.total_wall_seconds else None
+        }
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+File Index Module
+Content-addressed index of uploaded files keyed by the SHA-256 of their bytes,
+so re-attaching a known file reuses its Files API file_id instead of uploading
+it again. The index is shared by every conversation in the process and
+persisted to a JSON file across restarts; writes are debounced. In-memory
+reference counts keep a file_id held by one conversation from being deleted by
+another.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = '.file_index.json'
+_CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_fileobj(fileobj: BinaryIO) -> str:
+    """SHA-256 of a seekable binary file object's bytes; the object is rewound."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def make_key(digest: str, scope: str = '') -> str:
+    """
+    Index key for a content digest.
+
+    Args:
+        digest: Hex SHA-256 of the bytes
+        scope: Optional prefix (e.g. an API key fingerprint) so file_ids from
+               different workspaces never collide in one index
+    """
+    return f"{scope}:{digest}" if scope else digest
+
+
+def content_key(file_path: str, scope: str = '') -> str:
+    """Index key for a file on disk (see make_key)."""
+    with open(file_path, 'rb') as f:
+        return make_key(sha256_fileobj(f), scope)
+
+
+def scope_for_api_key(api_key: str) -> str:
+    """Short, non-reversible fingerprint of an API key."""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:12]
+
+
+class FileIndex:
+    """Thread-safe, persisted LRU map of content key -> uploaded file_id"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 verify_after: Optional[float] = None, save_interval: Optional[float] = None):
+        """
+        Load or create the index.
+
+        Args:
+            path: JSON file the index is persisted to; defaults to
+                  FILE_INDEX_PATH or .file_index.json ("" keeps it in memory)
+            max_entries: Entry cap, least recently used dropped first; defaults
+                         to FILE_INDEX_MAX_ENTRIES or 10000
+            verify_after: Seconds after which a hit is re-checked against the
+                          Files API before reuse; defaults to
+                          FILE_INDEX_VERIFY_SECONDS or 3600
+            save_interval: Minimum seconds between writes of the JSON file;
+                           changes in between are written by the next write
+                           or flush(). Defaults to FILE_INDEX_SAVE_SECONDS or 5
+        """
+        self.path = path if path is not None else os.getenv('FILE_INDEX_PATH', DEFAULT_INDEX_PATH)
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('FILE_INDEX_MAX_ENTRIES', '10000'))
+        self.verify_after = verify_after if verify_after is not None else float(os.getenv('FILE_INDEX_VERIFY_SECONDS', '3600'))
+        self.save_interval = save_interval if save_interval is not None else float(os.getenv('FILE_INDEX_SAVE_SECONDS', '5'))
+
+        # key -> {"file_id", "file_name", "size", "created", "last_used", "verified", "hits"}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        # file_id -> holders in this process (not persisted: holders do not survive a restart)
+        self._refs: Dict[str, int] = {}
+        self._dirty = False
+        self._last_saved = 0.0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.checks = 0
+        self.stale = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.writes = 0
+
+        self._load()
+
+    def _load(self) -> None:
+        """Read the persisted index, ignoring a missing or corrupt file."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries', {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable file index {self.path}: {e}")
+            return
+        for key, entry in sorted(entries.items(), key=lambda item: item[1].get('last_used', 0)):
+            if isinstance(entry, dict) and entry.get('file_id'):
+                self._entries[key] = entry
+        logger.info(f"Loaded {len(self._entries)} file index entries from {self.path}")
+
+    def _save(self) -> None:
+        """Mark the index changed and write it unless it was written within save_interval."""
+        self._dirty = True
+        if time.monotonic() - self._last_saved >= self.save_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Atomically write pending changes; failures are logged, not raised."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            if not self.path:
+                return
+            self._last_saved = time.monotonic()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(prefix='.file_index-', dir=directory)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'entries': self._entries}, f)
+                os.replace(temp_path, self.path)
+                self.writes += 1
+            except OSError as e:
+                logger.warning(f"Could not persist file index to {self.path}: {e}")
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the entry for key (counting a hit or miss), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            return dict(entry)
+
+    def needs_check(self, entry: Dict[str, Any]) -> bool:
+        """Whether an entry is old enough to confirm it still exists before reuse."""
+        return time.time() - entry.get('verified', 0) >= self.verify_after
+
+    def confirm(self, key: str, verified: bool = False) -> Optional[str]:
+        """
+        Record reuse of key's file_id and return it.
+
+        Args:
+            verified: The file was just confirmed to exist in the Files API
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            entry['last_used'] = now
+            entry['hits'] = entry.get('hits', 0) + 1
+            if verified:
+                self.checks += 1
+                entry['verified'] = now
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += entry.get('size', 0)
+            self.acquire(entry['file_id'])
+            self._save()
+            return entry['file_id']
+
+    def add(self, key: str, file_id: str, file_name: str, size: int) -> None:
+        """Index a freshly uploaded file, held once by its uploader."""
+        with self._lock:
+            now = time.time()
+            self._entries[key] = {
+                'file_id': file_id,
+                'file_name': file_name,
+                'size': size,
+                'created': now,
+                'last_used': now,
+                'verified': now,
+                'hits': 0
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self.acquire(file_id)
+            self._save()
+
+    def invalidate(self, key: str) -> None:
+        """Drop an entry whose file no longer exists in the Files API."""
+        with self._lock:
+            self.checks += 1
+            if self._entries.pop(key, None) is not None:
+                self.stale += 1
+                self.misses += 1
+                self._save()
+
+    def acquire(self, file_id: str) -> None:
+        """Record one more holder of file_id (done by confirm() and add())."""
+        with self._lock:
+            self._refs[file_id] = self._refs.get(file_id, 0) + 1
+
+    def release(self, file_id: str) -> int:
+        """
+        Drop one holder of file_id.
+
+        Returns:
+            Holders left; the file may only be deleted from the Files API at 0
+        """
+        with self._lock:
+            remaining = max(0, self._refs.get(file_id, 0) - 1)
+            if remaining:
+                self._refs[file_id] = remaining
+            else:
+                self._refs.pop(file_id, None)
+            return remaining
+
+    def discard_file_id(self, file_id: str) -> bool:
+        """Drop every entry pointing at file_id, e.g. after it was deleted."""
+        with self._lock:
+            self._refs.pop(file_id, None)
+            keys = [key for key, entry in self._entries.items() if entry['file_id'] == file_id]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._save()
+            return bool(keys)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._refs.clear()
+            self._save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'existence_checks': self.checks,
+            'stale': self.stale,
+            'evictions': self.evictions,
+            'bytes_saved': self.bytes_saved,
+            'held_file_ids': len(self._refs),
+            'writes': self.writes
+        }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON String Decoder
+Extracts the value of a top-level string field (e.g. "code" or "query") from
+tool-input JSON that arrives as partial_json deltas, decoding escape sequences
+correctly even when they are split across chunk boundaries.
+"""
+
+import re
+import codecs
+from typing import List, Optional, Union
+
+# Characters that end a run of literal string content
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t'
+}
+
+# Parser states
+_OUTSIDE = 0      # between tokens
+_IN_STRING = 1    # inside a string literal
+_ESCAPE = 2       # just read a backslash inside a string
+_UNICODE = 3      # reading the 4 hex digits of a \uXXXX escape
+
+
+class IncrementalJSONStringExtractor:
+    """
+    Streaming extractor for one top-level string field of a JSON object.
+
+    Feed it the partial_json deltas in order; each call to feed() returns only
+    the newly decoded characters of the target field. Total work is linear in
+    the number of characters fed, regardless of how the input is chunked.
+    """
+
+    def __init__(self, key: str):
+        """Create an extractor for the top-level string field named key."""
+        self.key = key
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._state = _OUTSIDE
+        self._depth = 0
+        self._expect_key = False
+        self._string_is_key = False
+        self._capturing = False
+        self._current_key: Optional[str] = None
+        self._key_parts: List[str] = []
+        self._hex = ''
+        self._pending_high: Optional[int] = None
+        self._parts: List[str] = []
+        self.complete = False
+
+    @property
+    def value(self) -> str:
+        """All characters of the target field decoded so far."""
+        if len(self._parts) > 1:
+            self._parts = [''.join(self._parts)]
+        return self._parts[0] if self._parts else ''
+
+    def feed(self, chunk: Union[str, bytes]) -> str:
+        """
+        Consume the next delta and return newly decoded target characters.
+
+        Args:
+            chunk: The next partial_json text, or raw UTF-8 bytes which may end
+                   in the middle of a multi-byte character
+
+        Returns:
+            The decoded characters of the target field contained in this chunk
+        """
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        if not chunk:
+            return ''
+
+        out: List[str] = []
+        i = 0
+        n = len(chunk)
+        while i < n:
+            state = self._state
+
+            if state == _IN_STRING:
+                match = _STRING_SPECIAL.search(chunk, i)
+                end = match.start() if match else n
+                if end > i:
+                    self._flush_high(out)
+                    self._emit(chunk[i:end], out)
+                if not match:
+                    break
+                if chunk[end] == '"':
+                    self._flush_high(out)
+                    self._end_string()
+                else:
+                    self._state = _ESCAPE
+                i = end + 1
+
+            elif state == _ESCAPE:
+                char = chunk[i]
+                i += 1
+                if char == 'u':
+                    self._hex = ''
+                    self._state = _UNICODE
+                    continue
+                self._flush_high(out)
+                self._emit(_SIMPLE_ESCAPES.get(char, char), out)
+                self._state = _IN_STRING
+
+            elif state == _UNICODE:
+                take = min(4 - len(self._hex), n - i)
+                self._hex += chunk[i:i + take]
+                i += take
+                if len(self._hex) == 4:
+                    self._emit_codepoint(int(self._hex, 16), out)
+                    self._state = _IN_STRING
+
+            else:
+                char = chunk[i]
+                i += 1
+                if char == '"':
+                    self._start_string()
+                elif char in '{[':
+                    self._depth += 1
+                    self._expect_key = char == '{' and self._depth == 1
+                elif char in '}]':
+                    self._depth -= 1
+                elif char == ',' and self._depth == 1:
+                    self._expect_key = True
+                elif char == ':' and self._depth == 1:
+                    self._expect_key = False
+
+        if out:
+            text = ''.join(out)
+            self._parts.append(text)
+            return text
+        return ''
+
+    def _start_string(self) -> None:
+        """Enter a string literal and work out whether it is a key or our value."""
+        self._state = _IN_STRING
+        self._string_is_key = self._depth == 1 and self._expect_key
+        self._capturing = (
+            not self._string_is_key
+            and self._depth == 1
+            and self._current_key == self.key
+            and not self.complete
+        )
+        if self._string_is_key:
+            self._key_parts = []
+
+    def _end_string(self) -> None:
+        """Leave a string literal, recording keys and completing the value."""
+        self._state = _OUTSIDE
+        if self._string_is_key:
+            self._current_key = ''.join(self._key_parts)
+            self._key_parts = []
+        elif self._capturing:
+            self.complete = True
+        elif self._depth == 1:
+            self._current_key = None
+        self._capturing = False
+        self._string_is_key = False
+
+    def _emit(self, text: str, out: List[str]) -> None:
+        """Route decoded string content to the key buffer or the output."""
+        if self._capturing:
+            out.append(text)
+        elif self._string_is_key:
+            self._key_parts.append(text)
+
+    def _emit_codepoint(self, codepoint: int, out: List[str]) -> None:
+        """Emit a \\uXXXX escape, pairing UTF-16 surrogates across escapes."""
+        if self._pending_high is not None:
+            if 0xDC00 <= codepoint <= 0xDFFF:
+                combined = 0x10000 + ((self._pending_high - 0xD800) << 10) + (codepoint - 0xDC00)
+                self._pending_high = None
+                self._emit(chr(combined), out)
+                return
+            self._flush_high(out)
+        if 0xD800 <= codepoint <= 0xDBFF:
+            self._pending_high = codepoint
+        else:
+            self._emit(chr(codepoint), out)
+
+    def _flush_high(self, out: List[str]) -> None:
+        """Emit an unpaired high surrogate as-is, matching json.loads."""
+        if self._pending_high is not None:
+            high = self._pending_high
+            self._pending_high = None
+            self._emit(chr(high), out)
+
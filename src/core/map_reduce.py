@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Map-Reduce Module
+Analyses tabular attachments too large for one code execution turn. The file
+is split locally into row-range CSV shards, each shard is uploaded and
+analysed concurrently with the user's prompt (map), and a final prompt
+combines the partial results into one answer (reduce).
+"""
+
+import os
+import csv
+import time
+import shutil
+import asyncio
+import tempfile
+import importlib.util
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from .prompt_cache import add_usage
+from .stream_processor import ChatResult
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CSV_EXTENSIONS = ('.csv', '.tsv')
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+MAP_PROMPT = (
+    "{user_input}\n\n"
+    "The attached CSV is shard {index} of {total} of {file_name} (data rows {start}-{end}, "
+    "with the header row). Analyse only this shard and report partial results that can be "
+    "combined with the other shards: exact counts, sums, minima and maxima rather than only "
+    "averages or percentages."
+)
+REDUCE_PROMPT = (
+    "{user_input}\n\n"
+    "{file_name} was too large to analyse at once, so it was split into {total} row-range "
+    "shards that were analysed separately. Combine the partial results below into one final "
+    "answer for the whole file.{missing}\n\n{partials}"
+)
+
+
+def openpyxl_available() -> bool:
+    """Whether the optional openpyxl package is installed (needed for .xlsx)."""
+    return importlib.util.find_spec("openpyxl") is not None
+
+
+def iter_table_rows(path: str) -> Iterator[Sequence[Any]]:
+    """Yield the rows of a CSV/TSV or the first worksheet of an Excel file, header first."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield ['' if value is None else value for value in row]
+        finally:
+            workbook.close()
+    else:
+        with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+            yield from csv.reader(f, delimiter='\t' if extension == '.tsv' else ',')
+
+
+def split_table(path: str, shard_rows: int, out_dir: str) -> List[Dict[str, Any]]:
+    """
+    Split a tabular file into CSV shards of at most shard_rows data rows,
+    each starting with the header row.
+
+    Returns:
+        One dict per shard with "path", "start_row" and "end_row" (1-based data rows)
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    shards: List[Dict[str, Any]] = []
+    rows = iter_table_rows(path)
+    header = next(rows, None)
+    if header is None:
+        return shards
+
+    writer = handle = None
+    row_number = 0
+    try:
+        for row in rows:
+            if row_number % shard_rows == 0:
+                if handle:
+                    handle.close()
+                shard_path = os.path.join(out_dir, f"{stem}.part{len(shards) + 1:03d}.csv")
+                handle = open(shard_path, 'w', encoding='utf-8', newline='')
+                writer = csv.writer(handle)
+                writer.writerow(header)
+                shards.append({'path': shard_path, 'start_row': row_number + 1, 'end_row': row_number + 1})
+            writer.writerow(row)
+            row_number += 1
+            shards[-1]['end_row'] = row_number
+    finally:
+        if handle:
+            handle.close()
+    return shards
+
+
+class MapReduceAnalyzer:
+    """Shards a large table, analyses the shards concurrently and combines the results"""
+
+    def __init__(self, shard_rows: Optional[int] = None, max_parallel: Optional[int] = None,
+                 min_bytes: Optional[int] = None, enabled: Optional[bool] = None):
+        """
+        Configure map-reduce analysis.
+
+        Args:
+            shard_rows: Data rows per shard; defaults to MAP_REDUCE_SHARD_ROWS or 200000
+            max_parallel: Shards analysed at once; defaults to
+                          MAP_REDUCE_CONCURRENCY or 4
+            min_bytes: Smallest attachment analysed this way; defaults to
+                       MAP_REDUCE_MIN_MB (25) megabytes
+            enabled: Use map-reduce at all; defaults to MAP_REDUCE (true)
+        """
+        self.shard_rows = shard_rows or int(os.getenv('MAP_REDUCE_SHARD_ROWS', '200000'))
+        self.max_parallel = max_parallel or int(os.getenv('MAP_REDUCE_CONCURRENCY', '4'))
+        self.min_bytes = min_bytes if min_bytes is not None else int(float(os.getenv('MAP_REDUCE_MIN_MB', '25')) * 1024 * 1024)
+        if enabled is None:
+            enabled = os.getenv('MAP_REDUCE', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+
+        # Statistics
+        self.runs = 0
+        self.shards = 0
+        self.failed_shards = 0
+        self.rows = 0
+        self.total_wall_seconds = 0.0
+
+    def should_map_reduce(self, file_path: str, size: Optional[int] = None) -> bool:
+        """Whether a local attachment is a table large enough to shard."""
+        extension = os.path.splitext(file_path)[1].lower()
+        if not self.enabled or extension not in CSV_EXTENSIONS + EXCEL_EXTENSIONS:
+            return False
+        if extension in EXCEL_EXTENSIONS and not openpyxl_available():
+            logger.info("openpyxl is not installed; large Excel files are sent whole")
+            return False
+        if size is not None:
+            return size >= self.min_bytes
+        try:
+            return os.path.getsize(file_path) >= self.min_bytes
+        except OSError:
+            return False
+
+    async def run(self, claude: Any, user_input: str, file_path: str, file_name: Optional[str] = None,
+                  on_progress: Optional[Callable[[str, str], None]] = None, record: bool = True,
+                  use_code_execution: bool = True) -> ChatResult:
+        """
+        Answer user_input over a large local table.
+
+        Shards are uploaded and analysed on history-free ClaudeCore.spawn()
+        instances and deleted afterwards; the question and the final answer
+        are recorded in the parent conversation.
+
+        Args:
+            claude: The conversation's ClaudeCore
+            file_path: Local copy of the table
+            file_name: Name shown to the user; defaults to the file's basename
+            on_progress: Optional (kind, text) callback receiving a "text" line
+                         per stage and per finished shard
+            record: Record the turn in the parent conversation
+            use_code_execution: Whether the map and reduce requests may use the
+                                code execution tool (False for /nocode)
+
+        Returns:
+            The reduce step's response_data, with per-shard "file_results"
+            timings and usage summed over every request
+        """
+        file_name = file_name or os.path.basename(file_path)
+        started = time.monotonic()
+
+        def progress(line: str) -> None:
+            if on_progress:
+                on_progress("text", line + "\n")
+
+        out_dir = tempfile.mkdtemp(prefix="mapreduce-")
+        try:
+            progress(f"📂 Splitting {file_name} into shards of {self.shard_rows:,} rows...")
+            shards = await asyncio.to_thread(split_table, file_path, self.shard_rows, out_dir)
+            if not shards:
+                return ChatResult(assistant_message=f"{file_name} contains no data rows.")
+            total = len(shards)
+            progress(f"Analysing {total} shards ({self.max_parallel} at a time)...")
+
+            semaphore = asyncio.Semaphore(self.max_parallel)
+            done = 0
+
+            async def analyse(index: int, shard: Dict[str, Any]) -> Dict[str, Any]:
+                nonlocal done
+                async with semaphore:
+                    shard_started = time.monotonic()
+                    child = claude.spawn()
+                    shard_name = os.path.basename(shard['path'])
+                    try:
+                        file_id = await asyncio.to_thread(child.upload_file, shard['path'])
+                        if not file_id:
+                            raise RuntimeError(f"upload of {shard_name} failed")
+                        result = await child.achat(
+                            user_input=MAP_PROMPT.format(
+                                user_input=user_input, index=index, total=total, file_name=file_name,
+                                start=shard['start_row'], end=shard['end_row']
+                            ),
+                            use_code_execution=use_code_execution,
+                            file_attachments_info=[{'file_id': file_id, 'file_name': shard_name}]
+                        )
+                    except Exception as e:
+                        # achat() reports API outages itself; this is a local failure of one shard
+                        logger.error(f"Map step for {shard_name} failed: {e}")
+                        result = ChatResult(assistant_message=f"Error: {e}", error=True)
+                    finally:
+                        if shard_name in child.uploaded_files:
+                            await asyncio.to_thread(child.delete_file, shard_name)
+                    seconds = time.monotonic() - shard_started
+                failed = bool(result.get('error') or result.get('unavailable'))
+                done += 1
+                progress(f"{'❌' if failed else '✅'} Shard {index}/{total} (rows {shard['start_row']:,}-"
+                         f"{shard['end_row']:,}) {seconds:.1f}s - {done}/{total} done")
+                return dict(shard, index=index, seconds=seconds, result=result, failed=failed)
+
+            outcomes = await asyncio.gather(*(analyse(i, shard) for i, shard in enumerate(shards, 1)))
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+        succeeded = [outcome for outcome in outcomes if not outcome['failed']]
+        if succeeded:
+            progress("🧮 Combining partial results...")
+            response_data = await claude.spawn().achat(
+                user_input=self._reduce_prompt(user_input, file_name, outcomes),
+                use_code_execution=use_code_execution
+            )
+        else:
+            response_data = outcomes[0]['result']
+
+        for outcome in outcomes:
+            if outcome['result'] is not response_data:
+                add_usage(response_data.usage, outcome['result'].get('usage') or {})
+        response_data.file_results = [
+            {
+                'file_name': f"Shard {outcome['index']} (rows {outcome['start_row']:,}-{outcome['end_row']:,})",
+                'seconds': round(outcome['seconds'], 2),
+                'model': outcome['result'].get('model'),
+                'error': outcome['failed']
+            }
+            for outcome in outcomes
+        ]
+
+        # Every shard ran; a failed split or upload raised before this point
+        rows = outcomes[-1]['end_row']
+        if record:
+            claude.track_file_access(file_name, f"analysed in {len(outcomes)} shards")
+            claude.record_turn(user_input, None, response_data)
+
+        wall = time.monotonic() - started
+        self.runs += 1
+        self.shards += len(outcomes)
+        self.failed_shards += len(outcomes) - len(succeeded)
+        self.rows += rows
+        self.total_wall_seconds += wall
+        logger.info(f"Map-reduce over {file_name}: {len(outcomes)} shards, {rows} rows in {wall:.1f}s")
+        return response_data
+
+    @staticmethod
+    def _reduce_prompt(user_input: str, file_name: str, outcomes: List[Dict[str, Any]]) -> str:
+        """Build the reduce prompt from the successful shards' answers and outputs."""
+        partials = []
+        missing = []
+        for outcome in outcomes:
+            label = f"Shard {outcome['index']} (rows {outcome['start_row']}-{outcome['end_row']})"
+            if outcome['failed']:
+                missing.append(label)
+                continue
+            result = outcome['result']
+            text = result.get('assistant_message', '').split('[Executed code:')[0].strip()
+            if result.get('code_output'):
+                text += f"\n\nCode output:\n{result['code_output']}"
+            partials.append(f"### {label}\n{text}")
+        note = f" These shards failed and are missing: {', '.join(missing)}." if missing else ""
+        return REDUCE_PROMPT.format(
+            user_input=user_input, file_name=file_name, total=len(outcomes),
+            missing=note, partials='\n\n'.join(partials)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return run, shard and row counters."""
+        return {
+            'enabled': self.enabled,
+            'shard_rows': self.shard_rows,
+            'max_parallel': self.max_parallel,
+            'runs': self.runs,
+            'shards': self.shards,
+            'failed_shards': self.failed_shards,
+            'rows': self.rows,
+            'avg_wall_seconds': round(self.total_wall_seconds / self.runs, 3) if self.runs else 0.0
+        }
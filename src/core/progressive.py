@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Progressive Analysis Module
+Sample-first answers for large tabular attachments. One streaming pass builds
+an exact whole-file column profile and a stratified row sample; the sample
+and profile give a preliminary answer in seconds while the full-file analysis
+(map-reduce for very large tables) runs afterwards and supersedes it.
+"""
+
+import os
+import csv
+import time
+import random
+import shutil
+import asyncio
+import tempfile
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .map_reduce import CSV_EXTENSIONS, EXCEL_EXTENSIONS, iter_table_rows, openpyxl_available
+from .prompt_cache import add_usage
+from .stream_processor import ChatResult
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Columns are stratified on when a text column has this many distinct values or fewer
+MAX_STRATA = 50
+# Distinct values tracked per column before cardinality is reported as a lower bound
+MAX_DISTINCT = 1000
+# Rows inspected to choose the stratification column
+STRATA_PROBE_ROWS = 1000
+
+PRELIMINARY_PROMPT = (
+    "{user_input}\n\n"
+    "Give a quick preliminary answer. The attached CSV is a stratified random sample of "
+    "{sample_rows:,} of the {total_rows:,} data rows in {file_name}{strata}. Exact whole-file "
+    "column profile:\n{profile}\n\n"
+    "Use the profile's exact figures where they answer the question and say which figures "
+    "are estimates from the sample."
+)
+
+# User side of the exchange appended when the preliminary answer was already compacted
+FULL_ANALYSIS_NOTE = "[Full analysis of {file_name} finished] {user_input}"
+# Private history key tagging a recorded preliminary answer for apply()
+PROGRESSIVE_ID_KEY = '_progressive_id'
+
+
+class ColumnProfile:
+    """Streaming statistics for one column"""
+
+    __slots__ = ('name', 'non_empty', 'numeric', 'integers', 'minimum', 'maximum', 'total', 'values')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.non_empty = 0
+        self.numeric = 0
+        self.integers = 0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.total = 0.0
+        # Value counts until the column proves high-cardinality, then None
+        self.values: Optional[Counter] = Counter()
+
+    def add(self, value: Any) -> None:
+        if value is None or value == '':
+            return
+        self.non_empty += 1
+        text = value if isinstance(value, str) else str(value)
+        if self.values is not None:
+            self.values[text] += 1
+            if len(self.values) > MAX_DISTINCT:
+                self.values = None
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return
+        self.numeric += 1
+        if number.is_integer():
+            self.integers += 1
+        self.total += number
+        self.minimum = number if self.minimum is None else min(self.minimum, number)
+        self.maximum = number if self.maximum is None else max(self.maximum, number)
+
+    @property
+    def kind(self) -> str:
+        if not self.non_empty:
+            return 'empty'
+        if self.numeric == self.non_empty:
+            return 'integer' if self.integers == self.numeric else 'number'
+        return 'text'
+
+    def describe(self, total_rows: int) -> Dict[str, Any]:
+        """Summary dict of the column."""
+        summary: Dict[str, Any] = {
+            'name': self.name,
+            'type': self.kind,
+            'non_empty': self.non_empty,
+            'empty': total_rows - self.non_empty,
+            'distinct': len(self.values) if self.values is not None else f">{MAX_DISTINCT}"
+        }
+        if self.kind in ('integer', 'number'):
+            summary.update({
+                'min': self.minimum,
+                'max': self.maximum,
+                'sum': round(self.total, 6),
+                'mean': round(self.total / self.numeric, 6)
+            })
+        elif self.values is not None:
+            summary['top'] = self.values.most_common(5)
+        return summary
+
+
+def _choose_strata_column(header: Sequence[Any], probe: List[Sequence[Any]]) -> Optional[int]:
+    """Index of the low-cardinality text column with the fewest distinct values, if any."""
+    best, best_distinct = None, MAX_STRATA + 1
+    for index in range(len(header)):
+        values = {row[index] for row in probe if index < len(row) and row[index] not in (None, '')}
+        if not 2 <= len(values) <= MAX_STRATA:
+            continue
+        if all(isinstance(value, (int, float)) or str(value).replace('.', '', 1).lstrip('-').isdigit() for value in values):
+            continue
+        if len(values) < best_distinct:
+            best, best_distinct = index, len(values)
+    return best
+
+
+def profile_and_sample(path: str, sample_rows: int, sample_path: str, seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Profile every column of a table and write a stratified row sample as CSV.
+
+    Rows are stratified on a low-cardinality text column (if there is one)
+    with a reservoir per stratum, so small categories are represented; the
+    sample is allocated proportionally with at least one row per stratum.
+
+    Returns:
+        {"total_rows", "sample_rows", "strata_column", "columns": [column summaries]}
+    """
+    rng = random.Random(seed)
+    rows = iter_table_rows(path)
+    header = [str(name) for name in next(rows, [])]
+    columns = [ColumnProfile(name) for name in header]
+
+    probe: List[Sequence[Any]] = []
+    strata_index: Optional[int] = None
+    reservoirs: Dict[Any, List[Any]] = {}
+    counts: Counter = Counter()
+    total_rows = 0
+
+    def sample(row_number: int, row: Sequence[Any]) -> None:
+        key = row[strata_index] if strata_index is not None and strata_index < len(row) else None
+        if key not in reservoirs and len(reservoirs) >= MAX_STRATA:
+            key = '__other__'
+        counts[key] += 1
+        reservoir = reservoirs.setdefault(key, [])
+        if len(reservoir) < sample_rows:
+            reservoir.append((row_number, row))
+        else:
+            slot = rng.randrange(counts[key])
+            if slot < sample_rows:
+                reservoir[slot] = (row_number, row)
+
+    for row in rows:
+        total_rows += 1
+        for column, value in zip(columns, row):
+            column.add(value)
+        if strata_index is None and len(probe) < STRATA_PROBE_ROWS:
+            probe.append(row)
+            if len(probe) == STRATA_PROBE_ROWS:
+                strata_index = _choose_strata_column(header, probe)
+                for number, probed in enumerate(probe, 1):
+                    sample(number, probed)
+            continue
+        sample(total_rows, row)
+    if probe and len(probe) < STRATA_PROBE_ROWS:
+        # Short table: every row was probed and none sampled yet
+        strata_index = _choose_strata_column(header, probe)
+        for number, probed in enumerate(probe, 1):
+            sample(number, probed)
+
+    chosen = []
+    for key, reservoir in reservoirs.items():
+        share = max(1, round(sample_rows * counts[key] / total_rows)) if total_rows else 0
+        chosen.extend(reservoir[:share])
+    chosen.sort(key=lambda entry: entry[0])
+
+    with open(sample_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(row for _, row in chosen)
+
+    return {
+        'total_rows': total_rows,
+        'sample_rows': len(chosen),
+        'strata_column': header[strata_index] if strata_index is not None else None,
+        'columns': [column.describe(total_rows) for column in columns]
+    }
+
+
+def _number(value: float) -> str:
+    """Full-precision figure with thousands separators."""
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.6f}".rstrip('0')
+
+
+def format_profile(profile: Dict[str, Any]) -> str:
+    """Render a profile as compact prompt text."""
+    lines = []
+    for column in profile['columns']:
+        line = f"- {column['name']} ({column['type']}): {column['non_empty']:,} non-empty, {column['distinct']} distinct"
+        if 'sum' in column:
+            line += (f", min {_number(column['min'])}, max {_number(column['max'])}, "
+                     f"sum {_number(column['sum'])}, mean {_number(column['mean'])}")
+        elif column.get('top'):
+            line += ", top: " + ", ".join(f"{value} ({count:,})" for value, count in column['top'])
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+class ProgressiveAnalyzer:
+    """Preliminary answers from a sample, then the full analysis"""
+
+    def __init__(self, sample_rows: Optional[int] = None, min_bytes: Optional[int] = None,
+                 enabled: Optional[bool] = None, map_reduce: Optional[Any] = None):
+        """
+        Configure progressive answers.
+
+        Args:
+            sample_rows: Rows in the preliminary sample; defaults to
+                         PROGRESSIVE_SAMPLE_ROWS or 2000
+            min_bytes: Smallest table answered progressively; defaults to
+                       PROGRESSIVE_MIN_MB (10) megabytes
+            enabled: Answer progressively at all; defaults to PROGRESSIVE_ANSWERS (true)
+            map_reduce: Optional MapReduceAnalyzer used for the full analysis
+                        of tables it accepts; others are uploaded whole
+        """
+        self.sample_rows = sample_rows or int(os.getenv('PROGRESSIVE_SAMPLE_ROWS', '2000'))
+        self.min_bytes = min_bytes if min_bytes is not None else int(float(os.getenv('PROGRESSIVE_MIN_MB', '10')) * 1024 * 1024)
+        if enabled is None:
+            enabled = os.getenv('PROGRESSIVE_ANSWERS', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+        self.map_reduce = map_reduce
+
+        # Statistics
+        self.preliminary_runs = 0
+        self.full_runs = 0
+        self.full_failures = 0
+        self.appended = 0
+        self.total_preliminary_seconds = 0.0
+        self.total_full_seconds = 0.0
+
+    def should_progress(self, file_path: str, size: Optional[int] = None) -> bool:
+        """Whether a local attachment is a table large enough for a sample-first answer."""
+        extension = os.path.splitext(file_path)[1].lower()
+        if not self.enabled or extension not in CSV_EXTENSIONS + EXCEL_EXTENSIONS:
+            return False
+        if extension in EXCEL_EXTENSIONS and not openpyxl_available():
+            return False
+        if size is not None:
+            return size >= self.min_bytes
+        try:
+            return os.path.getsize(file_path) >= self.min_bytes
+        except OSError:
+            return False
+
+    async def preliminary(self, claude: Any, user_input: str, file_path: str, file_name: Optional[str] = None,
+                          on_progress: Optional[Callable[[str, str], None]] = None,
+                          use_code_execution: bool = True) -> ChatResult:
+        """
+        Answer from a stratified sample plus an exact column profile.
+
+        The sample is uploaded and analysed on a ClaudeCore.spawn() instance;
+        the turn is recorded in the parent conversation, and apply() later
+        replaces the recorded answer with complete()'s. A failed sample run is
+        returned as is, without being recorded.
+
+        Returns:
+            response_data with "preliminary" set to the sample and row counts,
+            or the failed sample run's response_data (its "error" flag set)
+        """
+        file_name = file_name or os.path.basename(file_path)
+        started = time.monotonic()
+        if on_progress:
+            on_progress("text", f"🔎 Profiling {file_name} and drawing a {self.sample_rows:,}-row sample...\n")
+
+        out_dir = tempfile.mkdtemp(prefix="sample-")
+        sample_name = f"{os.path.splitext(file_name)[0]}.sample.csv"
+        sample_path = os.path.join(out_dir, sample_name)
+        child = claude.spawn()
+        try:
+            profile = await asyncio.to_thread(profile_and_sample, file_path, self.sample_rows, sample_path)
+            file_id = await asyncio.to_thread(child.upload_file, sample_path)
+            if not file_id:
+                raise RuntimeError(f"upload of {sample_name} failed")
+            strata = f", stratified by {profile['strata_column']}" if profile['strata_column'] else ""
+            response_data = await child.achat(
+                user_input=PRELIMINARY_PROMPT.format(
+                    user_input=user_input, sample_rows=profile['sample_rows'], total_rows=profile['total_rows'],
+                    file_name=file_name, strata=strata, profile=format_profile(profile)
+                ),
+                use_code_execution=use_code_execution,
+                file_attachments_info=[{'file_id': file_id, 'file_name': sample_name}],
+                on_progress=on_progress
+            )
+        finally:
+            if sample_name in child.uploaded_files:
+                await asyncio.to_thread(child.delete_file, sample_name)
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+        if response_data.get('error') or response_data.get('unavailable'):
+            logger.warning(f"Preliminary analysis of {file_name} failed: {response_data.get('assistant_message')}")
+            return response_data
+
+        response_data.preliminary = {
+            'id': os.urandom(8).hex(),
+            'sample_rows': profile['sample_rows'],
+            'total_rows': profile['total_rows'],
+            'strata_column': profile['strata_column'],
+            'seconds': round(time.monotonic() - started, 2)
+        }
+        claude.track_file_access(file_name, f"sampled ({profile['sample_rows']:,} of {profile['total_rows']:,} rows)")
+        claude.record_turn(user_input, None, response_data)
+        claude.conversation_history[-1][PROGRESSIVE_ID_KEY] = response_data.preliminary['id']
+
+        self.preliminary_runs += 1
+        self.total_preliminary_seconds += time.monotonic() - started
+        return response_data
+
+    async def complete(self, claude: Any, user_input: str, file_path: str, file_name: Optional[str],
+                       on_progress: Optional[Callable[[str, str], None]] = None,
+                       use_code_execution: bool = True) -> ChatResult:
+        """
+        Run the full-file analysis without touching the parent conversation.
+
+        This may take minutes, so it runs outside the conversation's turn
+        order; pass the result to apply() from within it.
+
+        Raises:
+            RuntimeError: If the full analysis could not be run
+        """
+        file_name = file_name or os.path.basename(file_path)
+        started = time.monotonic()
+        try:
+            if self.map_reduce is not None and self.map_reduce.should_map_reduce(file_path):
+                response_data = await self.map_reduce.run(
+                    claude, user_input, file_path, file_name, on_progress=on_progress, record=False,
+                    use_code_execution=use_code_execution
+                )
+            else:
+                child = claude.spawn()
+                file_id = await asyncio.to_thread(child.upload_file, file_path)
+                if not file_id:
+                    raise RuntimeError(f"upload of {file_name} failed")
+                try:
+                    response_data = await child.achat(
+                        user_input=user_input,
+                        use_code_execution=use_code_execution,
+                        file_attachments_info=[{'file_id': file_id, 'file_name': file_name}],
+                        on_progress=on_progress
+                    )
+                finally:
+                    await asyncio.to_thread(child.delete_file, os.path.basename(file_path))
+            if response_data.get('error') or response_data.get('unavailable'):
+                raise RuntimeError(response_data.get('assistant_message'))
+        except Exception:
+            self.full_failures += 1
+            raise
+
+        self.full_runs += 1
+        self.total_full_seconds += time.monotonic() - started
+        return response_data
+
+    def apply(self, claude: Any, user_input: str, file_name: str, preliminary: ChatResult,
+              response_data: ChatResult) -> bool:
+        """
+        Replace the recorded preliminary answer with the full one.
+
+        Call between turns (e.g. through the conversation's mailbox). The entry
+        is found by the id preliminary() tagged it with, so copies of it still
+        match. It is replaced rather than edited, so its cached token count is
+        dropped and a compaction summarising it concurrently is discarded. If
+        a compaction already folded the preliminary answer into a summary, the
+        full answer is appended as a new exchange instead; after /reset it is
+        not recorded.
+
+        Returns:
+            True if the full answer was recorded
+        """
+        progressive_id = preliminary.preliminary['id']
+        history = claude.conversation_history
+        for index in range(len(history) - 1, -1, -1):
+            if history[index].get(PROGRESSIVE_ID_KEY) == progressive_id:
+                history[index] = {"role": "assistant", "content": response_data.assistant_message}
+                break
+        else:
+            if not any(entry.get(PROGRESSIVE_ID_KEY) == progressive_id for entry in claude.history_archive):
+                logger.info(f"Conversation was reset; full analysis of {file_name} not recorded")
+                return False
+            history.append({"role": "user", "content": FULL_ANALYSIS_NOTE.format(file_name=file_name, user_input=user_input)})
+            history.append({"role": "assistant", "content": response_data.assistant_message})
+            self.appended += 1
+        claude.track_file_access(file_name, "analysed in full")
+        add_usage(claude.usage_totals, response_data.usage)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return preliminary and full analysis counts and average latencies."""
+        return {
+            'enabled': self.enabled,
+            'sample_rows': self.sample_rows,
+            'preliminary_runs': self.preliminary_runs,
+            'full_runs': self.full_runs,
+            'full_failures': self.full_failures,
+            'appended_after_compaction': self.appended,
+            'avg_preliminary_seconds': round(self.total_preliminary_seconds / self.preliminary_runs, 3) if self.preliminary_runs else 0.0,
+            'avg_full_seconds': round(self.total_full_seconds / self.full_runs, 3) if self.full_runs else 0.0
+        }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Prompt Cache Module
+Places Anthropic prompt-cache breakpoints (cache_control markers) on the
+stable prefix of a request: the tool definitions and the most recent user
+turns, which cover every earlier turn and file attachment before them.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# The API accepts at most four cache_control markers per request
+MAX_CACHE_BREAKPOINTS = 4
+
+USAGE_FIELDS = (
+    'input_tokens',
+    'output_tokens',
+    'cache_creation_input_tokens',
+    'cache_read_input_tokens'
+)
+
+
+def empty_usage() -> Dict[str, int]:
+    """Return a zeroed usage record in the shape reported in response_data."""
+    return {field: 0 for field in USAGE_FIELDS}
+
+
+def _mark_last_block(message: Dict[str, Any], cache_control: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Return a copy of message whose final content block carries cache_control."""
+    content = message.get('content')
+    if isinstance(content, str):
+        if not content:
+            return None
+        blocks = [{"type": "text", "text": content}]
+    elif isinstance(content, list) and content:
+        blocks = list(content)
+    else:
+        return None
+
+    last = dict(blocks[-1])
+    last['cache_control'] = dict(cache_control)
+    blocks[-1] = last
+    marked = dict(message)
+    marked['content'] = blocks
+    return marked
+
+
+def apply_cache_breakpoints(messages: List[Dict[str, Any]],
+                            tools: Optional[List[Dict[str, Any]]] = None,
+                            message_breakpoints: int = 2,
+                            ttl: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """
+    Add cache_control markers without mutating the caller's history.
+
+    The latest user turn is marked so this request writes the whole prefix to
+    the cache, and the user turn before it is marked so the prefix written by
+    the previous request is read back. The tool definitions get their own
+    marker so they stay cached even when the conversation is reset.
+
+    Args:
+        messages: Conversation history in API format
+        tools: Tool definitions for the request, if any
+        message_breakpoints: How many of the most recent user turns to mark
+        ttl: Optional cache lifetime such as "1h"; the API default is 5 minutes
+
+    Returns:
+        (messages, tools) copies carrying the markers
+    """
+    cache_control = {"type": "ephemeral"}
+    if ttl:
+        cache_control["ttl"] = ttl
+
+    marked_tools = tools
+    budget = MAX_CACHE_BREAKPOINTS
+    if tools:
+        marked_tools = list(tools)
+        last_tool = dict(marked_tools[-1])
+        last_tool['cache_control'] = dict(cache_control)
+        marked_tools[-1] = last_tool
+        budget -= 1
+
+    remaining = min(message_breakpoints, budget)
+    marked_messages = list(messages)
+    for index in range(len(marked_messages) - 1, -1, -1):
+        if remaining <= 0:
+            break
+        if marked_messages[index].get('role') != 'user':
+            continue
+        marked = _mark_last_block(marked_messages[index], cache_control)
+        if marked is not None:
+            marked_messages[index] = marked
+            remaining -= 1
+
+    return marked_messages, marked_tools
+
+
+def read_usage(usage: Any, into: Dict[str, int]) -> None:
+    """Copy the token counts present on an SDK usage object into a usage record."""
+    if usage is None:
+        return
+    for field in USAGE_FIELDS:
+        value = getattr(usage, field, None)
+        if isinstance(value, int):
+            into[field] = value
+
+
+def add_usage(total: Dict[str, int], usage: Dict[str, int]) -> None:
+    """Add one usage record's token counts into another."""
+    for field in USAGE_FIELDS:
+        total[field] = total.get(field, 0) + usage.get(field, 0)
+
+
+def cache_hit_rate(usage: Dict[str, int]) -> float:
+    """Fraction of prompt tokens that were served from the cache."""
+    prompt_tokens = (
+        usage.get('input_tokens', 0)
+        + usage.get('cache_creation_input_tokens', 0)
+        + usage.get('cache_read_input_tokens', 0)
+    )
+    if not prompt_tokens:
+        return 0.0
+    return round(usage.get('cache_read_input_tokens', 0) / prompt_tokens, 4)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Rate Limiting Module
+Process-wide token buckets for the organization's requests-per-minute and
+input/output-tokens-per-minute limits. Each turn's cost is estimated before
+it is sent; the turn is admitted when budget is available, otherwise it waits
+(bounded) for the buckets to refill instead of triggering a burst of 429s.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when admitting a turn would take longer than the maximum wait."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Rate limit reached; capacity frees up in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """
+    Per-minute bucket refilled continuously.
+
+    The balance may go negative: a reservation is debited at once and the
+    caller waits until the debt is repaid, which keeps admissions first come,
+    first served without holding a lock while waiting.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.balance = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.balance = min(self.capacity, self.balance + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until amount could be debited without going negative."""
+        deficit = min(amount, self.capacity) - self.balance
+        return deficit / self.rate if deficit > 0 else 0.0
+
+
+class RateLimiter:
+    """Admission control for RPM, input TPM and output TPM limits"""
+
+    def __init__(self, requests_per_minute: Optional[int] = None,
+                 input_tokens_per_minute: Optional[int] = None,
+                 output_tokens_per_minute: Optional[int] = None,
+                 max_wait_seconds: Optional[float] = None,
+                 max_samples: int = 1000):
+        """
+        Configure the limits; a limit of 0 disables that bucket.
+
+        Args:
+            requests_per_minute: Defaults to RATE_LIMIT_RPM or 0
+            input_tokens_per_minute: Defaults to RATE_LIMIT_ITPM or 0
+            output_tokens_per_minute: Defaults to RATE_LIMIT_OTPM or 0
+            max_wait_seconds: Longest a turn may queue for budget; defaults
+                              to RATE_LIMIT_MAX_WAIT or 30
+            max_samples: Recent wait samples kept for percentiles
+        """
+        limits = {
+            'requests': requests_per_minute if requests_per_minute is not None else int(os.getenv('RATE_LIMIT_RPM', '0')),
+            'input_tokens': input_tokens_per_minute if input_tokens_per_minute is not None else int(os.getenv('RATE_LIMIT_ITPM', '0')),
+            'output_tokens': output_tokens_per_minute if output_tokens_per_minute is not None else int(os.getenv('RATE_LIMIT_OTPM', '0'))
+        }
+        self.buckets: Dict[str, TokenBucket] = {
+            name: TokenBucket(limit) for name, limit in limits.items() if limit > 0
+        }
+        self.max_wait_seconds = max_wait_seconds if max_wait_seconds is not None else float(os.getenv('RATE_LIMIT_MAX_WAIT', '30'))
+        self._lock = threading.Lock()
+
+        # Output size is unknown before the reply; track a running average
+        self.output_estimate = 1024.0
+
+        # Statistics
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.wait_samples: Deque[float] = deque(maxlen=max_samples)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.buckets)
+
+    def estimate_output_tokens(self, max_tokens: int) -> int:
+        """Expected output tokens for a turn capped at max_tokens."""
+        return int(min(self.output_estimate, max_tokens))
+
+    def reserve(self, input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+        """
+        Debit a turn's estimated cost and return its reservation.
+
+        The reservation's "wait" is how long the caller must sleep before
+        sending. Raises RateLimitExceeded (without debiting) if that exceeds
+        max_wait_seconds.
+        """
+        cost = {'requests': 1, 'input_tokens': input_tokens, 'output_tokens': output_tokens}
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            for name, bucket in self.buckets.items():
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_for(cost[name]))
+            if wait > self.max_wait_seconds:
+                self.rejected += 1
+                raise RateLimitExceeded(wait)
+            debited = {}
+            for name, bucket in self.buckets.items():
+                debited[name] = min(cost[name], bucket.capacity)
+                bucket.balance -= debited[name]
+            self.admitted += 1
+            if wait > 0:
+                self.delayed += 1
+                logger.info(f"Rate limit: turn queued for {wait:.1f}s")
+            self.total_wait_seconds += wait
+            self.wait_samples.append(wait)
+        return {'debited': debited, 'wait': wait}
+
+    async def acquire(self, input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+        """Reserve budget and wait until the turn may be sent."""
+        reservation = self.reserve(input_tokens, output_tokens)
+        if reservation['wait'] > 0:
+            try:
+                await asyncio.sleep(reservation['wait'])
+            except asyncio.CancelledError:
+                self.release(reservation)
+                raise
+        return reservation
+
+    def acquire_sync(self, input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+        """Blocking variant of acquire() for the synchronous chat path."""
+        reservation = self.reserve(input_tokens, output_tokens)
+        if reservation['wait'] > 0:
+            time.sleep(reservation['wait'])
+        return reservation
+
+    def settle(self, reservation: Dict[str, Any], input_tokens: int, output_tokens: int) -> None:
+        """Correct the buckets with a finished turn's actual token usage."""
+        actual = {'input_tokens': input_tokens, 'output_tokens': output_tokens}
+        with self._lock:
+            for name in actual:
+                bucket = self.buckets.get(name)
+                if bucket is not None:
+                    bucket.balance = min(bucket.capacity, bucket.balance + reservation['debited'][name] - actual[name])
+            self.output_estimate = 0.8 * self.output_estimate + 0.2 * output_tokens
+
+    def release(self, reservation: Dict[str, Any], keep_request: bool = False) -> None:
+        """
+        Refund a reservation that was never sent or consumed no tokens.
+
+        Args:
+            keep_request: The request reached the API (e.g. it was answered
+                          with an error status), so only its tokens are refunded
+        """
+        with self._lock:
+            for name, bucket in self.buckets.items():
+                if keep_request and name == 'requests':
+                    continue
+                bucket.balance = min(bucket.capacity, bucket.balance + reservation['debited'][name])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return admission counters, wait percentiles and bucket levels."""
+        samples = sorted(self.wait_samples)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not samples:
+                return None
+            index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+            return round(samples[index], 4)
+
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            for name, bucket in self.buckets.items():
+                bucket.refill(now)
+                buckets[name] = {'per_minute': int(bucket.capacity), 'available': round(bucket.balance, 1)}
+
+        return {
+            'enabled': self.enabled,
+            'buckets': buckets,
+            'admitted': self.admitted,
+            'delayed': self.delayed,
+            'rejected': self.rejected,
+            'output_estimate': round(self.output_estimate, 1),
+            'avg_wait_seconds': round(self.total_wait_seconds / self.admitted, 4) if self.admitted else 0.0,
+            'p50_wait_seconds': percentile(0.5),
+            'p95_wait_seconds': percentile(0.95)
+        }
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Resilience Module
+Retry with jittered exponential backoff (honoring retry-after), a retry budget
+that caps retry amplification, optional hedged attempts for the initial
+stream connect, and a circuit breaker that fails fast while the API is down.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from anthropic import APIConnectionError, APIStatusError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Claude API temporarily unavailable; retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def is_retryable(error: Exception) -> bool:
+    """Connection failures, timeouts, 408/409/429 and 5xx (incl. 529 overloaded)."""
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from retry-after-ms / retry-after headers, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        # HTTP-date retry-after values are rare here; fall back to backoff
+        return None
+    return None
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of request volume.
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws one,
+    so during an outage retries add at most ~ratio extra load on top of a
+    small floor of `min_retries`.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10):
+        self.ratio = ratio
+        self.max_tokens = float(min_retries) + 100 * ratio
+        self.tokens = float(min_retries)
+
+    def deposit(self) -> None:
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def try_withdraw(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over consecutive retryable failures"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+        # Statistics
+        self.opens = 0
+        self.rejected = 0
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a probe through."""
+        return max(self.opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now."""
+        if self.state == self.OPEN and self.retry_in() <= 0:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit breaker closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Let another half-open probe through after one that never reached upstream."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opens += 1
+                logger.warning(f"Circuit breaker opened after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class ResilienceLayer:
+    """Retry/backoff, retry budget, hedging and circuit breaking for API calls"""
+
+    def __init__(self, max_attempts: Optional[int] = None, base_delay: float = 0.5,
+                 max_delay: float = 20.0, hedge_delay: Optional[float] = None,
+                 retry_budget: Optional[RetryBudget] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Configure the layer.
+
+        Args:
+            max_attempts: Attempts per call including the first; defaults to
+                          API_MAX_ATTEMPTS or 4
+            base_delay: Backoff base in seconds (full jitter)
+            max_delay: Backoff and retry-after ceiling in seconds
+            hedge_delay: Start a second connect attempt if the first has not
+                         produced a result after this many seconds; defaults
+                         to API_HEDGE_DELAY, unset disables hedging
+            retry_budget: Shared RetryBudget; a default one is created
+            breaker: Shared CircuitBreaker; configured from
+                     CIRCUIT_FAILURE_THRESHOLD / CIRCUIT_RESET_TIMEOUT by default
+        """
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv('API_MAX_ATTEMPTS', '4'))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        if hedge_delay is None and os.getenv('API_HEDGE_DELAY'):
+            hedge_delay = float(os.getenv('API_HEDGE_DELAY'))
+        self.hedge_delay = hedge_delay
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+        )
+
+        # Statistics
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.budget_exhausted = 0
+        self.hedges_started = 0
+        self.hedges_won = 0
+        self.retry_reasons: Dict[str, int] = {}
+
+    def backoff_delay(self, error: Exception, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based)."""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _before_attempt(self, attempt: int) -> None:
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.retry_in())
+        self.attempts += 1
+        if attempt == 1:
+            self.calls += 1
+            self.retry_budget.deposit()
+
+    def _after_failure(self, error: Exception, attempt: int) -> Optional[float]:
+        """Record a failed attempt; returns the retry delay or None to give up."""
+        if not is_retryable(error):
+            if isinstance(error, APIStatusError):
+                # Upstream answered (e.g. 400); that is no reason to open the breaker
+                self.breaker.record_success()
+            else:
+                # A local failure (e.g. a rate limit rejection) says nothing about upstream
+                self.breaker.release_probe()
+            return None
+        self.breaker.record_failure()
+        if attempt >= self.max_attempts:
+            self.failures += 1
+            return None
+        if not self.retry_budget.try_withdraw():
+            self.budget_exhausted += 1
+            self.failures += 1
+            return None
+        reason = str(getattr(error, 'status_code', None) or type(error).__name__)
+        self.retry_reasons[reason] = self.retry_reasons.get(reason, 0) + 1
+        self.retries += 1
+        delay = self.backoff_delay(error, attempt)
+        logger.warning(f"Retrying Claude API call in {delay:.1f}s (attempt {attempt}): {error}")
+        return delay
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run fn with retries, blocking between attempts."""
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt(attempt)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], hedge: bool = False,
+                    discard: Optional[Callable[[Any], Awaitable[None]]] = None) -> Any:
+        """
+        Await fn with retries.
+
+        Args:
+            fn: Factory returning a fresh awaitable per attempt
+            hedge: Allow a hedged second attempt when hedge_delay is configured
+                   (use only for idempotent connect steps)
+            discard: Cleanup for the result of a losing hedged attempt
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt(attempt)
+            try:
+                if hedge and self.hedge_delay is not None:
+                    result = await self._hedged(fn, discard)
+                else:
+                    result = await fn()
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]],
+                      discard: Optional[Callable[[Any], Awaitable[None]]]) -> Any:
+        """Race the attempt against a second one started after hedge_delay."""
+        primary = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+        if done:
+            return primary.result()
+
+        self.hedges_started += 1
+        secondary = asyncio.ensure_future(fn())
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                if task is secondary:
+                    self.hedges_won += 1
+                for loser in pending:
+                    loser.cancel()
+                    loser.add_done_callback(lambda t: self._discard_loser(t, discard))
+                return task.result()
+        raise error
+
+    @staticmethod
+    def _discard_loser(task: asyncio.Task, discard: Optional[Callable[[Any], Awaitable[None]]]) -> None:
+        """Release a losing hedged attempt that completed despite cancellation."""
+        if discard and not task.cancelled() and task.exception() is None:
+            asyncio.ensure_future(discard(task.result()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return retry, hedging and breaker counters."""
+        return {
+            'calls': self.calls,
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'retry_reasons': dict(self.retry_reasons),
+            'failures': self.failures,
+            'budget_exhausted': self.budget_exhausted,
+            'retry_budget_tokens': round(self.retry_budget.tokens, 2),
+            'hedges_started': self.hedges_started,
+            'hedges_won': self.hedges_won,
+            'breaker': {
+                'state': self.breaker.state,
+                'consecutive_failures': self.breaker.consecutive_failures,
+                'opens': self.breaker.opens,
+                'rejected': self.breaker.rejected,
+                'retry_in': round(self.breaker.retry_in(), 1) if self.breaker.state == CircuitBreaker.OPEN else 0.0
+            }
+        }
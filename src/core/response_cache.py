@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Response Cache Module
+Optional LRU + TTL cache of tool-free (/nocode) answers, keyed by model,
+normalized prompt, attached file IDs and a short fingerprint of the
+conversation context, so repeated questions skip the model round trip. A
+conversation can opt out of earlier entries with a private namespace (as
+/reset does).
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.]+$')
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize a prompt so trivially different phrasings share a cache entry."""
+    text = _WHITESPACE.sub(' ', (text or '').strip().lower())
+    return _TRAILING_PUNCTUATION.sub('', text)
+
+
+def context_fingerprint(history: List[Dict[str, Any]], turns: int = 4) -> str:
+    """Short hash of the most recent history entries' text and attachments."""
+    digest = hashlib.sha256()
+    for message in history[-turns:]:
+        digest.update(message.get('role', '').encode('utf-8'))
+        content = message.get('content')
+        if isinstance(content, str):
+            digest.update(content.encode('utf-8'))
+            continue
+        for block in content or []:
+            if not isinstance(block, dict):
+                continue
+            if block.get('type') == 'text':
+                digest.update(block.get('text', '').encode('utf-8'))
+            elif block.get('type') == 'file':
+                digest.update(block.get('file', {}).get('file_id', '').encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class ResponseCache:
+    """Bounded LRU cache with per-entry expiry for tool-free chat responses"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Entry cap; defaults to RESPONSE_CACHE_MAX_ENTRIES or 512
+            ttl_seconds: Entry lifetime; defaults to RESPONSE_CACHE_TTL or 3600
+            max_bytes: Approximate size cap; defaults to RESPONSE_CACHE_MAX_BYTES or 8 MB
+        """
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+
+        # key -> (expires_at, size_bytes, response_data)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, file_ids: Iterable[str], fingerprint: str,
+                 namespace: str = '') -> str:
+        """
+        Build the cache key for a turn.
+
+        Args:
+            namespace: Optional prefix separating a conversation's entries from
+                       every other's; "" shares entries across conversations
+        """
+        parts = [model, normalize_prompt(prompt), sorted(file_ids), fingerprint]
+        if namespace:
+            parts.append(namespace)
+        payload = json.dumps(parts)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response for key, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, response_data = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(response_data)
+
+    def put(self, key: str, response_data: Dict[str, Any]) -> bool:
+        """Store a response; returns False if it is too large to cache."""
+        if self.max_entries <= 0:
+            return False
+        stored = copy.deepcopy(dict(response_data))
+        size = len(json.dumps(stored, default=str).encode('utf-8'))
+        if size > self.max_bytes:
+            return False
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, size, stored)
+        self.current_bytes += size
+
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def _remove(self, key: str) -> None:
+        """Drop an entry and release its size."""
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expirations': self.expirations,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Model Routing Module
+Classifies each turn with cheap local heuristics and sends quick turns
+(greetings, thanks, short lookups) to a fast model while attachments, code
+and data analysis go to the large model. Keeps per-route latency and cost.
+"""
+
+import os
+import re
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+ROUTE_QUICK = 'quick'
+ROUTE_ANALYSIS = 'analysis'
+ROUTES = (ROUTE_QUICK, ROUTE_ANALYSIS)
+
+DEFAULT_QUICK_MODEL = 'claude-3-5-haiku-20241022'
+DEFAULT_ANALYSIS_MODEL = 'claude-opus-4-20250514'
+
+# USD per million tokens (input, output) by model prefix; the first match wins.
+# Cache writes cost 1.25x input and cache reads 0.1x input.
+MODEL_PRICING = {
+    'claude-opus-4': (15.0, 75.0),
+    'claude-sonnet-4': (3.0, 15.0),
+    'claude-3-7-sonnet': (3.0, 15.0),
+    'claude-3-5-sonnet': (3.0, 15.0),
+    'claude-3-5-haiku': (0.8, 4.0),
+    'claude-haiku': (0.8, 4.0)
+}
+
+_CHIT_CHAT = re.compile(
+    r"^(hi|hello|hey|thanks?( you)?|thank you( so much)?|thx|ty|ok(ay)?|cool|great|"
+    r"nice|perfect|got it|bye|good (morning|afternoon|evening))\b[\s!.,:)]*$",
+    re.IGNORECASE
+)
+_ANALYSIS_KEYWORDS = re.compile(
+    r"\b(code|python|script|run|execute|calculat\w*|comput\w*|analy[sz]\w*|plot\w*|chart\w*|"
+    r"graph\w*|visuali[sz]\w*|regression|statistic\w*|average|mean|median|sum|total|"
+    r"forecast\w*|csv|excel|xlsx|spreadsheet|data(set|frame)?|file\w*|column\w*|rows?|"
+    r"table\w*|pandas|numpy|matplotlib|sql|simulat\w*|model\w*|trend\w*|correlat\w*)\b",
+    re.IGNORECASE
+)
+_CODE_MARKERS = re.compile(r"```|\bdef |\bimport |[=<>]{2}|\w+\(.*\)")
+
+
+def estimate_cost(model: str, usage: Dict[str, int]) -> float:
+    """Approximate USD cost of a turn from its token usage."""
+    input_price, output_price = MODEL_PRICING['claude-opus-4']
+    for prefix, prices in MODEL_PRICING.items():
+        if model.startswith(prefix):
+            input_price, output_price = prices
+            break
+    return (
+        usage.get('input_tokens', 0) * input_price
+        + usage.get('cache_creation_input_tokens', 0) * input_price * 1.25
+        + usage.get('cache_read_input_tokens', 0) * input_price * 0.1
+        + usage.get('output_tokens', 0) * output_price
+    ) / 1_000_000
+
+
+class ModelRouter:
+    """Routes turns between a quick model and an analysis model"""
+
+    def __init__(self, quick_model: Optional[str] = None, analysis_model: Optional[str] = None,
+                 quick_max_chars: Optional[int] = None, enabled: Optional[bool] = None,
+                 max_samples: int = 1000):
+        """
+        Configure the routes.
+
+        Args:
+            quick_model: Fast model; defaults to ROUTER_QUICK_MODEL or Claude 3.5 Haiku
+            analysis_model: Large model; defaults to ROUTER_ANALYSIS_MODEL or Claude Opus 4
+            quick_max_chars: Longest message still considered quick; defaults
+                             to ROUTER_QUICK_MAX_CHARS or 200
+            enabled: Route at all; defaults to MODEL_ROUTING (true). When
+                     disabled every turn takes the analysis route.
+            max_samples: Recent latency samples kept per route
+        """
+        self.models = {
+            ROUTE_QUICK: quick_model or os.getenv('ROUTER_QUICK_MODEL') or DEFAULT_QUICK_MODEL,
+            ROUTE_ANALYSIS: analysis_model or os.getenv('ROUTER_ANALYSIS_MODEL') or DEFAULT_ANALYSIS_MODEL
+        }
+        self.quick_max_chars = quick_max_chars if quick_max_chars is not None else int(os.getenv('ROUTER_QUICK_MAX_CHARS', '200'))
+        if enabled is None:
+            enabled = os.getenv('MODEL_ROUTING', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+
+        # Statistics per route
+        self._latencies: Dict[str, Deque[float]] = {route: deque(maxlen=max_samples) for route in ROUTES}
+        self._stats: Dict[str, Dict[str, Any]] = {
+            route: {'turns': 0, 'errors': 0, 'input_tokens': 0, 'output_tokens': 0, 'cost_usd': 0.0, 'reasons': {}}
+            for route in ROUTES
+        }
+
+    def classify(self, user_input: str, use_code_execution: bool,
+                 file_attachments_info: Optional[List[Dict[str, str]]] = None,
+                 has_file_context: bool = False) -> Tuple[str, str]:
+        """
+        Classify a turn.
+
+        Args:
+            user_input: The user's message
+            use_code_execution: False for /nocode turns
+            file_attachments_info: Files attached to this turn
+            has_file_context: Whether earlier turns of the conversation used files
+
+        Returns:
+            (route, reason)
+        """
+        text = (user_input or '').strip()
+        if file_attachments_info:
+            return ROUTE_ANALYSIS, 'attachments'
+        if _CHIT_CHAT.match(text):
+            return ROUTE_QUICK, 'chit_chat'
+        if len(text) > self.quick_max_chars:
+            return ROUTE_ANALYSIS, 'length'
+        if _CODE_MARKERS.search(text):
+            return ROUTE_ANALYSIS, 'code'
+        if use_code_execution and _ANALYSIS_KEYWORDS.search(text):
+            return ROUTE_ANALYSIS, 'keywords'
+        if use_code_execution and has_file_context:
+            # Short follow-ups about earlier data ("and for Q3?") need the big model
+            return ROUTE_ANALYSIS, 'follow_up'
+        return ROUTE_QUICK, 'simple'
+
+    def select(self, user_input: str, use_code_execution: bool,
+               file_attachments_info: Optional[List[Dict[str, str]]] = None,
+               has_file_context: bool = False, override: Optional[str] = None) -> Tuple[str, str, str]:
+        """
+        Choose the model for a turn.
+
+        Args:
+            override: Per-conversation route ("quick" or "analysis") that
+                      bypasses classification
+
+        Returns:
+            (model, route, reason)
+        """
+        if override in ROUTES:
+            route, reason = override, 'override'
+        elif not self.enabled:
+            route, reason = ROUTE_ANALYSIS, 'routing_disabled'
+        else:
+            route, reason = self.classify(user_input, use_code_execution, file_attachments_info, has_file_context)
+        reasons = self._stats[route]['reasons']
+        reasons[reason] = reasons.get(reason, 0) + 1
+        return self.models[route], route, reason
+
+    def record(self, route: str, model: str, latency: float, usage: Dict[str, int], error: bool = False) -> float:
+        """Record a finished turn on its route; returns its estimated cost."""
+        stats = self._stats[route]
+        cost = estimate_cost(model, usage)
+        stats['turns'] += 1
+        stats['errors'] += int(error)
+        stats['input_tokens'] += usage.get('input_tokens', 0)
+        stats['output_tokens'] += usage.get('output_tokens', 0)
+        stats['cost_usd'] += cost
+        self._latencies[route].append(latency)
+        return cost
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-route turn counts, latency percentiles and cost."""
+        routes = {}
+        for route in ROUTES:
+            samples = sorted(self._latencies[route])
+
+            def percentile(fraction: float) -> Optional[float]:
+                if not samples:
+                    return None
+                index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+                return round(samples[index], 4)
+
+            stats = dict(self._stats[route])
+            stats['model'] = self.models[route]
+            stats['cost_usd'] = round(stats['cost_usd'], 6)
+            stats['reasons'] = dict(stats['reasons'])
+            stats['p50_latency_seconds'] = percentile(0.5)
+            stats['p95_latency_seconds'] = percentile(0.95)
+            routes[route] = stats
+        return {'enabled': self.enabled, 'routes': routes}
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Stream Processing Module
+Turns Anthropic streaming events into a ChatResult. Events are routed through
+a dispatch table keyed on event type, reply text is collected in a list and
+joined once, and the figure patterns are compiled at import time.
+"""
+
+import os
+import re
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .json_stream import IncrementalJSONStringExtractor
+from .prompt_cache import empty_usage, read_usage
+
+# Lines in code output announcing a saved figure
+FIGURE_PATTERNS = [
+    re.compile(r'(?:Figure|Plot|Graph|Chart|Image)\s+saved\s+(?:to|as):\s*(.+)', re.IGNORECASE),
+    re.compile(r'Saved\s+(?:figure|plot|graph|chart|image)\s+to:\s*(.+)', re.IGNORECASE),
+    re.compile(r'(?:Generated|Created)\s+(.+\.(?:png|jpg|jpeg|svg|pdf))', re.IGNORECASE)
+]
+
+
+class ChatResult(MutableMapping):
+    """
+    Structured result of a chat turn.
+
+    Attribute access is the fast path; the mapping interface keeps every
+    response_data["key"] / .get() caller (TeamsFormatter, the bot, app.py)
+    working unchanged. The key set is fixed.
+    """
+
+    FIELDS = (
+        'assistant_message', 'tool_used', 'executed_code', 'code_output',
+        'generated_figures', 'code_errors', 'web_searches', 'files_accessed',
+        'usage', 'context_window', 'cached', 'rate_limit_wait', 'concurrency_wait',
+        'model', 'route', 'unavailable', 'retry_in', 'error', 'file_results', 'preliminary',
+        'attachment_results'
+    )
+    __slots__ = FIELDS
+    _FIELD_SET = frozenset(FIELDS)
+
+    def __init__(self, **fields: Any):
+        self.assistant_message = ""
+        self.tool_used = None
+        self.executed_code = None
+        self.code_output = None
+        self.generated_figures = []
+        self.code_errors = None
+        self.web_searches = []
+        self.files_accessed = []
+        self.usage = empty_usage()
+        self.context_window = None
+        self.cached = False
+        self.rate_limit_wait = 0.0
+        self.concurrency_wait = 0.0
+        self.model = None
+        self.route = None
+        self.unavailable = False
+        self.retry_in = None
+        self.error = False
+        self.file_results = None
+        self.preliminary = None
+        self.attachment_results = None
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._FIELD_SET:
+            raise KeyError(f"ChatResult has no field {key!r}")
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("ChatResult fields cannot be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict copy of the result."""
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def __repr__(self) -> str:
+        return f"ChatResult({self.to_dict()!r})"
+
+
+class StreamProcessor:
+    """Per-stream parser applying events to a ChatResult"""
+
+    __slots__ = (
+        'result', 'on_progress', 'search_hook', 'parts', 'in_code_block', 'code_decoder',
+        'web_search_detected', 'query_decoder', 'current_search_query'
+    )
+
+    def __init__(self, result: ChatResult, on_progress: Optional[Callable[[str, str], None]] = None,
+                 search_hook: Optional[Callable[[str, str], List[Dict[str, str]]]] = None):
+        """
+        Start parsing one stream.
+
+        Args:
+            result: ChatResult receiving tool, code, figure and usage data
+            on_progress: Optional (kind, text) callback, see ClaudeCore.achat
+            search_hook: Called with (query, raw result text) when a web search
+                         finishes; returns the parsed results
+        """
+        self.result = result
+        self.on_progress = on_progress
+        self.search_hook = search_hook
+        self.parts: List[str] = []
+        self.in_code_block = False
+        self.code_decoder: Optional[IncrementalJSONStringExtractor] = None
+        self.web_search_detected = False
+        self.query_decoder: Optional[IncrementalJSONStringExtractor] = None
+        self.current_search_query = ""
+
+    @property
+    def assistant_message(self) -> str:
+        """Reply text accumulated so far."""
+        return ''.join(self.parts)
+
+    def process(self, event: Any) -> None:
+        """Apply one streaming event."""
+        handler = self._EVENT_HANDLERS.get(event.type)
+        if handler is not None:
+            handler(self, event)
+
+    def _on_message_start(self, event: Any) -> None:
+        # Prompt token counts, including cache reads and writes
+        read_usage(getattr(getattr(event, 'message', None), 'usage', None), self.result.usage)
+
+    def _on_message_delta(self, event: Any) -> None:
+        # Cumulative output token count
+        read_usage(getattr(event, 'usage', None), self.result.usage)
+
+    def _on_content_block_start(self, event: Any) -> None:
+        block = getattr(event, 'content_block', None)
+        if block is None:
+            return
+        name = getattr(block, 'name', None)
+        if block.type == "server_tool_use" and name == "code_execution":
+            self.in_code_block = True
+            self.code_decoder = IncrementalJSONStringExtractor("code")
+            self.result.tool_used = "code_execution"
+            if self.on_progress:
+                self.on_progress("code_start", "")
+        elif isinstance(name, str) and 'search' in name.lower():
+            self.web_search_detected = True
+            self.query_decoder = IncrementalJSONStringExtractor("query")
+            self.result.tool_used = "web_search"
+
+    def _on_content_block_delta(self, event: Any) -> None:
+        delta = getattr(event, 'delta', None)
+        if delta is None:
+            return
+        handler = self._DELTA_HANDLERS.get(getattr(delta, 'type', None))
+        if handler is None:
+            # Untyped delta (older SDKs, recorded streams): tell text from JSON by shape
+            kind = "text_delta" if getattr(delta, 'text', None) is not None else "input_json_delta"
+            handler = self._DELTA_HANDLERS[kind]
+        handler(self, delta)
+
+    def _on_text_delta(self, delta: Any) -> None:
+        text = delta.text
+        self.parts.append(text)
+        if self.on_progress and text:
+            self.on_progress("text", text)
+
+    def _on_json_delta(self, delta: Any) -> None:
+        # Tool input arrives as partial JSON; the decoders carry escape state
+        # across deltas so chunk boundaries never mangle code
+        partial_json = getattr(delta, 'partial_json', None)
+        if not partial_json:
+            return
+        if self.in_code_block:
+            code_part = self.code_decoder.feed(partial_json)
+            if self.on_progress and code_part:
+                self.on_progress("code", code_part)
+        elif self.web_search_detected:
+            self.query_decoder.feed(partial_json)
+            if self.query_decoder.complete:
+                self.current_search_query = self.query_decoder.value
+
+    def _on_content_block_stop(self, event: Any) -> None:
+        if self.in_code_block:
+            executed_code = self.code_decoder.value
+            self.result.executed_code = executed_code
+            self.parts.append(f"\n\n[Executed code:\n```python\n{executed_code}\n```]")
+            self.in_code_block = False
+            self.code_decoder = None
+
+    def _on_server_tool_result(self, event: Any) -> None:
+        result = getattr(event, 'result', None)
+        if result is None:
+            return
+        if self.web_search_detected:
+            self._on_search_result(result)
+            return
+
+        stdout = getattr(result, 'stdout', None)
+        if stdout:
+            self.result.code_output = stdout
+            self.parts.append(f"\n[Code Output]:\n{stdout}")
+            figures = self.result.generated_figures
+            for pattern in FIGURE_PATTERNS:
+                for match in pattern.findall(stdout):
+                    figure_path = match.strip()
+                    figures.append({
+                        "figure_name": os.path.basename(figure_path),
+                        "path_or_url": figure_path
+                    })
+
+        stderr = getattr(result, 'stderr', None)
+        if stderr:
+            self.result.code_errors = stderr
+            self.parts.append(f"\n[Errors]:\n{stderr}")
+
+    def _on_search_result(self, result: Any) -> None:
+        try:
+            content = getattr(result, 'content', None)
+            if content:
+                results = self.search_hook(self.current_search_query, content) if self.search_hook else []
+                if self.current_search_query:
+                    self.result.web_searches.append({
+                        "query": self.current_search_query,
+                        "results": results
+                    })
+                    self.current_search_query = ""
+                self.web_search_detected = False
+        except Exception:
+            pass
+
+    _EVENT_HANDLERS = {
+        "message_start": _on_message_start,
+        "message_delta": _on_message_delta,
+        "content_block_start": _on_content_block_start,
+        "content_block_delta": _on_content_block_delta,
+        "content_block_stop": _on_content_block_stop,
+        "server_tool_result": _on_server_tool_result
+    }
+
+    _DELTA_HANDLERS = {
+        "text_delta": _on_text_delta,
+        "input_json_delta": _on_json_delta
+    }
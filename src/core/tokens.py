@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Token Estimation Module
+Cheap, deterministic local estimates of how many tokens conversation history
+entries will cost, used to decide when to compact or trim history, plus the
+sliding window that keeps each request inside a per-model input budget.
+"""
+
+import os
+from typing import Any, Dict, List, Tuple
+
+# Roughly four characters per token for English text and code
+CHARS_PER_TOKEN = 4
+# Fixed per-message overhead for role and formatting
+MESSAGE_OVERHEAD_TOKENS = 4
+# File contents are not visible locally; assume a typical attachment cost
+FILE_BLOCK_TOKENS = 1500
+# Server-side tool definitions sent alongside the messages
+TOOL_DEFINITION_TOKENS = 500
+
+# History entry key under which the estimate is cached
+TOKEN_CACHE_KEY = '_tokens'
+
+# Context window sizes by model prefix; the first matching prefix wins
+MODEL_CONTEXT_WINDOWS = {
+    'claude-opus-4': 200000,
+    'claude-sonnet-4': 200000,
+    'claude-3-7-sonnet': 200000,
+    'claude-3-5-sonnet': 200000,
+    'claude-3-5-haiku': 200000,
+    'claude-haiku': 200000
+}
+DEFAULT_CONTEXT_WINDOW = 200000
+# Leave headroom for estimator error (code and non-English text run denser)
+BUDGET_SAFETY_FACTOR = 0.85
+
+TRUNCATION_NOTICE = "\n[... message truncated to fit the context window ...]"
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Estimate the token count of a piece of text."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_content_tokens(content: Any) -> int:
+    """Estimate the token count of message content (string or list of blocks)."""
+    if isinstance(content, str):
+        return estimate_text_tokens(content)
+
+    total = 0
+    for block in content or []:
+        if not isinstance(block, dict):
+            total += estimate_text_tokens(str(block))
+            continue
+        block_type = block.get('type')
+        if block_type == 'text':
+            total += estimate_text_tokens(block.get('text', ''))
+        elif block_type in ('file', 'document', 'image', 'container_upload'):
+            total += FILE_BLOCK_TOKENS
+        else:
+            total += estimate_text_tokens(str(block))
+    return total
+
+
+def estimate_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimate the token count of one history entry."""
+    return MESSAGE_OVERHEAD_TOKENS + estimate_content_tokens(message.get('content'))
+
+
+def cached_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimate a history entry's tokens once and cache the result on the entry."""
+    tokens = message.get(TOKEN_CACHE_KEY)
+    if tokens is None:
+        tokens = estimate_message_tokens(message)
+        message[TOKEN_CACHE_KEY] = tokens
+    return tokens
+
+
+def estimate_history_tokens(history: List[Dict[str, Any]]) -> int:
+    """Estimate the token count of a whole conversation history."""
+    return sum(cached_message_tokens(message) for message in history)
+
+
+def input_budget_for_model(model: str, max_output_tokens: int = 4096) -> int:
+    """
+    Input token budget for a model: its context window minus the output
+    allowance, scaled down by a safety factor. MAX_INPUT_TOKENS overrides it.
+    """
+    override = os.getenv('MAX_INPUT_TOKENS')
+    if override:
+        return int(override)
+    window = DEFAULT_CONTEXT_WINDOW
+    for prefix, size in MODEL_CONTEXT_WINDOWS.items():
+        if model.startswith(prefix):
+            window = size
+            break
+    return int((window - max_output_tokens) * BUDGET_SAFETY_FACTOR)
+
+
+def _truncate_message(message: Dict[str, Any], budget: int) -> Dict[str, Any]:
+    """Return a copy of message whose text is cut down to fit budget tokens."""
+    content = message.get('content')
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    blocks = [dict(block) if isinstance(block, dict) else block for block in content or []]
+
+    fixed = MESSAGE_OVERHEAD_TOKENS + sum(
+        estimate_content_tokens([block]) for block in blocks
+        if not (isinstance(block, dict) and block.get('type') == 'text')
+    )
+    remaining_chars = max(budget - fixed, 0) * CHARS_PER_TOKEN - len(TRUNCATION_NOTICE)
+    for block in blocks:
+        if not (isinstance(block, dict) and block.get('type') == 'text'):
+            continue
+        text = block.get('text', '')
+        if len(text) <= remaining_chars:
+            remaining_chars -= len(text)
+        else:
+            block['text'] = text[:max(remaining_chars, 0)] + TRUNCATION_NOTICE
+            remaining_chars = 0
+
+    truncated = {key: value for key, value in message.items() if key != TOKEN_CACHE_KEY}
+    truncated['content'] = [block for block in blocks
+                            if not (isinstance(block, dict) and block.get('type') == 'text' and not block.get('text'))]
+    return truncated
+
+
+def fit_to_budget(history: List[Dict[str, Any]], budget: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Select the newest history entries that fit in budget estimated tokens.
+
+    Oldest turns are dropped first. A leading compaction summary pair is kept
+    when it fits, the window always starts on a user turn so user/assistant
+    alternation stays valid, and if the newest user turn alone is too large
+    its text is truncated. The input list is never modified apart from the
+    cached per-entry estimates.
+
+    Returns:
+        (window, info) where info has dropped_messages, truncated and
+        estimated_tokens
+    """
+    pinned = 0
+    if len(history) > 2 and history[0].get('_summary') and history[1].get('_summary'):
+        pinned_tokens = cached_message_tokens(history[0]) + cached_message_tokens(history[1])
+        if pinned_tokens <= budget // 2:
+            pinned = 2
+            budget -= pinned_tokens
+
+    total = 0
+    start = len(history)
+    for index in range(len(history) - 1, pinned - 1, -1):
+        tokens = cached_message_tokens(history[index])
+        if total + tokens > budget:
+            break
+        total += tokens
+        start = index
+
+    # The window must open on a user turn
+    while start < len(history) and history[start].get('role') != 'user':
+        total -= cached_message_tokens(history[start])
+        start += 1
+
+    truncated = False
+    if start == len(history) and history:
+        # Not even the newest user turn fits; keep a truncated copy of it
+        last_user = len(history) - 1
+        while last_user > pinned and history[last_user].get('role') != 'user':
+            last_user -= 1
+        window_tail = [_truncate_message(history[last_user], budget)] + history[last_user + 1:]
+        truncated = True
+        start = last_user
+        total = estimate_history_tokens(window_tail)
+    else:
+        window_tail = history[start:]
+
+    window = history[:pinned] + window_tail
+    info = {
+        'dropped_messages': start - pinned,
+        'truncated': truncated,
+        'estimated_tokens': total + sum(cached_message_tokens(m) for m in history[:pinned])
+    }
+    return window, info
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tool Prediction Module
+Decides per turn whether to send the code_execution tool. Leaving it out
+saves the tool-definition tokens and stops the model from starting a
+sandbox for questions it can answer directly; if the tool-free answer turns
+out to need computation, the turn is retried with the tool.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_DATA_TERMS = re.compile(
+    r"\b(calculat\w*|comput\w*|analy[sz]\w*|plot\w*|chart\w*|graph\w*|visuali[sz]\w*|"
+    r"run|execut\w*|simulat\w*|regress\w*|forecast\w*|predict\w*|sort\w*|filter\w*|"
+    r"aggregat\w*|group(ed|ing)? by|pivot\w*|count\w*|sum|total\w*|average\w*|mean|median|"
+    r"std|variance|percent\w*|correlat\w*|convert\w*|pars(e|ing)|clean\w*|merg(e|ing)|"
+    r"csv|excel|xlsx|spreadsheet|data(set|frame)?|column\w*|rows?|table\w*|"
+    r"code|python|script|function|pandas|numpy|matplotlib|random|prime\w*|factor\w*|"
+    r"solve|integral|derivative|matrix)\b",
+    re.IGNORECASE
+)
+_DIGITS = re.compile(r"\d[\d,.]*\s*[-+*/^%x]\s*\d")
+
+# Tool-free answers that show the model wanted to compute something
+_NEEDS_COMPUTATION = re.compile(
+    r"(I (?:would|'d) (?:need|have) to (?:run|execute|calculate|compute)|"
+    r"I (?:can(?:not|'t)|am unable to|don't have (?:the ability|access)(?: to)?) "
+    r"(?:run|execute|access|open|read|calculate|compute|plot|analy[sz]e)|"
+    r"(?:enable|with|using|need) (?:the )?code execution|"
+    r"without (?:running|executing) (?:the |any )?code|"
+    r"(?:you can|you could|try) (?:run|execut)\w* (?:this|the following|the) code)",
+    re.IGNORECASE
+)
+
+
+class ToolPredictor:
+    """Per-turn prediction of whether code execution is needed"""
+
+    def __init__(self, enabled: Optional[bool] = None, recent_tool_turns: int = 2,
+                 auto_retry: bool = True):
+        """
+        Configure the predictor.
+
+        Args:
+            enabled: Predict at all; defaults to LAZY_TOOLS (true). When
+                     disabled the tool is always sent (unless /nocode).
+            recent_tool_turns: Keep the tool while it was used within this
+                               many previous turns
+            auto_retry: Retry tool-free turns whose answer asks for computation
+        """
+        if enabled is None:
+            enabled = os.getenv('LAZY_TOOLS', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+        self.recent_tool_turns = recent_tool_turns
+        self.auto_retry = auto_retry
+
+        # Statistics
+        self.included = 0
+        self.omitted = 0
+        self.retries_with_tool = 0
+        self.sandboxes_avoided = 0
+        self.reasons: Dict[str, int] = {}
+
+    def predict(self, user_input: str, file_attachments_info: Optional[List[Dict[str, str]]] = None,
+                turns_since_tool_use: Optional[int] = None) -> Tuple[bool, str]:
+        """
+        Predict whether a turn needs the code_execution tool.
+
+        Args:
+            user_input: The user's message
+            file_attachments_info: Files attached to this turn
+            turns_since_tool_use: Turns since the conversation last used the
+                                  tool (0 = previous turn), None if never
+
+        Returns:
+            (include_tool, reason)
+        """
+        if not self.enabled:
+            include, reason = True, 'prediction_disabled'
+        elif file_attachments_info:
+            include, reason = True, 'attachments'
+        elif turns_since_tool_use is not None and turns_since_tool_use < self.recent_tool_turns:
+            include, reason = True, 'recent_tool_use'
+        elif _DATA_TERMS.search(user_input or '') or _DIGITS.search(user_input or ''):
+            include, reason = True, 'data_terms'
+        else:
+            include, reason = False, 'no_signal'
+
+        if include:
+            self.included += 1
+        else:
+            self.omitted += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return include, reason
+
+    def needs_tool(self, assistant_message: str) -> bool:
+        """Whether a tool-free answer indicates the turn needed computation."""
+        return self.auto_retry and bool(_NEEDS_COMPUTATION.search(assistant_message or ''))
+
+    def record_outcome(self, retried: bool) -> None:
+        """Record how a turn sent without the tool ended."""
+        if retried:
+            self.retries_with_tool += 1
+        else:
+            self.sandboxes_avoided += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return inclusion, retry and avoided-sandbox counters."""
+        predicted = self.included + self.omitted
+        return {
+            'enabled': self.enabled,
+            'included': self.included,
+            'omitted': self.omitted,
+            'omit_rate': round(self.omitted / predicted, 4) if predicted else 0.0,
+            'retries_with_tool': self.retries_with_tool,
+            'sandboxes_avoided': self.sandboxes_avoided,
+            'reasons': dict(self.reasons)
+        }
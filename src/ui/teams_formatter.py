@@ -5,7 +5,7 @@ Formats responses from claude_core for display in Microsoft Teams using Adaptive
 """
 
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from botbuilder.schema import Attachment
 from botbuilder.core import CardFactory
@@ -139,7 +139,31 @@ class TeamsFormatter:
             "weight": "Bolder",
             "spacing": "Large"
         })
-        
+
+        # Sample-first answer still waiting for (or missing) the full analysis
+        preliminary = response_data.get('preliminary')
+        if preliminary:
+            if preliminary.get('failed'):
+                note = (f"⚠️ Based on a {preliminary['sample_rows']:,}-row sample of "
+                        f"{preliminary['total_rows']:,} rows; the full analysis could not be completed.")
+            else:
+                note = (f"⏳ Preliminary answer from a {preliminary['sample_rows']:,}-row sample of "
+                        f"{preliminary['total_rows']:,} rows. The full analysis is running and will "
+                        f"replace this card.")
+            card_body.append({
+                "type": "Container",
+                "style": "warning" if preliminary.get('failed') else "accent",
+                "items": [
+                    {
+                        "type": "TextBlock",
+                        "text": note,
+                        "wrap": True,
+                        "size": "Small"
+                    }
+                ],
+                "spacing": "Medium"
+            })
+
         # Assistant's Summary
         if response_data.get('assistant_message'):
             # Extract just the text part (remove code blocks from message)
@@ -153,7 +177,49 @@ class TeamsFormatter:
                 "wrap": True,
                 "spacing": "Medium"
             })
-        
+
+        # Per-file timings from a parallel (fan-out) analysis
+        if response_data.get('file_results'):
+            card_body.append({
+                "type": "TextBlock",
+                "text": "⏱️ Per-file Timings",
+                "weight": "Bolder",
+                "size": "Medium",
+                "spacing": "Large"
+            })
+
+            card_body.append({
+                "type": "FactSet",
+                "facts": [
+                    {
+                        "title": f"{entry['file_name']}:",
+                        "value": f"{entry['seconds']:.1f}s" + (" ❌ failed" if entry.get('error') else "")
+                    }
+                    for entry in response_data['file_results']
+                ]
+            })
+
+        # Download/upload time of each attachment in the message
+        if response_data.get('attachment_results'):
+            card_body.append({
+                "type": "TextBlock",
+                "text": "📥 Attachments",
+                "weight": "Bolder",
+                "size": "Medium",
+                "spacing": "Large"
+            })
+
+            card_body.append({
+                "type": "FactSet",
+                "facts": [
+                    {
+                        "title": f"{entry['file_name']}:",
+                        "value": f"{entry['seconds']:.1f}s" + (f" ❌ {entry['error']}" if entry.get('error') else "")
+                    }
+                    for entry in response_data['attachment_results']
+                ]
+            })
+
         # Code Execution Section
         if response_data.get('executed_code'):
             card_body.append({
@@ -270,18 +336,28 @@ class TeamsFormatter:
         
         return CardFactory.adaptive_card(card)
     
-    def create_simple_text_card(self, text: str) -> Attachment:
-        """Create a simple text response card"""
+    def create_simple_text_card(self, text: str, footnote: Optional[str] = None) -> Attachment:
+        """Create a simple text response card, optionally with a subtle footnote"""
+        body = [
+            {
+                "type": "TextBlock",
+                "text": text,
+                "wrap": True
+            }
+        ]
+        if footnote:
+            body.append({
+                "type": "TextBlock",
+                "text": footnote,
+                "size": "Small",
+                "isSubtle": True,
+                "wrap": True,
+                "spacing": "Medium"
+            })
         card = {
             "type": "AdaptiveCard",
             "version": "1.3",
-            "body": [
-                {
-                    "type": "TextBlock",
-                    "text": text,
-                    "wrap": True
-                }
-            ],
+            "body": body,
             "$schema": "http://adaptivecards.io/schemas/adaptive-card.json"
         }
         return CardFactory.adaptive_card(card)
@@ -345,8 +421,21 @@ class TeamsFormatter:
         
         return CardFactory.adaptive_card(card)
     
-    def create_help_card(self) -> Attachment:
-        """Create a help card with available commands"""
+    def create_help_card(self, commands: Optional[List[Tuple[str, str]]] = None) -> Attachment:
+        """
+        Create a help card with available commands
+
+        Args:
+            commands: (usage, description) pairs; defaults to the built-in commands
+        """
+        if commands is None:
+            commands = [
+                ("/help", "Show this help message"),
+                ("/reset", "Clear conversation history"),
+                ("/files", "List uploaded files"),
+                ("/nocode <message>", "Send message without code execution"),
+                ("/model quick|analysis|auto", "Pin this chat to the fast or the analysis model, or route automatically")
+            ]
         card = {
             "type": "AdaptiveCard",
             "version": "1.3",
@@ -366,10 +455,8 @@ class TeamsFormatter:
                 {
                     "type": "FactSet",
                     "facts": [
-                        {"title": "/help", "value": "Show this help message"},
-                        {"title": "/reset", "value": "Clear conversation history"},
-                        {"title": "/files", "value": "List uploaded files"},
-                        {"title": "/nocode <message>", "value": "Send message without code execution"}
+                        {"title": usage, "value": description}
+                        for usage, description in commands
                     ]
                 },
                 {
@@ -494,4 +581,40 @@ class TeamsFormatter:
             "$schema": "http://adaptivecards.io/schemas/adaptive-card.json"
         }
         
-        return CardFactory.adaptive_card(card)
\ No newline at end of file
+        return CardFactory.adaptive_card(card)
+    
+    def create_service_unavailable_card(self, message: str) -> Attachment:
+        """Create a friendly card shown while the Claude API is unavailable"""
+        card = {
+            "type": "AdaptiveCard",
+            "version": "1.3",
+            "body": [
+                {
+                    "type": "Container",
+                    "style": "warning",
+                    "items": [
+                        {
+                            "type": "TextBlock",
+                            "text": "⏳ Claude is taking a short break",
+                            "weight": "Bolder",
+                            "wrap": True
+                        },
+                        {
+                            "type": "TextBlock",
+                            "text": message,
+                            "wrap": True
+                        },
+                        {
+                            "type": "TextBlock",
+                            "text": "Please send your message again in a moment.",
+                            "size": "Small",
+                            "isSubtle": True,
+                            "wrap": True
+                        }
+                    ]
+                }
+            ],
+            "$schema": "http://adaptivecards.io/schemas/adaptive-card.json"
+        }
+        
+        return CardFactory.adaptive_card(card)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Fuzz benchmark for the incremental JSON string decoder
+Replays code_execution tool inputs with random chunk boundaries and compares
+the incremental decoder against the legacy per-delta find/rstrip/unicode_escape
+extraction, reporting throughput and how many documents each one mangles.
+
+Usage:
+    python tests/benchmarks/bench_json_stream.py [--docs 200] [--size 20000] [--seed 7]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import warnings
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.json_stream import IncrementalJSONStringExtractor
+
+ALPHABET = (
+    "abcdefghijklmnopqrstuvwxyz0123456789 _=+-*/()[]{}:,.'" * 4
+    + '"\\\n\t' + "é€π😀"
+)
+
+
+def legacy_extract(deltas):
+    """The extraction ClaudeCore used before the incremental decoder"""
+    code = ""
+    warnings.simplefilter("ignore", DeprecationWarning)
+    for partial_json in deltas:
+        try:
+            if '"code": "' in partial_json:
+                start = partial_json.find('"code": "') + 9
+                code_part = partial_json[start:].rstrip('"}')
+                code += code_part.encode('utf-8').decode('unicode_escape')
+            elif partial_json not in ['', '{"code": "', '"}']:
+                code_part = partial_json.rstrip('"}')
+                code += code_part.encode('utf-8').decode('unicode_escape')
+        except Exception:
+            pass
+    return code
+
+
+def incremental_extract(deltas):
+    """Decode with the shared incremental extractor"""
+    extractor = IncrementalJSONStringExtractor("code")
+    for partial_json in deltas:
+        extractor.feed(partial_json)
+    return extractor.value
+
+
+def make_corpus(rng, docs, size, max_chunk):
+    """Build (expected_code, deltas) pairs with random chunk boundaries"""
+    corpus = []
+    for _ in range(docs):
+        code = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(size // 2, size)))
+        document = json.dumps({"code": code}, ensure_ascii=rng.random() < 0.5)
+        deltas = []
+        i = 0
+        while i < len(document):
+            j = i + rng.randint(1, max_chunk)
+            deltas.append(document[i:j])
+            i = j
+        corpus.append((code, deltas))
+    return corpus
+
+
+def run(name, extract, corpus):
+    """Time one extractor over the corpus and count mismatches"""
+    total_chars = sum(len(d) for _, deltas in corpus for d in deltas)
+    mismatches = 0
+    start = time.perf_counter()
+    for expected, deltas in corpus:
+        if extract(deltas) != expected:
+            mismatches += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {elapsed * 1000:9.1f} ms  "
+          f"{total_chars / elapsed / 1e6:7.2f} Mchar/s  "
+          f"mangled {mismatches}/{len(corpus)}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--size', type=int, default=20000)
+    parser.add_argument('--max-chunk', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = make_corpus(rng, args.docs, args.size, args.max_chunk)
+    print(f"{args.docs} documents, up to {args.size} chars, chunks of 1-{args.max_chunk} chars")
+
+    run("legacy", legacy_extract, corpus)
+    mangled = run("incremental", incremental_extract, corpus)
+    sys.exit(1 if mangled else 0)
+
+
+if __name__ == "__main__":
+    main()
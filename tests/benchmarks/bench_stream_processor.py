@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Replay benchmark for the stream-event processor
+Feeds a synthetic (or recorded) Anthropic event stream through the legacy
+hasattr/if-elif handler with string concatenation and through the
+dispatch-table StreamProcessor, reporting the best and median time per event
+over interleaved repeats and checking that both produce the same reply and
+response data. Also reports the memory held per response: the legacy
+response_data dict against the slotted ChatResult.
+
+Recordings are JSONL files with one event per line, e.g.
+{"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Hi"}}
+
+Usage:
+    python tests/benchmarks/bench_stream_processor.py [--turns 200] [--deltas 400] [--repeat 7] [--recording events.jsonl]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+from types import SimpleNamespace
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.json_stream import IncrementalJSONStringExtractor
+from src.core.prompt_cache import empty_usage, read_usage
+from src.core.stream_processor import ChatResult, StreamProcessor
+
+WORDS = "the revenue grew by percent in while costs fell across each region quarter".split()
+
+
+def legacy_handle(event, state, response_data):
+    """The per-event handler ClaudeCore used before StreamProcessor (web search omitted)"""
+    if event.type == "message_start":
+        read_usage(getattr(getattr(event, 'message', None), 'usage', None), response_data["usage"])
+    elif event.type == "message_delta":
+        read_usage(getattr(event, 'usage', None), response_data["usage"])
+    elif event.type == "content_block_start":
+        if hasattr(event, 'content_block'):
+            if event.content_block.type == "server_tool_use" and event.content_block.name == "code_execution":
+                state["in_code_block"] = True
+                state["code_decoder"] = IncrementalJSONStringExtractor("code")
+                response_data["tool_used"] = "code_execution"
+    elif event.type == "content_block_delta":
+        if hasattr(event, 'delta'):
+            if hasattr(event.delta, 'text'):
+                state["assistant_message"] += event.delta.text
+            elif hasattr(event.delta, 'partial_json'):
+                if state["in_code_block"] and event.delta.partial_json:
+                    state["code_decoder"].feed(event.delta.partial_json)
+    elif event.type == "content_block_stop":
+        if state["in_code_block"]:
+            executed_code = state["code_decoder"].value
+            response_data["executed_code"] = executed_code
+            state["assistant_message"] += f"\n\n[Executed code:\n```python\n{executed_code}\n```]"
+            state["in_code_block"] = False
+            state["code_decoder"] = None
+    elif event.type == "server_tool_result":
+        if hasattr(event, 'result'):
+            if hasattr(event.result, 'stdout') and event.result.stdout:
+                response_data["code_output"] = event.result.stdout
+                state["assistant_message"] += f"\n[Code Output]:\n{event.result.stdout}"
+                figure_patterns = [
+                    r'(?:Figure|Plot|Graph|Chart|Image)\s+saved\s+(?:to|as):\s*(.+)',
+                    r'Saved\s+(?:figure|plot|graph|chart|image)\s+to:\s*(.+)',
+                    r'(?:Generated|Created)\s+(.+\.(?:png|jpg|jpeg|svg|pdf))'
+                ]
+                for pattern in figure_patterns:
+                    for match in re.findall(pattern, event.result.stdout, re.IGNORECASE):
+                        figure_path = match.strip()
+                        response_data["generated_figures"].append({
+                            "figure_name": os.path.basename(figure_path),
+                            "path_or_url": figure_path
+                        })
+            if hasattr(event.result, 'stderr') and event.result.stderr:
+                response_data["code_errors"] = event.result.stderr
+                state["assistant_message"] += f"\n[Errors]:\n{event.result.stderr}"
+
+
+def run_legacy(events):
+    state = {"assistant_message": "", "in_code_block": False, "code_decoder": None}
+    response_data = {"tool_used": None, "executed_code": None, "code_output": None,
+                     "generated_figures": [], "code_errors": None, "usage": empty_usage()}
+    for event in events:
+        legacy_handle(event, state, response_data)
+    return state["assistant_message"], response_data
+
+
+def run_processor(events):
+    result = ChatResult()
+    processor = StreamProcessor(result)
+    process = processor.process
+    for event in events:
+        process(event)
+    return processor.assistant_message, result
+
+
+def to_namespace(value):
+    """Turn a decoded JSON event into attribute-accessible objects"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+
+def make_turn(rng, deltas):
+    """One synthetic turn: text, a code_execution block, its result, more text"""
+    events = [{"type": "message_start", "message": {"usage": {"input_tokens": 1200, "output_tokens": 1}}},
+              {"type": "content_block_start", "content_block": {"type": "text"}}]
+    for _ in range(deltas // 2):
+        events.append({"type": "content_block_delta",
+                       "delta": {"type": "text_delta", "text": ' '.join(rng.choices(WORDS, k=3)) + ' '}})
+    events.append({"type": "content_block_stop"})
+    code = json.dumps({"code": "import pandas as pd\nprint(df.describe())\nplt.savefig('out.png')"})
+    events.append({"type": "content_block_start",
+                   "content_block": {"type": "server_tool_use", "name": "code_execution"}})
+    for i in range(0, len(code), 8):
+        events.append({"type": "content_block_delta",
+                       "delta": {"type": "input_json_delta", "partial_json": code[i:i + 8]}})
+    events.append({"type": "content_block_stop"})
+    events.append({"type": "server_tool_result",
+                   "result": {"stdout": "count 10\nFigure saved to: /tmp/outputs/out.png", "stderr": ""}})
+    for _ in range(deltas - deltas // 2):
+        events.append({"type": "content_block_delta",
+                       "delta": {"type": "text_delta", "text": ' '.join(rng.choices(WORDS, k=3)) + ' '}})
+    events.append({"type": "message_delta", "usage": {"output_tokens": deltas * 4}})
+    events.append({"type": "message_stop"})
+    return events
+
+
+def time_once(handler, turns):
+    """Run a handler over every turn once; returns (seconds, outputs)"""
+    start = time.perf_counter()
+    outputs = [handler(events) for events in turns]
+    return time.perf_counter() - start, outputs
+
+
+def run(handlers, turns, repeat):
+    """
+    Time each handler repeat times, interleaved so warm-up and machine noise
+    hit both alike; prints best and median ns/event and returns each
+    handler's outputs
+    """
+    total_events = sum(len(events) for events in turns)
+    timings = {name: [] for name in handlers}
+    outputs = {}
+    for _ in range(repeat):
+        for name, handler in handlers.items():
+            elapsed, outputs[name] = time_once(handler, turns)
+            timings[name].append(elapsed)
+    best = {}
+    for name, samples in timings.items():
+        best[name] = min(samples) / total_events * 1e9
+        median = statistics.median(samples) / total_events * 1e9
+        print(f"{name:<10} best {best[name]:7.1f} ns/event  median {median:7.1f} ns/event  "
+              f"({total_events / min(samples) / 1e6:.3f} Mevents/s)")
+    names = list(handlers)
+    print(f"speedup    {best[names[0]] / best[names[1]]:.2f}x (best of {repeat})")
+    return outputs
+
+
+def legacy_response_data():
+    """The plain dict ClaudeCore returned before ChatResult, with the same keys"""
+    return {"assistant_message": "", "tool_used": None, "executed_code": None, "code_output": None,
+            "generated_figures": [], "code_errors": None, "web_searches": [], "files_accessed": [],
+            "usage": empty_usage(), "context_window": None, "cached": False, "rate_limit_wait": 0.0,
+            "concurrency_wait": 0.0, "model": None, "route": None, "unavailable": False, "retry_in": None,
+            "error": False, "file_results": None, "preliminary": None, "attachment_results": None}
+
+
+def bytes_per_response(factory, count=10000):
+    """Bytes allocated per response object, including its empty lists and usage dict"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--deltas', type=int, default=400)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--recording', help="JSONL event recording to replay as every turn")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.recording:
+        with open(args.recording, 'r', encoding='utf-8') as f:
+            recorded = [json.loads(line) for line in f if line.strip()]
+        raw_turns = [recorded] * args.turns
+    else:
+        rng = random.Random(args.seed)
+        raw_turns = [make_turn(rng, args.deltas) for _ in range(args.turns)]
+    turns = [[to_namespace(event) for event in events] for events in raw_turns]
+    print(f"{args.turns} turns, {sum(len(t) for t in turns)} events")
+
+    outputs = run({"legacy": run_legacy, "processor": run_processor}, turns, args.repeat)
+    legacy, current = outputs["legacy"], outputs["processor"]
+
+    legacy_bytes, result_bytes = bytes_per_response(legacy_response_data), bytes_per_response(ChatResult)
+    print(f"response   dict {legacy_bytes:.0f} B  ChatResult {result_bytes:.0f} B  "
+          f"({1 - result_bytes / legacy_bytes:.0%} smaller)")
+
+    keys = ("tool_used", "executed_code", "code_output", "generated_figures", "code_errors", "usage")
+    mismatched = sum(
+        1 for (old_text, old_data), (new_text, new_data) in zip(legacy, current)
+        if old_text != new_text or any(old_data[key] != new_data[key] for key in keys)
+    )
+    print(f"mismatched turns: {mismatched}/{len(turns)}")
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test suite for the bounded activity log
+"""
+
+import unittest
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.activity_log import ActivityLog
+
+
+class TestActivityLog(unittest.TestCase):
+    """Test cases for ActivityLog"""
+
+    def setUp(self):
+        self.log = ActivityLog(('file_name', 'action'), maxlen=3)
+
+    def test_records_are_viewed_as_dicts(self):
+        """Entries read back as dicts with a formatted timestamp"""
+        self.log.append('a.csv', 'uploaded')
+        entry = self.log[0]
+        self.assertEqual(entry['file_name'], 'a.csv')
+        self.assertEqual(entry['action'], 'uploaded')
+        self.assertRegex(entry['timestamp'], r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+        with self.assertRaises(ValueError):
+            self.log.append('missing action')
+
+    def test_ring_buffer_bounds_history(self):
+        """Only the newest maxlen entries are retained"""
+        for i in range(5):
+            self.log.append(f'{i}.csv', 'accessed')
+        self.assertEqual(len(self.log), 3)
+        self.assertEqual([e['file_name'] for e in self.log], ['2.csv', '3.csv', '4.csv'])
+        self.assertEqual(self.log.dropped, 2)
+        self.assertEqual(self.log.cursor, 5)
+
+    def test_since_cursor(self):
+        """since() returns retained entries appended after a cursor"""
+        self.log.append('a.csv', 'accessed')
+        cursor = self.log.cursor
+        self.assertEqual(self.log.since(cursor), [])
+        self.log.append('b.csv', 'accessed')
+        self.log.append('c.csv', 'accessed')
+        self.assertEqual([e['file_name'] for e in self.log.since(cursor)], ['b.csv', 'c.csv'])
+        # Entries evicted before being read are skipped
+        for name in ('d.csv', 'e.csv', 'f.csv', 'g.csv'):
+            self.log.append(name, 'accessed')
+        self.assertEqual([e['file_name'] for e in self.log.since(cursor)], ['e.csv', 'f.csv', 'g.csv'])
+
+    def test_paging_newest_first(self):
+        """page() walks retained history newest first"""
+        for name in ('a.csv', 'b.csv', 'c.csv'):
+            self.log.append(name, 'accessed')
+        first = self.log.page(0, 2)
+        self.assertEqual([e['file_name'] for e in first['entries']], ['c.csv', 'b.csv'])
+        self.assertTrue(first['has_more'])
+        second = self.log.page(1, 2)
+        self.assertEqual([e['file_name'] for e in second['entries']], ['a.csv'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(self.log.page(5, 2)['entries'], [])
+        self.assertEqual(second['total'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test suite for spooled attachment ingestion
+"""
+
+import unittest
+import asyncio
+import hashlib
+from unittest.mock import MagicMock
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.bot.attachments import AttachmentIngest, discard_local_copy
+from src.core.claude_core import ClaudeCore
+from src.core.file_index import FileIndex
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestAttachmentIngest(unittest.IsolatedAsyncioTestCase):
+    """Test cases for AttachmentIngest"""
+
+    async def test_small_attachment_stays_in_memory(self):
+        """Test bytes under the cap are hashed and kept in memory"""
+        ingest = AttachmentIngest(max_memory=1024)
+        spooled = await ingest.spool(stream(b'a,b\n', b'1,2\n'), 'report.csv')
+        try:
+            self.assertEqual(spooled.size, 8)
+            self.assertEqual(spooled.sha256, hashlib.sha256(b'a,b\n1,2\n').hexdigest())
+            self.assertFalse(spooled.spilled)
+            self.assertEqual(spooled.file.read(), b'a,b\n1,2\n')
+        finally:
+            spooled.close()
+        self.assertEqual(ingest.get_stats()['spilled_to_disk'], 0)
+
+    async def test_large_attachment_spills_and_materializes_privately(self):
+        """Test bytes over the cap spill to disk and local copies get a private directory"""
+        ingest = AttachmentIngest(max_memory=16)
+        spooled = await ingest.spool(stream(b'x' * 10, b'y' * 10), '../../etc/data.csv')
+        try:
+            self.assertTrue(spooled.spilled)
+            path = spooled.materialize()
+        finally:
+            spooled.close()
+
+        self.assertEqual(os.path.basename(path), 'data.csv')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'x' * 10 + b'y' * 10)
+        discard_local_copy(path)
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+        stats = ingest.get_stats()
+        self.assertEqual((stats['files'], stats['bytes'], stats['spilled_to_disk']), (1, 20, 1))
+
+    async def test_ingest_all_is_bounded_ordered_and_isolates_failures(self):
+        """Test items run concurrently up to the limit, keep their order and fail alone"""
+        ingest = AttachmentIngest(max_parallel=2)
+        running = peak = 0
+
+        async def worker(name):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02 if name == 'a.csv' else 0.01)
+            running -= 1
+            if name == 'c.pdf':
+                raise RuntimeError("upload failed")
+            return {'file_id': f"id-{name}", 'file_name': name}
+
+        results, timings = await ingest.ingest_all(['a.csv', 'b.csv', 'c.pdf', 'd.txt'], worker, name_of=str)
+
+        self.assertEqual(peak, 2)
+        self.assertEqual([r and r['file_name'] for r in results], ['a.csv', 'b.csv', None, 'd.txt'])
+        self.assertEqual([t['file_name'] for t in timings], ['a.csv', 'b.csv', 'c.pdf', 'd.txt'])
+        self.assertEqual(timings[2]['error'], "upload failed")
+        self.assertIsNone(timings[0]['error'])
+        self.assertGreater(timings[0]['seconds'], 0)
+        stats = ingest.get_stats()
+        self.assertEqual((stats['batches'], stats['failures']), (1, 1))
+
+    async def test_upload_from_buffer_uses_streamed_digest(self):
+        """Test upload_fileobj sends the buffer and indexes it under the streamed digest"""
+        client = MagicMock()
+        client.files.create.return_value = MagicMock(id='file_1')
+        claude = ClaudeCore(api_key='test-api-key', client=client, async_client=MagicMock(),
+                            file_index=FileIndex(path=''))
+        spooled = await AttachmentIngest(max_memory=1024).spool(stream(b'a,b\n1,2\n'), 'report.csv')
+        try:
+            self.assertEqual(claude.upload_fileobj(spooled.file, 'report.csv', spooled.sha256), 'file_1')
+            self.assertEqual(claude.upload_fileobj(spooled.file, 'copy.csv', spooled.sha256), 'file_1')
+        finally:
+            spooled.close()
+
+        client.files.create.assert_called_once()
+        self.assertEqual(client.files.create.call_args.kwargs['file'][0], 'report.csv')
+        self.assertEqual(claude.file_index.get_stats()['bytes_saved'], 8)
+        self.assertEqual(claude.uploaded_files['copy.csv']['file_id'], 'file_1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test suite for the Message Batches runner
+Runs against a local stand-in for the batches endpoints
+"""
+
+import unittest
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from anthropic import Anthropic
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core.batch_runner import BatchRunner, load_manifest, normalize_items
+
+
+class StandInBatchServer(BaseHTTPRequestHandler):
+    """Minimal Message Batches API: create, retrieve (ends after N polls) and results"""
+
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _batch(self, batch_id):
+        batch = self.state['batches'][batch_id]
+        ended = batch['polls'] >= self.state['polls_until_done']
+        host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        return {
+            'id': batch_id, 'type': 'message_batch',
+            'processing_status': 'ended' if ended else 'in_progress',
+            'request_counts': {'processing': 0 if ended else len(batch['requests']), 'succeeded': 0,
+                               'errored': 0, 'canceled': 0, 'expired': 0},
+            'created_at': '2025-01-01T00:00:00Z', 'expires_at': '2025-01-02T00:00:00Z',
+            'ended_at': '2025-01-01T00:10:00Z' if ended else None,
+            'archived_at': None, 'cancel_initiated_at': None,
+            'results_url': f"{host}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.state['headers'].append(dict(self.headers))
+        if self.state['fail_next']:
+            self.state['fail_next'] -= 1
+            return self._send(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'busy'}})
+        batch_id = f"msgbatch_{len(self.state['batches']) + 1}"
+        self.state['batches'][batch_id] = {'requests': body['requests'], 'polls': 0}
+        self._send(200, self._batch(batch_id))
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        batch_id = parts[3]
+        if parts[-1] == 'results':
+            lines = []
+            for request in self.state['batches'][batch_id]['requests']:
+                prompt = request['params']['messages'][0]['content'][0]['text']
+                if 'fail' in prompt:
+                    result = {'type': 'errored', 'error': {'type': 'error', 'error': {
+                        'type': 'invalid_request_error', 'message': 'bad file'}}}
+                else:
+                    result = {'type': 'succeeded', 'message': {
+                        'id': 'msg_1', 'type': 'message', 'role': 'assistant',
+                        'model': request['params']['model'], 'stop_reason': 'end_turn', 'stop_sequence': None,
+                        'content': [{'type': 'text', 'text': f"Analysed: {prompt}"}],
+                        'usage': {'input_tokens': 1000, 'output_tokens': 200}}}
+                lines.append(json.dumps({'custom_id': request['custom_id'], 'result': result}))
+            return self._send(200, ('\n'.join(lines) + '\n').encode(), 'application/binary')
+        self.state['batches'][batch_id]['polls'] += 1
+        self._send(200, self._batch(batch_id))
+
+
+class TestBatchRunner(unittest.TestCase):
+    """Test cases for BatchRunner"""
+
+    def setUp(self):
+        StandInBatchServer.state = {'batches': {}, 'headers': [], 'polls_until_done': 3, 'fail_next': 0}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInBatchServer)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        client = Anthropic(api_key='test-key', base_url=f"http://127.0.0.1:{self.server.server_address[1]}",
+                           max_retries=0)
+        self.claude = ClaudeCore(api_key='test-key', client=client)
+        self.claude.resilience.base_delay = 0.0
+        self.sleeps = []
+        self.runner = BatchRunner(self.claude, poll_interval=1.0, max_poll_interval=3.0,
+                                  max_batch_size=2, sleep=self.sleeps.append)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def test_manifest_defaults_and_validation(self):
+        """Manifest defaults apply to items and custom_ids are validated"""
+        path = os.path.join(self.tmpdir.name, 'manifest.json')
+        with open(path, 'w') as f:
+            json.dump({'prompt': 'Summarize', 'model': 'claude-3-5-haiku-20241022',
+                       'items': [{'file_ids': ['file_a']}, {'custom_id': 'march', 'prompt': 'Totals'}]}, f)
+        items = load_manifest(path)
+        self.assertEqual(items[0]['custom_id'], 'item-0')
+        self.assertEqual(items[0]['prompt'], 'Summarize')
+        self.assertEqual(items[0]['files'], [{'file_id': 'file_a', 'file_name': 'file_a'}])
+        self.assertEqual(items[1]['model'], 'claude-3-5-haiku-20241022')
+        with self.assertRaises(ValueError):
+            normalize_items([{'custom_id': 'a', 'prompt': 'x'}, {'custom_id': 'a', 'prompt': 'y'}])
+        with self.assertRaises(ValueError):
+            normalize_items([{'custom_id': 'has space', 'prompt': 'x'}])
+
+    def test_requests_use_claude_core_construction(self):
+        """Batch params match ClaudeCore's message construction"""
+        items = normalize_items([{'custom_id': 'jan', 'prompt': 'Analyse', 'file_ids': ['file_1']}])
+        request = self.runner.build_requests(items)[0]
+        self.assertEqual(request['custom_id'], 'jan')
+        params = request['params']
+        self.assertNotIn('stream', params)
+        self.assertEqual(params['messages'][0]['content'][1], {'type': 'file', 'file': {'file_id': 'file_1'}})
+        self.assertEqual(params['tools'][0]['name'], 'code_execution')
+
+    def test_run_end_to_end(self):
+        """Items are chunked into batches, polled with backoff and results written as JSONL"""
+        StandInBatchServer.state['fail_next'] = 1  # first create is retried
+        items = normalize_items([
+            {'custom_id': 'jan', 'prompt': 'January report'},
+            {'custom_id': 'feb', 'prompt': 'February report'},
+            {'custom_id': 'mar', 'prompt': 'fail this one'}
+        ], {'use_code_execution': False})
+        output = os.path.join(self.tmpdir.name, 'results.jsonl')
+
+        summary = self.runner.run(items, output)
+
+        self.assertEqual(summary['batch_ids'], ['msgbatch_1', 'msgbatch_2'])
+        self.assertEqual(summary['results']['succeeded'], 2)
+        self.assertEqual(summary['results']['errored'], 1)
+        # Backoff doubles up to the ceiling, then restarts for the next batch
+        self.assertEqual(self.sleeps, [1.0, 2.0, 1.0, 2.0])
+        self.assertIn('message-batches-2024-09-24', StandInBatchServer.state['headers'][-1]['anthropic-beta'])
+
+        with open(output) as f:
+            records = {record['custom_id']: record for record in map(json.loads, f)}
+        self.assertEqual(records['jan']['text'], 'Analysed: January report')
+        self.assertEqual(records['jan']['usage']['input_tokens'], 1000)
+        self.assertEqual(records['mar']['status'], 'errored')
+        self.assertEqual(records['mar']['error']['message'], 'bad file')
+
+        stats = self.runner.get_stats()
+        self.assertEqual(stats['requests_submitted'], 3)
+        self.assertEqual(stats['usage']['output_tokens'], 400)
+        self.assertGreater(stats['cost_usd'], 0)
+
+    def test_wait_times_out(self):
+        """A batch that never ends raises TimeoutError"""
+        StandInBatchServer.state['polls_until_done'] = 1000
+        runner = BatchRunner(self.claude, poll_interval=10.0, timeout=25.0, sleep=lambda s: None)
+        batch_id = runner.submit(normalize_items([{'prompt': 'x'}]))[0]
+        with self.assertRaises(TimeoutError):
+            runner.wait(batch_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -52,7 +52,7 @@ class TestCodeExecutionBot(unittest.TestCase):
         """Test handling a simple message"""
         # Setup mock
         mock_claude = Mock()
-        mock_claude.chat.return_value = {
+        mock_claude.achat = AsyncMock(return_value={
             "assistant_message": "Hello! I can help you with that.",
             "tool_used": None,
             "executed_code": None,
@@ -61,7 +61,7 @@ class TestCodeExecutionBot(unittest.TestCase):
             "code_errors": None,
             "web_searches": [],
             "files_accessed": []
-        }
+        })
         mock_claude_class.return_value = mock_claude
         
         # Create context
@@ -128,7 +128,7 @@ class TestCodeExecutionBot(unittest.TestCase):
         
         # Setup mock claude
         mock_claude = Mock()
-        mock_claude.chat.return_value = {
+        mock_claude.achat = AsyncMock(return_value={
             "assistant_message": "Analysis complete",
             "tool_used": None,
             "executed_code": None,
@@ -137,7 +137,7 @@ class TestCodeExecutionBot(unittest.TestCase):
             "code_errors": None,
             "web_searches": [],
             "files_accessed": []
-        }
+        })
         
         self.bot.conversation_contexts['conv123'] = {
             'claude_instance': mock_claude,
@@ -146,9 +146,9 @@ class TestCodeExecutionBot(unittest.TestCase):
         
         await self.bot.on_message_activity(turn_context)
         
-        # Verify claude.chat was called with use_code_execution=False
-        mock_claude.chat.assert_called_once()
-        call_args = mock_claude.chat.call_args
+        # Verify claude.achat was called with use_code_execution=False
+        mock_claude.achat.assert_awaited_once()
+        call_args = mock_claude.achat.call_args
         self.assertEqual(call_args[1]['user_input'], "analyze this data")
         self.assertFalse(call_args[1]['use_code_execution'])
     
@@ -196,6 +196,14 @@ class TestTeamsFormatter(unittest.TestCase):
         self.assertEqual(card['type'], "AdaptiveCard")
         self.assertEqual(card['body'][0]['text'], text)
     
+    def test_create_simple_text_card_with_footnote(self):
+        """Test the cached-answer footnote is rendered subtly"""
+        attachment = self.formatter.create_simple_text_card("Answer", footnote="⚡ Cached answer")
+        card = attachment.content
+        self.assertEqual(card['body'][0]['text'], "Answer")
+        self.assertEqual(card['body'][1]['text'], "⚡ Cached answer")
+        self.assertTrue(card['body'][1]['isSubtle'])
+    
     def test_create_help_card(self):
         """Test creating help card"""
         attachment = self.formatter.create_help_card()
@@ -236,7 +244,15 @@ class TestTeamsFormatter(unittest.TestCase):
         # Check error message is included
         card_text = str(card)
         self.assertIn(error_msg, card_text)
-    
+
+    def test_create_service_unavailable_card(self):
+        """Test the friendly card shown while the API is unavailable"""
+        attachment = self.formatter.create_service_unavailable_card("Try again in about 30 seconds.")
+        card = attachment.content
+
+        self.assertEqual(card['body'][0]['style'], "warning")
+        self.assertIn("Try again in about 30 seconds.", str(card))
+
     def test_create_files_list_card(self):
         """Test creating files list card"""
         files = [
@@ -352,6 +368,42 @@ class TestTeamsFormatter(unittest.TestCase):
                            and item.get('style') == 'attention']
         self.assertTrue(len(error_containers) > 0)
 
+    def test_report_card_with_file_timings(self):
+        """Test fan-out report card lists per-file timings"""
+        response_data = {
+            "assistant_message": "**jan.csv**\n\nTotals up 4%",
+            "tool_used": "code_execution",
+            "file_results": [
+                {"file_name": "jan.csv", "seconds": 12.4, "model": "m", "error": False},
+                {"file_name": "feb.csv", "seconds": 3.0, "model": "m", "error": True}
+            ]
+        }
+
+        attachment = self.formatter.create_detailed_report_card(response_data, {'by': 'Claude AI'})
+
+        fact_sets = [item for item in attachment.content['body'] if item.get('type') == 'FactSet']
+        timings = fact_sets[-1]['facts']
+        self.assertEqual(timings[0], {"title": "jan.csv:", "value": "12.4s"})
+        self.assertEqual(timings[1]['value'], "3.0s ❌ failed")
+
+    def test_report_card_with_attachment_timings(self):
+        """Test the report card lists per-attachment ingest timings and failures"""
+        response_data = {
+            "assistant_message": "Summary",
+            "attachment_results": [
+                {"file_name": "a.pdf", "seconds": 0.84, "error": None},
+                {"file_name": "b.xlsx", "seconds": 2.0, "error": "download failed (HTTP 404)"}
+            ]
+        }
+
+        attachment = self.formatter.create_detailed_report_card(response_data, {'by': 'Claude AI'})
+
+        body = attachment.content['body']
+        heading = next(i for i, item in enumerate(body) if item.get('text') == "📥 Attachments")
+        facts = body[heading + 1]['facts']
+        self.assertEqual(facts[0], {"title": "a.pdf:", "value": "0.8s"})
+        self.assertEqual(facts[1]['value'], "2.0s ❌ download failed (HTTP 404)")
+
 
 def run_async_test(coro):
     """Helper to run async tests"""
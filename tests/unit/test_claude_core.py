@@ -5,12 +5,14 @@ Tests the core functionality without UI dependencies
 """
 
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+import asyncio
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 import os
 import sys
 # Add project root to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 from src.core import ClaudeCore
+from src.core.response_cache import ResponseCache
 
 
 class TestClaudeCore(unittest.TestCase):
@@ -241,6 +243,241 @@ class TestClaudeCore(unittest.TestCase):
         self.assertIsNone(response['code_errors'])
         self.assertEqual(len(response['web_searches']), 0)
     
+    @patch('src.core.claude_core.Anthropic')
+    def test_chat_reports_new_file_accesses_only(self, mock_anthropic_class):
+        """Test responses carry file accesses since the previous turn and history is paged"""
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        mock_client.messages.create.side_effect = lambda **kwargs: iter([
+            Mock(type="content_block_delta", delta=Mock(text="Done.")),
+            Mock(type="message_stop")
+        ])
+        claude = ClaudeCore(api_key=self.api_key, activity_history_size=2)
+        
+        first = claude.chat("Read these", file_attachments_info=[
+            {'file_id': 'f1', 'file_name': 'a.csv'}, {'file_id': 'f2', 'file_name': 'b.csv'}
+        ])
+        second = claude.chat("Thanks", use_code_execution=False)
+        third = claude.chat("And this", file_attachments_info=[{'file_id': 'f3', 'file_name': 'c.csv'}])
+        
+        self.assertEqual([f['file_name'] for f in first['files_accessed']], ['a.csv', 'b.csv'])
+        self.assertEqual(second['files_accessed'], [])
+        self.assertEqual([f['file_name'] for f in third['files_accessed']], ['c.csv'])
+        
+        page = claude.get_files_accessed(page_size=10)
+        self.assertEqual([f['file_name'] for f in page['entries']], ['c.csv', 'b.csv'])
+        self.assertEqual(page['dropped'], 1)
+    
+    @patch('src.core.claude_core.Anthropic')
+    def test_chat_prompt_caching_and_usage(self, mock_anthropic_class):
+        """Test cache breakpoints are sent and cache usage is reported"""
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        
+        usage_start = Mock(spec=['input_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens'],
+                           input_tokens=12, cache_creation_input_tokens=0, cache_read_input_tokens=2048)
+        mock_events = [
+            Mock(type="message_start", message=Mock(usage=usage_start)),
+            Mock(type="content_block_delta", delta=Mock(text="Cached!")),
+            Mock(type="message_delta", usage=Mock(spec=['output_tokens'], output_tokens=7)),
+            Mock(type="message_stop")
+        ]
+        mock_client.messages.create.return_value = iter(mock_events)
+        
+        claude = ClaudeCore(api_key=self.api_key, prompt_cache_breakpoints=2)
+        response = claude.chat("Hello")
+        
+        kwargs = mock_client.messages.create.call_args[1]
+        self.assertEqual(kwargs['tools'][-1]['cache_control'], {"type": "ephemeral"})
+        self.assertIn('cache_control', kwargs['messages'][-1]['content'][-1])
+        self.assertNotIn('cache_control', claude.conversation_history[0]['content'][-1])
+        self.assertEqual(response['usage']['cache_read_input_tokens'], 2048)
+        self.assertEqual(response['usage']['input_tokens'], 12)
+        self.assertEqual(response['usage']['output_tokens'], 7)
+        self.assertEqual(claude.get_usage_stats()['cache_read_input_tokens'], 2048)
+    
+    @patch('src.core.claude_core.Anthropic')
+    def test_chat_prompt_caching_disabled(self, mock_anthropic_class):
+        """Test no cache markers are sent when caching is disabled"""
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        mock_client.messages.create.return_value = iter([Mock(type="message_stop")])
+        
+        claude = ClaudeCore(api_key=self.api_key, prompt_cache_breakpoints=0)
+        claude.chat("Hello")
+        
+        kwargs = mock_client.messages.create.call_args[1]
+        self.assertNotIn('cache_control', kwargs['tools'][-1])
+        self.assertNotIn('cache_control', kwargs['messages'][0]['content'][-1])
+    
+    @patch('src.core.claude_core.Anthropic')
+    def test_chat_trims_history_to_budget(self, mock_anthropic_class):
+        """Test the oldest turns are dropped to fit the input budget"""
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        mock_client.messages.create.return_value = iter([Mock(type="message_stop")])
+        
+        claude = ClaudeCore(api_key=self.api_key, max_input_tokens=700)
+        for i in range(4):
+            claude.add_message("user", f"question {i} " + "x" * 800)
+            claude.add_message("assistant", f"answer {i} " + "y" * 800)
+        response = claude.chat("latest", use_code_execution=False)
+        
+        messages = mock_client.messages.create.call_args[1]['messages']
+        self.assertEqual(messages[0]['role'], "user")
+        self.assertEqual(messages[-1]['content'][0]['text'], "latest")
+        self.assertGreater(response['context_window']['dropped_messages'], 0)
+        self.assertEqual(len(claude.conversation_history), 10)
+    
+    @patch('src.core.claude_core.Anthropic')
+    def test_chat_response_cache(self, mock_anthropic_class):
+        """Test repeated tool-free questions are served from a shared cache"""
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        mock_client.messages.create.side_effect = lambda **kwargs: iter([
+            Mock(type="content_block_delta", delta=Mock(text="GST is 15%.")),
+            Mock(type="message_stop")
+        ])
+        cache = ResponseCache(max_entries=10, ttl_seconds=60)
+        
+        first = ClaudeCore(api_key=self.api_key, response_cache=cache)
+        second = ClaudeCore(api_key=self.api_key, response_cache=cache)
+        self.assertFalse(first.chat("What is GST?", use_code_execution=False)['cached'])
+        response = second.chat("what is gst", use_code_execution=False)
+        
+        self.assertTrue(response['cached'])
+        self.assertEqual(response['assistant_message'], "GST is 15%.")
+        self.assertEqual(mock_client.messages.create.call_count, 1)
+        self.assertEqual(len(second.conversation_history), 2)
+        
+        # Turns with code execution are never cached
+        second.chat("what is gst", use_code_execution=True)
+        self.assertEqual(mock_client.messages.create.call_count, 2)
+        
+        # After /reset the same question is answered afresh, then cached for the new namespace
+        first.reset_conversation()
+        self.assertFalse(first.chat("What is GST?", use_code_execution=False)['cached'])
+        self.assertEqual(mock_client.messages.create.call_count, 3)
+        first.reset_conversation()
+        self.assertFalse(first.chat("What is GST?", use_code_execution=False)['cached'])
+        self.assertEqual(mock_client.messages.create.call_count, 4)
+    
+    @patch('src.core.claude_core.Anthropic')
+    def test_chat_code_capture_split_escapes(self, mock_anthropic_class):
+        """Test executed code survives escapes split across partial_json deltas"""
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        
+        code_block = Mock(type="server_tool_use")
+        code_block.name = "code_execution"
+        deltas = ['{"code": "print(\\"', 'caf\\u00', 'e9\\")\\', 'nx = 1"}']
+        mock_events = [Mock(type="content_block_start", content_block=code_block)]
+        mock_events += [
+            Mock(type="content_block_delta", delta=Mock(spec=['partial_json'], partial_json=d))
+            for d in deltas
+        ]
+        mock_events.append(Mock(type="content_block_stop"))
+        mock_client.messages.create.return_value = iter(mock_events)
+        
+        claude = ClaudeCore(api_key=self.api_key)
+        response = claude.chat("Run code")
+        
+        self.assertEqual(response['tool_used'], "code_execution")
+        self.assertEqual(response['executed_code'], 'print("café")\nx = 1')
+    
+    @patch('src.core.claude_core.AsyncAnthropic')
+    def test_achat_basic(self, mock_async_anthropic_class):
+        """Test async chat produces the same response_data as chat"""
+        mock_async_client = Mock()
+        mock_async_anthropic_class.return_value = mock_async_client
+        
+        mock_events = [
+            Mock(type="content_block_delta", delta=Mock(text="Hello, ")),
+            Mock(type="content_block_delta", delta=Mock(text="async world.")),
+            Mock(type="message_stop")
+        ]
+        
+        async def event_stream():
+            for event in mock_events:
+                yield event
+        
+        mock_async_client.messages.create = AsyncMock(return_value=event_stream())
+        
+        claude = ClaudeCore(api_key=self.api_key)
+        response = asyncio.run(claude.achat("Hello", use_code_execution=False))
+        
+        self.assertEqual(response['assistant_message'], "Hello, async world.")
+        self.assertIsNone(response['tool_used'])
+        self.assertEqual(len(claude.conversation_history), 2)
+        self.assertEqual(claude.conversation_history[1]['content'], "Hello, async world.")
+        self.assertNotIn('tools', mock_async_client.messages.create.call_args[1])
+    
+    @patch('src.core.claude_core.AsyncAnthropic')
+    def test_achat_reports_progress(self, mock_async_anthropic_class):
+        """Test achat forwards text and code deltas to the progress callback"""
+        mock_async_client = Mock()
+        mock_async_anthropic_class.return_value = mock_async_client
+        
+        code_block = Mock(type="server_tool_use")
+        code_block.name = "code_execution"
+        mock_events = [
+            Mock(type="content_block_delta", delta=Mock(text="Working")),
+            Mock(type="content_block_start", content_block=code_block),
+            Mock(type="content_block_delta", delta=Mock(spec=['partial_json'], partial_json='{"code": "x = 1"}')),
+            Mock(type="content_block_stop")
+        ]
+        
+        async def event_stream():
+            for event in mock_events:
+                yield event
+        
+        mock_async_client.messages.create = AsyncMock(return_value=event_stream())
+        progress = []
+        
+        claude = ClaudeCore(api_key=self.api_key)
+        asyncio.run(claude.achat("Run", on_progress=lambda kind, text: progress.append((kind, text))))
+        
+        self.assertEqual(progress, [("text", "Working"), ("code_start", ""), ("code", "x = 1")])
+    
+    @patch('src.core.claude_core.AsyncAnthropic')
+    def test_achat_error(self, mock_async_anthropic_class):
+        """Test async chat returns an error response instead of raising"""
+        mock_async_client = Mock()
+        mock_async_anthropic_class.return_value = mock_async_client
+        mock_async_client.messages.create = AsyncMock(side_effect=RuntimeError("boom"))
+        
+        claude = ClaudeCore(api_key=self.api_key)
+        response = asyncio.run(claude.achat("Hello"))
+        
+        self.assertEqual(response['assistant_message'], "Error: boom")
+        self.assertTrue(response['error'])
+        self.assertEqual(response['generated_figures'], [])
+    
+    @patch('src.core.claude_core.AsyncAnthropic')
+    def test_achat_cancelled_turn_is_dropped(self, mock_async_anthropic_class):
+        """Test a cancelled achat leaves no unanswered user turn in the history"""
+        mock_async_client = Mock()
+        mock_async_anthropic_class.return_value = mock_async_client
+        
+        async def event_stream():
+            yield Mock(type="content_block_delta", delta=Mock(text="Partial"))
+            await asyncio.sleep(10)
+        
+        mock_async_client.messages.create = AsyncMock(return_value=event_stream())
+        claude = ClaudeCore(api_key=self.api_key)
+        claude.add_message("user", "Earlier")
+        claude.add_message("assistant", "Answer")
+        
+        async def run():
+            task = asyncio.ensure_future(claude.achat("Hello", use_code_execution=False))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.wait({task})
+            return task
+        
+        self.assertTrue(asyncio.run(run()).cancelled())
+        self.assertEqual([m['content'] for m in claude.conversation_history], ["Earlier", "Answer"])
+    
     @patch('src.core.claude_core.open', new_callable=unittest.mock.mock_open, read_data=b'test file content')
     @patch('src.core.claude_core.Anthropic')
     def test_upload_file(self, mock_anthropic_class, mock_open):
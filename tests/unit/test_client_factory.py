@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test suite for the shared Anthropic client factory
+"""
+
+import unittest
+import asyncio
+from unittest.mock import patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core import client_factory
+from src.core.client_factory import (
+    get_shared_client, get_shared_async_client, get_client_stats, pool_settings, close_shared_clients
+)
+
+
+class TestClientFactory(unittest.TestCase):
+    """Test cases for the process-wide client pool"""
+
+    def tearDown(self):
+        """Drop shared clients between tests"""
+        asyncio.run(close_shared_clients())
+
+    def test_same_client_is_reused(self):
+        """Repeated calls return one client per API key"""
+        first = get_shared_client("key-a")
+        self.assertIs(get_shared_client("key-a"), first)
+        self.assertIsNot(get_shared_client("key-b"), first)
+        self.assertIs(get_shared_async_client("key-a"), get_shared_async_client("key-a"))
+
+        stats = get_client_stats()
+        self.assertEqual(stats['shared_clients'], 2)
+        self.assertEqual(stats['shared_async_clients'], 1)
+
+    def test_beta_headers_are_sent(self):
+        """Shared clients carry the code execution and files beta header"""
+        client = get_shared_client("key-a")
+        self.assertIn("code-execution-2025-05-22", client.default_headers["anthropic-beta"])
+
+    def test_pool_settings_from_environment(self):
+        """Pool sizes and HTTP/2 can be configured"""
+        with patch.dict(os.environ, {'ANTHROPIC_MAX_CONNECTIONS': '7', 'ANTHROPIC_HTTP2': 'false'}):
+            settings = pool_settings()
+        self.assertEqual(settings['max_connections'], 7)
+        self.assertFalse(settings['http2'])
+
+    def test_http2_follows_h2_availability(self):
+        """HTTP/2 is only enabled automatically when h2 is installed"""
+        with patch.dict(os.environ, {'ANTHROPIC_HTTP2': 'auto'}), \
+             patch.object(client_factory, 'http2_available', return_value=False):
+            self.assertFalse(pool_settings()['http2'])
+
+    def test_missing_api_key(self):
+        """A missing key fails like ClaudeCore does"""
+        with patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(ValueError):
+                get_shared_client()
+
+    def test_claude_core_uses_injected_clients(self):
+        """Conversations built on the shared clients share one pool"""
+        client = get_shared_client("key-a")
+        async_client = get_shared_async_client("key-a")
+        first = ClaudeCore(api_key="key-a", client=client, async_client=async_client)
+        second = ClaudeCore(api_key="key-a", client=client, async_client=async_client)
+        self.assertIs(first.client, second.client)
+        self.assertIs(first.async_client, second.async_client)
+
+
+if __name__ == '__main__':
+    unittest.main()
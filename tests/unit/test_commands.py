@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test suite for slash command pre-dispatch
+"""
+
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from botbuilder.core import TurnContext
+from botbuilder.schema import Activity, Attachment, ChannelAccount, ConversationAccount
+from src.bot import CodeExecutionBot
+from src.bot.commands import CommandRouter
+
+
+class TestCommandRouter(unittest.IsolatedAsyncioTestCase):
+    """Test cases for CommandRouter"""
+
+    def setUp(self):
+        self.router = CommandRouter()
+        self.calls = []
+
+        async def echo(turn_context, args):
+            self.calls.append(args)
+
+        async def broken(turn_context, args):
+            raise RuntimeError("boom")
+
+        self.router.register('echo', echo, "Echo", usage="/echo <text>")
+        self.router.register('broken', broken)
+
+    def test_parse(self):
+        """Only registered commands match, case-insensitively, with their arguments"""
+        command, args = self.router.parse("  /ECHO hello  world ")
+        self.assertEqual((command.name, args), ('echo', "hello  world"))
+        self.assertIsNone(self.router.parse("/nocode analyse this"))
+        self.assertIsNone(self.router.parse("echo"))
+        self.assertIsNone(self.router.parse(None))
+        self.assertEqual(self.router.parse("/broken")[0].usage, "/broken")
+
+    async def test_dispatch_records_latency_and_errors(self):
+        """Dispatch times every call and counts handler errors"""
+        command, args = self.router.parse("/echo hi")
+        await self.router.dispatch(command, None, args)
+        with self.assertRaises(RuntimeError):
+            await self.router.dispatch(self.router.parse("/broken")[0], None)
+
+        self.assertEqual(self.calls, ["hi"])
+        stats = self.router.get_stats()
+        self.assertEqual(stats['echo']['calls'], 1)
+        self.assertIsNotNone(stats['echo']['p95_ms'])
+        self.assertEqual((stats['broken']['calls'], stats['broken']['errors']), (1, 1))
+        self.assertEqual([c.name for c in self.router.commands()], ['echo', 'broken'])
+
+
+class TestBotCommands(unittest.IsolatedAsyncioTestCase):
+    """Test commands are served before attachments or Claude are touched"""
+
+    def setUp(self):
+        self.bot = CodeExecutionBot(Mock(), Mock())
+        self.bot._process_attachment = AsyncMock()
+        self.bot._send_typing_indicator = AsyncMock()
+
+    def turn_context(self, text, attachments=None):
+        turn_context = Mock(spec=TurnContext)
+        turn_context.activity = Activity(
+            type="message",
+            text=text,
+            from_property=ChannelAccount(id="user123", name="Test User"),
+            conversation=ConversationAccount(id="conv123"),
+            recipient=ChannelAccount(id="bot123"),
+            attachments=attachments or []
+        )
+        turn_context.send_activity = AsyncMock()
+        return turn_context
+
+    async def test_reset_with_attachment_skips_ingestion(self):
+        """A /reset carrying a forgotten attachment never downloads it"""
+        claude = Mock()
+        self.bot.conversation_contexts['conv123'] = {'claude_instance': claude, 'pending_files': []}
+        attachment = Attachment(content_type="text/csv", content_url="https://x/a.csv", name="a.csv")
+        turn_context = self.turn_context("/reset", [attachment])
+
+        await self.bot.on_message_activity(turn_context)
+
+        claude.reset_conversation.assert_called_once()
+        self.bot._process_attachment.assert_not_awaited()
+        self.bot._send_typing_indicator.assert_not_awaited()
+        self.assertIn("Conversation history cleared", turn_context.send_activity.call_args[0][0].text)
+        self.assertEqual(self.bot.commands.get_stats()['reset']['calls'], 1)
+
+    async def test_files_without_conversation_creates_nothing(self):
+        """/files in a new conversation answers without creating a ClaudeCore"""
+        turn_context = self.turn_context("/files")
+        await self.bot.on_message_activity(turn_context)
+        self.assertIn("No files uploaded yet", turn_context.send_activity.call_args[0][0].text)
+        self.assertEqual(self.bot.conversation_contexts, {})
+
+    async def test_help_lists_registered_commands(self):
+        """/help is built from the registry"""
+        turn_context = self.turn_context("/help")
+        await self.bot.on_message_activity(turn_context)
+        card = turn_context.send_activity.call_args[0][0].attachments[0].content
+        facts = next(item for item in card['body'] if item.get('type') == 'FactSet')['facts']
+        titles = [fact['title'] for fact in facts]
+        for usage in ("/reset", "/status", "/cancel", "/stats", "/model quick|analysis|auto", "/nocode <message>"):
+            self.assertIn(usage, titles)
+
+    async def test_cancel_stops_a_running_turn(self):
+        """/cancel is served immediately, even while a turn is running"""
+        started = asyncio.Event()
+
+        async def slow_turn(turn_context):
+            started.set()
+            await asyncio.sleep(10)
+
+        self.bot._handle_message = slow_turn
+        running = asyncio.ensure_future(self.bot.on_message_activity(self.turn_context("long question")))
+        await started.wait()
+
+        turn_context = self.turn_context("/cancel")
+        await self.bot.on_message_activity(turn_context)
+        await running
+
+        self.assertIn("Cancelled the running request", turn_context.send_activity.call_args[0][0].text)
+        self.assertEqual(self.bot.mailbox.get_stats()['turns_cancelled'], 1)
+
+    async def test_cancel_closes_the_streaming_placeholder(self):
+        """A cancelled streaming turn replaces its placeholder instead of leaving it open"""
+        started = asyncio.Event()
+
+        async def achat(user_input, use_code_execution, file_attachments_info, on_progress):
+            on_progress("text", "Partial answer")
+            started.set()
+            await asyncio.sleep(10)
+
+        claude = Mock()
+        claude.achat = achat
+        self.bot.conversation_contexts['conv123'] = {'claude_instance': claude, 'pending_files': []}
+        self.bot.streaming_update_interval = 10
+        question = self.turn_context("long question")
+        question.send_activity = AsyncMock(return_value=Mock(id="activity-1"))
+        question.update_activity = AsyncMock()
+        running = asyncio.ensure_future(self.bot.on_message_activity(question))
+        await started.wait()
+        await asyncio.sleep(0)
+
+        await self.bot.on_message_activity(self.turn_context("/cancel"))
+        await running
+
+        self.assertIn("Cancelled", question.update_activity.call_args[0][0].text)
+        self.assertEqual(question.send_activity.await_count, 1)
+        self.assertEqual(self.bot.mailbox.get_stats()['turns_cancelled'], 1)
+
+    async def test_status_and_stats(self):
+        """/status and /stats answer with text summaries"""
+        turn_context = self.turn_context("/status")
+        await self.bot.on_message_activity(turn_context)
+        self.assertIn("No messages yet", turn_context.send_activity.call_args[0][0].text)
+
+        turn_context = self.turn_context("/stats")
+        await self.bot.on_message_activity(turn_context)
+        self.assertIn("File index hit rate", turn_context.send_activity.call_args[0][0].text)
+
+
+if __name__ == '__main__':
+    unittest.main()
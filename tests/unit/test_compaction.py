@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test suite for background conversation compaction
+"""
+
+import unittest
+from unittest.mock import Mock, AsyncMock
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core.compaction import ConversationCompactor, SUMMARY_HEADER
+
+
+def build_history(claude, turns):
+    """Fill claude's history with alternating user/assistant turns"""
+    for i in range(turns):
+        content = [{"type": "text", "text": f"question {i} " + "x" * 400}]
+        if i == 0:
+            content.append({"type": "file", "file": {"file_id": "file-abc"}})
+        claude.conversation_history.append({"role": "user", "content": content})
+        claude.add_message("assistant", f"answer {i} " + "y" * 400)
+
+
+class TestConversationCompactor(unittest.IsolatedAsyncioTestCase):
+    """Test cases for ConversationCompactor"""
+
+    def setUp(self):
+        """Set up a ClaudeCore with a mocked summarizer"""
+        self.claude = ClaudeCore(api_key="test-api-key")
+        self.claude.async_client = Mock()
+        self.claude.async_client.messages.create = AsyncMock(
+            return_value=Mock(content=[Mock(type="text", text="- earlier facts")])
+        )
+        self.compactor = ConversationCompactor(token_threshold=500, keep_recent_turns=2)
+
+    async def test_compacts_old_turns_and_archives_them(self):
+        """Older turns become a summary pair; originals move to the archive"""
+        build_history(self.claude, 6)
+        original = list(self.claude.conversation_history)
+        self.assertTrue(self.compactor.needs_compaction(self.claude))
+
+        compacted = await self.compactor.compact(self.claude)
+
+        self.assertTrue(compacted)
+        history = self.claude.conversation_history
+        self.assertEqual(len(history), 2 + 4)
+        self.assertEqual([m['role'] for m in history], ["user", "assistant"] * 3)
+        self.assertIn(SUMMARY_HEADER, history[0]['content'][0]['text'])
+        self.assertIn("- earlier facts", history[0]['content'][0]['text'])
+        self.assertIn({"type": "file", "file": {"file_id": "file-abc"}}, history[0]['content'])
+        self.assertEqual(history[2:], original[-4:])
+        self.assertEqual(self.claude.history_archive, original[:8])
+
+    async def test_summary_entries_are_not_sent_with_private_keys(self):
+        """Private bookkeeping keys never reach the API"""
+        build_history(self.claude, 6)
+        await self.compactor.compact(self.claude)
+
+        kwargs, _ = self.claude._prepare_chat("next", False, None)
+        for message in kwargs['messages']:
+            self.assertEqual(set(message), {"role", "content"})
+
+    async def test_discards_summary_if_history_reset(self):
+        """A /reset during summarization is not undone"""
+        build_history(self.claude, 6)
+
+        async def slow_summary(**kwargs):
+            self.claude.reset_conversation()
+            return Mock(content=[Mock(type="text", text="stale")])
+
+        self.claude.async_client.messages.create = AsyncMock(side_effect=slow_summary)
+        compacted = await self.compactor.compact(self.claude)
+
+        self.assertFalse(compacted)
+        self.assertEqual(self.claude.conversation_history, [])
+        self.assertEqual(self.compactor.aborted, 1)
+
+    async def test_concurrent_turn_is_preserved(self):
+        """A turn appended while summarizing stays after the summary"""
+        build_history(self.claude, 6)
+
+        async def summary_with_new_turn(**kwargs):
+            self.claude.add_message("user", "new question")
+            return Mock(content=[Mock(type="text", text="summary")])
+
+        self.claude.async_client.messages.create = AsyncMock(side_effect=summary_with_new_turn)
+        await self.compactor.compact(self.claude)
+
+        self.assertEqual(self.claude.conversation_history[-1], {"role": "user", "content": "new question"})
+
+    async def test_schedule_runs_in_background_once(self):
+        """schedule() starts one task per conversation and skips small histories"""
+        self.assertIsNone(self.compactor.schedule(self.claude))
+
+        build_history(self.claude, 6)
+        task = self.compactor.schedule(self.claude)
+        self.assertIs(self.compactor.schedule(self.claude), task)
+        await task
+        self.assertEqual(self.compactor.get_stats()['compactions'], 1)
+        self.assertFalse(self.compactor.needs_compaction(self.claude))
+
+    async def test_failure_leaves_history_untouched(self):
+        """Summarizer errors are counted and history is unchanged"""
+        build_history(self.claude, 6)
+        original = list(self.claude.conversation_history)
+        self.claude.async_client.messages.create = AsyncMock(side_effect=RuntimeError("overloaded"))
+
+        self.assertFalse(await self.compactor.compact(self.claude))
+        self.assertEqual(self.claude.conversation_history, original)
+        self.assertEqual(self.compactor.failures, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test suite for the AIMD concurrency limiter
+"""
+
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+import anthropic
+from src.core import ClaudeCore
+from src.core.concurrency import AdaptiveConcurrencyLimiter
+from src.core.resilience import ResilienceLayer
+
+
+def overloaded_error():
+    """Build a 529 overloaded error"""
+    return anthropic.APIStatusError("overloaded", response=Mock(status_code=529, headers={}), body=None)
+
+
+def server_error():
+    """Build a retryable 500 that is not an overload signal"""
+    return anthropic.APIStatusError("server error", response=Mock(status_code=500, headers={}), body=None)
+
+
+class TestAdaptiveConcurrencyLimiter(unittest.IsolatedAsyncioTestCase):
+    """Test cases for AdaptiveConcurrencyLimiter"""
+
+    async def test_waiters_are_admitted_in_order(self):
+        """Callers beyond the limit queue and are admitted as slots free up"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+        await limiter.acquire()
+        order = []
+
+        async def worker(name):
+            await limiter.acquire()
+            order.append(name)
+            limiter.release()
+
+        tasks = [asyncio.ensure_future(worker(name)) for name in ("a", "b")]
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.get_stats()['queued'], 2)
+
+        limiter.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["a", "b"])
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_additive_increase_when_saturated(self):
+        """Healthy, saturated traffic grows the limit by about one per window"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=10)
+        for _ in range(3):
+            await limiter.acquire()
+            await limiter.acquire()
+            limiter.release(ttft=0.5)
+            limiter.release(ttft=0.5)
+        self.assertEqual(limiter.get_stats()['limit'], 3)
+        self.assertEqual(limiter.history[-1]['reason'], 'increase')
+
+    async def test_idle_traffic_does_not_grow_limit(self):
+        """The limit only grows while it is actually being used"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        for _ in range(20):
+            await limiter.acquire()
+            limiter.release(ttft=0.5)
+        self.assertEqual(limiter.get_stats()['limit'], 8)
+
+    async def test_overload_halves_limit_once_per_cooldown(self):
+        """Concurrent 429s of one congestion event halve the limit once"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, decrease_cooldown=60)
+        limiter.record_overload()
+        limiter.record_overload()
+        stats = limiter.get_stats()
+        self.assertEqual(stats['limit'], 8)
+        self.assertEqual(stats['overloads'], 2)
+        self.assertEqual(stats['history'][-1]['reason'], 'overload')
+
+    async def test_ttft_degradation_decreases_limit(self):
+        """A first-token time far above the baseline halves the limit"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, decrease_cooldown=0)
+        for _ in range(3):
+            await limiter.acquire()
+            limiter.release(ttft=0.5)
+        await limiter.acquire()
+        limiter.release(ttft=5.0)
+        self.assertEqual(limiter.get_stats()['limit'], 4)
+        self.assertEqual(limiter.get_stats()['ttft_degraded'], 1)
+
+    async def test_ttft_baseline_per_route(self):
+        """A slower route has its own baseline instead of reading as degradation"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, decrease_cooldown=0)
+        for _ in range(3):
+            await limiter.acquire()
+            limiter.release(ttft=0.5, key='quick')
+        await limiter.acquire()
+        limiter.release(ttft=5.0, key='analysis')
+        stats = limiter.get_stats()
+        self.assertEqual(stats['limit'], 8)
+        self.assertEqual(stats['ttft_degraded'], 0)
+        self.assertEqual(stats['ttft_baseline_seconds'], {'quick': 0.5, 'analysis': 5.0})
+
+    async def test_min_limit_floor(self):
+        """Decreases never go below min_limit"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=1, decrease_cooldown=0)
+        for _ in range(5):
+            limiter.record_overload()
+        self.assertEqual(limiter.get_stats()['limit'], 1)
+
+    async def test_claude_core_reports_retried_overload(self):
+        """An overloaded attempt lowers the limit even when the retry succeeds"""
+        async def event_stream():
+            yield Mock(type="content_block_delta", delta=Mock(text="ok"))
+
+        async_client = Mock()
+        async_client.messages.create = AsyncMock(side_effect=[overloaded_error(), event_stream()])
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        claude = ClaudeCore(api_key="test-api-key", async_client=async_client,
+                            resilience=ResilienceLayer(base_delay=0.0), concurrency_limiter=limiter)
+
+        response = await claude.achat("Hello", use_code_execution=False)
+
+        self.assertEqual(response['assistant_message'], "ok")
+        self.assertEqual(limiter.get_stats()['limit'], 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_claude_core_ttft_excludes_retry_backoff(self):
+        """TTFT is timed per attempt, so backoff before a retry is not counted"""
+        async def event_stream():
+            yield Mock(type="content_block_delta", delta=Mock(text="ok"))
+
+        async_client = Mock()
+        async_client.messages.create = AsyncMock(side_effect=[server_error(), event_stream()])
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        claude = ClaudeCore(api_key="test-api-key", async_client=async_client,
+                            resilience=ResilienceLayer(), concurrency_limiter=limiter)
+
+        with patch('src.core.resilience.random.uniform', return_value=0.2):
+            await claude.achat("Hello", use_code_execution=False)
+
+        self.assertEqual(async_client.messages.create.await_count, 2)
+        baselines = limiter.get_stats()['ttft_baseline_seconds']
+        self.assertEqual(list(baselines), [claude.model])
+        self.assertLess(baselines[claude.model], 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
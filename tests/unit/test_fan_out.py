@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test suite for per-file fan-out analysis
+"""
+
+import unittest
+import asyncio
+import time
+from unittest.mock import patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core.fan_out import FanOutAnalyzer
+from src.core.stream_processor import ChatResult
+
+FILES = [
+    {'file_id': 'f1', 'file_name': 'jan.csv'},
+    {'file_id': 'f2', 'file_name': 'feb.csv'},
+    {'file_id': 'f3', 'file_name': 'mar.csv'}
+]
+DELAYS = {'jan.csv': 0.15, 'feb.csv': 0.05, 'mar.csv': 0.1}
+
+
+class FakeChild:
+    """Stands in for a spawned ClaudeCore; answers after a per-file delay"""
+
+    active = 0
+    peak = 0
+
+    async def achat(self, user_input, use_code_execution=True, file_attachments_info=None, on_progress=None):
+        name = file_attachments_info[0]['file_name']
+        FakeChild.active += 1
+        FakeChild.peak = max(FakeChild.peak, FakeChild.active)
+        try:
+            await asyncio.sleep(DELAYS.get(name, 0.01))
+        finally:
+            FakeChild.active -= 1
+        if name == 'mar.csv':
+            return ChatResult(assistant_message="Claude is temporarily unavailable.", unavailable=True, retry_in=30)
+        if name == 'bad.csv':
+            raise ValueError("could not read bad.csv")
+        if name == 'log.csv':
+            return ChatResult(assistant_message="Error: lines are the most common level in log.csv")
+        return ChatResult(
+            assistant_message=f"Summary of {name}\n\n[Executed code:\n```python\nprint(1)\n```]",
+            tool_used="code_execution",
+            executed_code="print(1)",
+            code_output="1",
+            generated_figures=[{'figure_name': f"{name}.png", 'path_or_url': f"/tmp/{name}.png"}],
+            usage={'input_tokens': 100, 'output_tokens': 10},
+            model="claude-opus-4-20250514"
+        )
+
+
+class TestFanOutAnalyzer(unittest.IsolatedAsyncioTestCase):
+    """Test cases for FanOutAnalyzer"""
+
+    def setUp(self):
+        FakeChild.active = FakeChild.peak = 0
+        self.claude = ClaudeCore(api_key='test-key')
+        self.analyzer = FanOutAnalyzer(max_parallel=2, enabled=True)
+
+    def test_should_fan_out(self):
+        """Per-file wording over two or more files triggers fan-out"""
+        self.assertTrue(self.analyzer.should_fan_out("Summarize each of these files", FILES))
+        self.assertTrue(self.analyzer.should_fan_out("For every attachment, list the totals", FILES))
+        self.assertTrue(self.analyzer.should_fan_out("Analyse the files separately", FILES[:2]))
+        self.assertTrue(self.analyzer.should_fan_out("Give me a per-file summary", FILES))
+        self.assertFalse(self.analyzer.should_fan_out("Summarize each file", FILES[:1]))
+        self.assertFalse(self.analyzer.should_fan_out("Compare these files", FILES))
+        # Cross-file questions that merely say "each"/"every" stay a single request
+        self.assertFalse(self.analyzer.should_fan_out("Compare every column across these files", FILES))
+        self.assertFalse(self.analyzer.should_fan_out("What changed for each region between them?", FILES))
+        self.assertFalse(FanOutAnalyzer(enabled=False).should_fan_out("Summarize each file", FILES))
+
+    async def test_run_merges_in_file_order(self):
+        """Sub-requests run concurrently (bounded) and merge in attachment order"""
+        progress = []
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            started = time.monotonic()
+            merged = await self.analyzer.run(self.claude, "Summarize each file", True, FILES,
+                                             on_progress=lambda kind, text: progress.append(text))
+            wall = time.monotonic() - started
+
+        self.assertEqual(FakeChild.peak, 2)
+        self.assertLess(wall, sum(DELAYS.values()))
+        self.assertEqual([entry['file_name'] for entry in merged['file_results']], ['jan.csv', 'feb.csv', 'mar.csv'])
+        self.assertEqual([entry['error'] for entry in merged['file_results']], [False, False, True])
+        self.assertTrue(merged['assistant_message'].startswith("**jan.csv**\n\nSummary of jan.csv\n\n**feb.csv**"))
+        self.assertNotIn('[Executed code:', merged['assistant_message'])
+        self.assertEqual(merged['tool_used'], 'code_execution')
+        self.assertEqual(merged['executed_code'], "# jan.csv\nprint(1)\n\n# feb.csv\nprint(1)")
+        self.assertEqual(len(merged['generated_figures']), 2)
+        self.assertEqual(merged['usage']['input_tokens'], 200)
+        self.assertFalse(merged['unavailable'])
+        self.assertEqual(len(progress), 3)
+
+        # The parent conversation records one turn covering every file
+        self.assertEqual(len(self.claude.conversation_history), 2)
+        self.assertEqual(len(self.claude.conversation_history[0]['content']), 4)
+        self.assertEqual([f['file_name'] for f in merged['files_accessed']], ['jan.csv', 'feb.csv', 'mar.csv'])
+        self.assertEqual(self.claude.usage_totals['input_tokens'], 200)
+        self.assertEqual(self.claude.turns_since_tool_use, 0)
+        self.assertEqual(self.analyzer.get_stats()['failed_files'], 1)
+
+    async def test_local_failure_is_a_failed_file_not_an_outage(self):
+        """A local exception fails its file without flagging the turn unavailable"""
+        files = [{'file_id': 'f4', 'file_name': 'bad.csv'}, {'file_id': 'f5', 'file_name': 'bad.csv'}]
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            merged = await self.analyzer.run(self.claude, "Summarize each file", True, files)
+
+        self.assertFalse(merged['unavailable'])
+        self.assertTrue(merged['error'])
+        self.assertEqual([entry['error'] for entry in merged['file_results']], [True, True])
+        self.assertIn("Error: could not read bad.csv", merged['assistant_message'])
+        # A turn where every file failed is not recorded as the answer
+        self.assertEqual(self.claude.conversation_history, [])
+
+    async def test_failure_is_flagged_not_sniffed(self):
+        """An answer that happens to start with "Error:" is not a failed file"""
+        files = [{'file_id': 'f4', 'file_name': 'bad.csv'}, {'file_id': 'f6', 'file_name': 'log.csv'}]
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            merged = await self.analyzer.run(self.claude, "Summarize each file", True, files)
+
+        self.assertEqual([entry['error'] for entry in merged['file_results']], [True, False])
+        self.assertFalse(merged['error'])
+        self.assertEqual(len(self.claude.conversation_history), 2)
+
+    def test_spawn_shares_components(self):
+        """Spawned instances share clients and limits but not history"""
+        self.claude.add_message("user", "earlier")
+        child = self.claude.spawn()
+        self.assertIs(child.client, self.claude.client)
+        self.assertIs(child.resilience, self.claude.resilience)
+        self.assertEqual(child.conversation_history, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
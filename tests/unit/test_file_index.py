@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test suite for the content-addressed file index
+"""
+
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import tempfile
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from anthropic import NotFoundError
+from src.core.claude_core import ClaudeCore
+from src.core.file_index import FileIndex, content_key
+
+
+class TestFileIndex(unittest.TestCase):
+    """Test cases for FileIndex"""
+
+    def setUp(self):
+        """Create a scratch directory for index files and attachments"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp.name, 'index.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_content_key_depends_on_bytes_and_scope(self):
+        """Test identical bytes share a key regardless of file name"""
+        a = self._write('a.csv', b'x,y\n1,2\n')
+        b = self._write('b.csv', b'x,y\n1,2\n')
+        c = self._write('c.csv', b'x,y\n1,3\n')
+        self.assertEqual(content_key(a), content_key(b))
+        self.assertNotEqual(content_key(a), content_key(c))
+        self.assertNotEqual(content_key(a, 'ws1'), content_key(a, 'ws2'))
+
+    def test_persisted_across_instances(self):
+        """Test entries and recency survive a restart"""
+        index = FileIndex(path=self.index_path, max_entries=2)
+        index.add('k1', 'file_1', 'a.csv', 100)
+        index.add('k2', 'file_2', 'b.csv', 200)
+        self.assertEqual(index.confirm('k1'), 'file_1')
+        index.flush()
+
+        reloaded = FileIndex(path=self.index_path, max_entries=2)
+        self.assertIn('k1', reloaded)
+        self.assertEqual(reloaded.lookup('k2')['file_id'], 'file_2')
+        # k2 is now the least recently used entry
+        reloaded.add('k3', 'file_3', 'c.csv', 300)
+        self.assertNotIn('k2', reloaded)
+        self.assertEqual(reloaded.get_stats()['evictions'], 1)
+
+    def test_writes_are_debounced(self):
+        """Test changes within the save interval wait for the next flush"""
+        index = FileIndex(path=self.index_path, save_interval=60)
+        index.add('k1', 'file_1', 'a.csv', 100)
+        index.add('k2', 'file_2', 'b.csv', 200)
+        for _ in range(5):
+            index.confirm('k1')
+        self.assertEqual(index.get_stats()['writes'], 1)
+        self.assertNotIn('k2', FileIndex(path=self.index_path))
+
+        index.flush()
+        index.flush()
+        self.assertEqual(index.get_stats()['writes'], 2)
+        self.assertIn('k2', FileIndex(path=self.index_path))
+
+    def test_reference_counts(self):
+        """Test every add and confirm holds the file_id until released"""
+        index = FileIndex(path='')
+        index.add('k', 'file_1', 'a.csv', 100)
+        index.confirm('k')
+        self.assertEqual(index.release('file_1'), 1)
+        self.assertEqual(index.release('file_1'), 0)
+        self.assertEqual(index.release('file_1'), 0)
+        self.assertEqual(index.get_stats()['held_file_ids'], 0)
+
+    def test_corrupt_index_is_ignored(self):
+        """Test an unreadable index file starts empty"""
+        with open(self.index_path, 'w') as f:
+            f.write('{not json')
+        self.assertEqual(len(FileIndex(path=self.index_path)), 0)
+
+    def test_counters(self):
+        """Test hit, miss, stale and bytes saved counters"""
+        index = FileIndex(path='')
+        self.assertIsNone(index.lookup('k'))
+        index.add('k', 'file_1', 'a.csv', 100)
+        index.lookup('k')
+        index.confirm('k')
+        index.invalidate('k')
+        self.assertTrue(index.needs_check({'verified': 0}))
+        stats = index.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stale']), (1, 2, 1))
+        self.assertEqual(stats['bytes_saved'], 100)
+        self.assertEqual(stats['hit_rate'], 0.3333)
+
+
+class TestUploadDedup(unittest.TestCase):
+    """Test ClaudeCore.upload_file with a shared FileIndex"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = FileIndex(path=os.path.join(self.tmp.name, 'index.json'), verify_after=3600)
+        self.client = MagicMock()
+        self.client.files.create.side_effect = [MagicMock(id='file_1'), MagicMock(id='file_2')]
+        self.path = os.path.join(self.tmp.name, 'report.csv')
+        with open(self.path, 'wb') as f:
+            f.write(b'a,b\n1,2\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _claude(self):
+        return ClaudeCore(api_key='test-api-key', client=self.client, async_client=MagicMock(),
+                          file_index=self.index)
+
+    def test_known_bytes_reuse_file_id_across_conversations(self):
+        """Test a second conversation uploading the same bytes skips the upload"""
+        self.assertEqual(self._claude().upload_file(self.path), 'file_1')
+        other = self._claude()
+        self.assertEqual(other.upload_file(self.path), 'file_1')
+        self.assertEqual(other.uploaded_files['report.csv']['file_id'], 'file_1')
+        self.assertEqual(self.client.files.create.call_count, 1)
+        self.client.files.retrieve_metadata.assert_not_called()
+
+    def test_stale_entry_is_uploaded_again(self):
+        """Test a file deleted from the Files API is re-uploaded once due for a check"""
+        self._claude().upload_file(self.path)
+        self.index.verify_after = 0
+        self.client.files.retrieve_metadata.side_effect = NotFoundError(
+            'gone', response=MagicMock(status_code=404), body=None
+        )
+
+        self.assertEqual(self._claude().upload_file(self.path), 'file_2')
+        self.assertEqual(self.index.get_stats()['stale'], 1)
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.client.files.create.call_count, 2)
+
+    def test_verified_hit_and_delete(self):
+        """Test a successful existence check reuses the id and deleting forgets it"""
+        first = self._claude()
+        first.upload_file(self.path)
+        self.index.verify_after = 0
+        claude = self._claude()
+        self.assertEqual(claude.upload_file(self.path), 'file_1')
+        self.client.files.retrieve_metadata.assert_called_once_with('file_1')
+        self.assertEqual(self.index.get_stats()['existence_checks'], 1)
+
+        # The first conversation still holds file_1
+        self.assertTrue(claude.delete_file('report.csv'))
+        self.assertEqual(claude.uploaded_files, {})
+        self.client.files.delete.assert_not_called()
+        self.assertEqual(len(self.index), 1)
+
+        self.assertTrue(first.delete_file('report.csv'))
+        self.client.files.delete.assert_called_once_with('file_1')
+        self.assertEqual(len(self.index), 0)
+
+    def test_spawned_child_cleanup_keeps_shared_file(self):
+        """Test a sub-request deleting its upload does not delete a file a conversation holds"""
+        claude = self._claude()
+        claude.upload_file(self.path)
+        child = claude.spawn()
+        self.assertEqual(child.upload_file(self.path), 'file_1')
+        self.assertTrue(child.delete_file('report.csv'))
+        self.client.files.delete.assert_not_called()
+        self.assertIn('report.csv', claude.uploaded_files)
+
+    def test_reuploading_a_name_releases_the_old_file_id(self):
+        """Test a name uploaded again with other bytes no longer holds its old file_id"""
+        claude = self._claude()
+        claude.upload_file(self.path)
+        with open(self.path, 'wb') as f:
+            f.write(b'a,b\n3,4\n')
+        self.assertEqual(claude.upload_file(self.path), 'file_2')
+        self.assertEqual(self.index.release('file_1'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test suite for the shared aiohttp session
+"""
+
+import unittest
+from unittest.mock import Mock, patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from botbuilder.schema import Attachment
+from src.bot import CodeExecutionBot, http_session
+from src.bot.http_session import get_http_session, get_http_stats, session_settings, start_http_session, close_http_session
+
+
+class TestHttpSession(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the application-scoped ClientSession"""
+
+    async def asyncSetUp(self):
+        """Serve a small file locally"""
+        async def download(request):
+            return web.Response(body=b'a,b\n1,2\n')
+
+        app = web.Application()
+        app.router.add_get('/file.csv', download)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        for key in http_session._stats:
+            http_session._stats[key] = 0
+
+    async def asyncTearDown(self):
+        await close_http_session()
+        await self.server.close()
+
+    async def test_session_is_shared_and_connections_reused(self):
+        """Repeated downloads reuse one session and its keep-alive connection"""
+        await start_http_session()
+        session = get_http_session()
+        self.assertIs(get_http_session(), session)
+
+        for _ in range(3):
+            async with get_http_session().get(self.server.make_url('/file.csv')) as response:
+                self.assertEqual(await response.read(), b'a,b\n1,2\n')
+
+        stats = get_http_stats()
+        self.assertTrue(stats['open'])
+        self.assertEqual(stats['sessions_created'], 1)
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['connections_created'], 1)
+        self.assertEqual(stats['connections_reused'], 2)
+        self.assertEqual(stats['connection_reuse_rate'], 0.6667)
+
+    async def test_attachment_download_makes_one_request(self):
+        """An attachment is fetched once, through the shared session, with no connector round trip"""
+        bot = CodeExecutionBot(Mock(), Mock())
+        turn_context = Mock()
+        claude = Mock()
+        claude.upload_fileobj = Mock(return_value="file-1")
+        attachment = Attachment(content_type="text/csv", content_url=str(self.server.make_url('/file.csv')),
+                                name="file.csv")
+
+        file_info = await bot._process_attachment(turn_context, attachment, claude)
+
+        self.assertEqual(file_info, {'file_id': "file-1", 'file_name': "file.csv"})
+        turn_context.adapter.create_connector_client.assert_not_called()
+        self.assertEqual(get_http_stats()['requests'], 1)
+
+    async def test_close_and_recreate(self):
+        """Closing drops the session; the next use creates a fresh one"""
+        session = get_http_session()
+        await close_http_session()
+        self.assertTrue(session.closed)
+        self.assertFalse(get_http_stats()['open'])
+        self.assertIsNot(get_http_session(), session)
+
+    def test_settings_from_environment(self):
+        """Pool limits and timeouts come from the environment"""
+        with patch.dict(os.environ, {'HTTP_POOL_LIMIT_PER_HOST': '4', 'HTTP_DNS_CACHE_TTL': '60'}):
+            settings = session_settings()
+        self.assertEqual(settings['limit_per_host'], 4)
+        self.assertEqual(settings['dns_cache_ttl'], 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test suite for the incremental JSON string decoder
+Includes a fuzz test that replays documents with random chunk boundaries
+"""
+
+import unittest
+import json
+import random
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.json_stream import IncrementalJSONStringExtractor
+
+
+def feed_in_chunks(extractor, document, rng, max_chunk=8):
+    """Feed document to extractor in random-sized chunks and join the output"""
+    output = []
+    i = 0
+    while i < len(document):
+        j = i + rng.randint(1, max_chunk)
+        output.append(extractor.feed(document[i:j]))
+        i = j
+    return ''.join(output)
+
+
+class TestIncrementalJSONStringExtractor(unittest.TestCase):
+    """Test cases for IncrementalJSONStringExtractor"""
+    
+    def test_single_chunk(self):
+        """Test decoding a complete document in one delta"""
+        extractor = IncrementalJSONStringExtractor("code")
+        result = extractor.feed('{"code": "print(\\"hi\\")\\nx = 1"}')
+        self.assertEqual(result, 'print("hi")\nx = 1')
+        self.assertTrue(extractor.complete)
+    
+    def test_escape_split_across_deltas(self):
+        """Test escape sequences split exactly at a chunk boundary"""
+        extractor = IncrementalJSONStringExtractor("code")
+        deltas = ['{"code": "a\\', 'nb\\u00', 'e9c\\ud83d', '\\ude00', '"}']
+        output = ''.join(extractor.feed(delta) for delta in deltas)
+        self.assertEqual(output, 'a\nbéc😀')
+        self.assertEqual(extractor.value, 'a\nbéc😀')
+    
+    def test_non_ascii_passthrough(self):
+        """Test raw non-ASCII text is not mangled"""
+        extractor = IncrementalJSONStringExtractor("code")
+        output = ''.join(extractor.feed(d) for d in ['{"code": "total = ', '\'€5\'"}'])
+        self.assertEqual(output, "total = '€5'")
+    
+    def test_utf8_bytes_split_mid_character(self):
+        """Test raw bytes split inside a multi-byte character"""
+        data = json.dumps({"code": "π ≈ 3.14 😀"}, ensure_ascii=False).encode('utf-8')
+        extractor = IncrementalJSONStringExtractor("code")
+        output = ''.join(extractor.feed(data[i:i + 1]) for i in range(len(data)))
+        self.assertEqual(output, "π ≈ 3.14 😀")
+    
+    def test_ignores_other_and_nested_keys(self):
+        """Test only the top-level target field is emitted"""
+        document = '{"note": "\\"code\\": \\"no\\"", "meta": {"code": "nested"}, "code": "yes"}'
+        extractor = IncrementalJSONStringExtractor("code")
+        self.assertEqual(extractor.feed(document), "yes")
+    
+    def test_fuzz_random_chunk_boundaries(self):
+        """Fuzz: random contents and chunkings always match json.loads"""
+        rng = random.Random(1234)
+        alphabet = 'ab "\\\n\t/{}[],:é€😀 '
+        for _ in range(500):
+            code = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 80)))
+            document = json.dumps(
+                {"query": "x", "code": code, "extra": [1, {"code": "z"}]},
+                ensure_ascii=rng.random() < 0.5
+            )
+            extractor = IncrementalJSONStringExtractor("code")
+            with self.subTest(document=document):
+                self.assertEqual(feed_in_chunks(extractor, document, rng), code)
+                self.assertEqual(extractor.value, code)
+                self.assertTrue(extractor.complete)
+
+
+if __name__ == '__main__':
+    unittest.main()
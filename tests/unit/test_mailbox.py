@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test suite for the per-conversation mailbox
+"""
+
+import unittest
+import asyncio
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.bot.mailbox import ConversationMailbox
+
+
+class TestConversationMailbox(unittest.IsolatedAsyncioTestCase):
+    """Test cases for ConversationMailbox"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.mailbox = ConversationMailbox()
+
+    async def test_turns_in_same_conversation_run_in_order(self):
+        """Turns for one conversation never overlap and keep arrival order"""
+        events = []
+
+        def make_turn(name, delay):
+            async def turn():
+                events.append(f"start-{name}")
+                await asyncio.sleep(delay)
+                events.append(f"end-{name}")
+                return name
+            return turn
+
+        results = await asyncio.gather(
+            self.mailbox.submit("conv1", make_turn("a", 0.03)),
+            self.mailbox.submit("conv1", make_turn("b", 0.0)),
+            self.mailbox.submit("conv1", make_turn("c", 0.01))
+        )
+
+        self.assertEqual(results, ["a", "b", "c"])
+        self.assertEqual(events, ["start-a", "end-a", "start-b", "end-b", "start-c", "end-c"])
+
+    async def test_different_conversations_run_in_parallel(self):
+        """A slow turn in one conversation does not block another"""
+        release = asyncio.Event()
+        finished = []
+
+        async def slow_turn():
+            await release.wait()
+            finished.append("slow")
+
+        async def fast_turn():
+            finished.append("fast")
+
+        slow = asyncio.ensure_future(self.mailbox.submit("conv1", slow_turn))
+        await self.mailbox.submit("conv2", fast_turn)
+
+        self.assertEqual(finished, ["fast"])
+        self.assertTrue(self.mailbox.is_busy("conv1"))
+
+        release.set()
+        await slow
+        self.assertEqual(finished, ["fast", "slow"])
+        self.assertFalse(self.mailbox.is_busy("conv1"))
+
+    async def test_exception_is_returned_to_caller_and_queue_continues(self):
+        """A failing turn surfaces its error without stalling later turns"""
+        async def failing_turn():
+            raise RuntimeError("boom")
+
+        async def ok_turn():
+            return "ok"
+
+        failing = asyncio.ensure_future(self.mailbox.submit("conv1", failing_turn))
+        ok = asyncio.ensure_future(self.mailbox.submit("conv1", ok_turn))
+
+        with self.assertRaises(RuntimeError):
+            await failing
+        self.assertEqual(await ok, "ok")
+        self.assertEqual(self.mailbox.turns_failed, 1)
+        self.assertEqual(self.mailbox.turns_completed, 1)
+
+    async def test_cancel_stops_running_and_queued_turns(self):
+        """cancel() drops queued turns, cancels the running one and keeps the mailbox usable"""
+        started = asyncio.Event()
+        ran = []
+
+        async def slow_turn():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def queued_turn():
+            ran.append("queued")
+
+        slow = asyncio.ensure_future(self.mailbox.submit("conv1", slow_turn))
+        queued = asyncio.ensure_future(self.mailbox.submit("conv1", queued_turn))
+        await started.wait()
+
+        self.assertEqual(self.mailbox.cancel("conv1"), {'queued': 1, 'running': 1})
+        self.assertIsNone(await slow)
+        self.assertIsNone(await queued)
+        self.assertEqual(ran, [])
+        self.assertEqual(self.mailbox.get_stats()['turns_cancelled'], 2)
+        self.assertEqual(self.mailbox.cancel("conv1"), {'queued': 0, 'running': 0})
+
+        async def ok_turn():
+            return "ok"
+
+        self.assertEqual(await self.mailbox.submit("conv1", ok_turn), "ok")
+
+    async def test_stats_report_queue_depth_and_wait(self):
+        """Stats capture queue depth and head-of-line wait"""
+        async def turn():
+            await asyncio.sleep(0.02)
+
+        await asyncio.gather(*[self.mailbox.submit("conv1", turn) for _ in range(3)])
+
+        stats = self.mailbox.get_stats()
+        self.assertEqual(stats['turns_submitted'], 3)
+        self.assertEqual(stats['turns_completed'], 3)
+        self.assertEqual(stats['max_queue_depth'], 3)
+        self.assertGreater(stats['max_wait_seconds'], 0.03)
+        self.assertEqual(stats['active_conversations'], 0)
+        self.assertEqual(stats['queued_turns'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
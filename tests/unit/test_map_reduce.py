@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test suite for map-reduce analysis of large tables
+"""
+
+import unittest
+import csv
+import tempfile
+from unittest.mock import patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core.map_reduce import MapReduceAnalyzer, split_table
+from src.core.stream_processor import ChatResult
+
+
+class FakeChild:
+    """Stands in for a spawned ClaudeCore; records uploads, prompts and deletions"""
+
+    prompts = []
+    uploads = []
+    deleted = []
+    code_execution = []
+    fail_uploads = False
+    map_answer = "Partial sum"
+
+    def __init__(self):
+        self.uploaded_files = {}
+
+    def upload_file(self, path):
+        if FakeChild.fail_uploads:
+            raise OSError("disk full")
+        name = os.path.basename(path)
+        with open(path, newline='') as f:
+            FakeChild.uploads.append(list(csv.reader(f)))
+        self.uploaded_files[name] = {'file_id': f"id-{name}"}
+        return f"id-{name}"
+
+    def delete_file(self, name):
+        FakeChild.deleted.append(name)
+        del self.uploaded_files[name]
+        return True
+
+    async def achat(self, user_input, use_code_execution=True, file_attachments_info=None, on_progress=None):
+        FakeChild.prompts.append(user_input)
+        FakeChild.code_execution.append(use_code_execution)
+        if file_attachments_info is None:
+            return ChatResult(assistant_message="Total: 5 rows", usage={'input_tokens': 50, 'output_tokens': 5})
+        return ChatResult(assistant_message=FakeChild.map_answer, code_output="rows=2",
+                          usage={'input_tokens': 100, 'output_tokens': 10}, model="m")
+
+
+class TestMapReduce(unittest.IsolatedAsyncioTestCase):
+    """Test cases for table sharding and MapReduceAnalyzer"""
+
+    def setUp(self):
+        FakeChild.prompts, FakeChild.uploads, FakeChild.deleted = [], [], []
+        FakeChild.code_execution, FakeChild.fail_uploads = [], False
+        FakeChild.map_answer = "Partial sum"
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'transactions.csv')
+        with open(self.path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'memo', 'amount'])
+            for i in range(1, 6):
+                writer.writerow([i, f"line one\nline two {i}" if i == 2 else f"memo {i}", i * 10])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_split_table(self):
+        """Shards keep the header, respect quoted newlines and report row ranges"""
+        out_dir = os.path.join(self.tmpdir.name, 'shards')
+        os.mkdir(out_dir)
+        shards = split_table(self.path, 2, out_dir)
+        self.assertEqual([(s['start_row'], s['end_row']) for s in shards], [(1, 2), (3, 4), (5, 5)])
+        with open(shards[0]['path'], newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['id', 'memo', 'amount'])
+        self.assertEqual(rows[2][1], "line one\nline two 2")
+
+    def test_should_map_reduce(self):
+        """Only large tabular files qualify"""
+        analyzer = MapReduceAnalyzer(min_bytes=10, enabled=True)
+        self.assertTrue(analyzer.should_map_reduce(self.path))
+        self.assertFalse(MapReduceAnalyzer(min_bytes=10 ** 9, enabled=True).should_map_reduce(self.path))
+        self.assertFalse(MapReduceAnalyzer(min_bytes=10, enabled=False).should_map_reduce(self.path))
+        self.assertFalse(analyzer.should_map_reduce(os.path.join(self.tmpdir.name, 'report.pdf')))
+        with patch('src.core.map_reduce.openpyxl_available', return_value=False):
+            self.assertFalse(analyzer.should_map_reduce(os.path.join(self.tmpdir.name, 'big.xlsx')))
+
+    async def test_run(self):
+        """Shards are analysed, cleaned up and combined by a reduce prompt"""
+        claude = ClaudeCore(api_key='test-key')
+        analyzer = MapReduceAnalyzer(shard_rows=2, max_parallel=2, min_bytes=0, enabled=True)
+        progress = []
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            result = await analyzer.run(claude, "Total the amounts", self.path,
+                                        on_progress=lambda kind, text: progress.append(text))
+
+        self.assertEqual(len(FakeChild.uploads), 3)
+        self.assertTrue(all(upload[0] == ['id', 'memo', 'amount'] for upload in FakeChild.uploads))
+        self.assertEqual(sorted(FakeChild.deleted),
+                         ['transactions.part001.csv', 'transactions.part002.csv', 'transactions.part003.csv'])
+        self.assertIn("shard 1 of 3", next(p for p in FakeChild.prompts if "rows 1-2" in p))
+        reduce_prompt = FakeChild.prompts[-1]
+        self.assertIn("### Shard 3 (rows 5-5)\nPartial sum\n\nCode output:\nrows=2", reduce_prompt)
+
+        self.assertEqual(result['assistant_message'], "Total: 5 rows")
+        self.assertEqual(result['usage']['input_tokens'], 350)
+        self.assertEqual([entry['file_name'] for entry in result['file_results']],
+                         ['Shard 1 (rows 1-2)', 'Shard 2 (rows 3-4)', 'Shard 3 (rows 5-5)'])
+        self.assertTrue(any("3/3 done" in line for line in progress))
+        self.assertEqual(result['files_accessed'][0]['action'], "analysed in 3 shards")
+        self.assertEqual(claude.conversation_history[-1], {"role": "assistant", "content": "Total: 5 rows"})
+        self.assertEqual(analyzer.get_stats()['rows'], 5)
+        self.assertEqual(FakeChild.code_execution, [True] * 4)
+
+    async def test_run_without_code_execution(self):
+        """A /nocode turn sends the map and reduce requests without the tool"""
+        analyzer = MapReduceAnalyzer(shard_rows=2, max_parallel=2, min_bytes=0, enabled=True)
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            await analyzer.run(ClaudeCore(api_key='test-key'), "Total the amounts", self.path,
+                               use_code_execution=False)
+        self.assertEqual(FakeChild.code_execution, [False] * 4)
+
+    async def test_local_failures_are_not_an_outage(self):
+        """Shards failing locally are reported as errors, not as the service being unavailable"""
+        FakeChild.fail_uploads = True
+        analyzer = MapReduceAnalyzer(shard_rows=2, max_parallel=2, min_bytes=0, enabled=True)
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            result = await analyzer.run(ClaudeCore(api_key='test-key'), "Total the amounts", self.path)
+
+        self.assertFalse(result['unavailable'])
+        self.assertEqual(result['assistant_message'], "Error: disk full")
+        self.assertEqual([entry['error'] for entry in result['file_results']], [True, True, True])
+        self.assertTrue(result['error'])
+        self.assertEqual(analyzer.get_stats()['failed_shards'], 3)
+
+    async def test_error_prefixed_answer_is_not_a_failed_shard(self):
+        """Only the failure flag marks a shard failed, not the answer's wording"""
+        FakeChild.map_answer = "Error: rows with a negative amount were found"
+        analyzer = MapReduceAnalyzer(shard_rows=2, max_parallel=2, min_bytes=0, enabled=True)
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            result = await analyzer.run(ClaudeCore(api_key='test-key'), "Find bad rows", self.path)
+
+        self.assertEqual(result['assistant_message'], "Total: 5 rows")
+        self.assertEqual([entry['error'] for entry in result['file_results']], [False, False, False])
+        self.assertIn("Error: rows with a negative amount", FakeChild.prompts[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
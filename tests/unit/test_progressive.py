@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Test suite for sample-first progressive analysis
+"""
+
+import unittest
+import csv
+import tempfile
+from unittest.mock import patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core.progressive import ProgressiveAnalyzer, format_profile, profile_and_sample
+from src.core.stream_processor import ChatResult
+
+
+class FakeChild:
+    """Stands in for a spawned ClaudeCore"""
+
+    prompts = []
+    code_execution = []
+    fail_full = False
+    fail_sample = False
+
+    def __init__(self):
+        self.uploaded_files = {}
+
+    def upload_file(self, path):
+        name = os.path.basename(path)
+        self.uploaded_files[name] = {'file_id': f"id-{name}"}
+        return f"id-{name}"
+
+    def delete_file(self, name):
+        self.uploaded_files.pop(name, None)
+        return True
+
+    async def achat(self, user_input, use_code_execution=True, file_attachments_info=None, on_progress=None):
+        FakeChild.prompts.append(user_input)
+        FakeChild.code_execution.append(use_code_execution)
+        if 'sample' in file_attachments_info[0]['file_name']:
+            if FakeChild.fail_sample:
+                return ChatResult(assistant_message="Error: sample could not be read", error=True)
+            return ChatResult(assistant_message="Roughly 60% North", usage={'input_tokens': 10, 'output_tokens': 1})
+        if FakeChild.fail_full:
+            return ChatResult(assistant_message="Claude is temporarily unavailable.", unavailable=True)
+        return ChatResult(assistant_message="Exactly 59.8% North", usage={'input_tokens': 1000, 'output_tokens': 5})
+
+
+class TestProgressive(unittest.IsolatedAsyncioTestCase):
+    """Test cases for profiling, sampling and ProgressiveAnalyzer"""
+
+    def setUp(self):
+        FakeChild.prompts, FakeChild.code_execution, FakeChild.fail_full = [], [], False
+        FakeChild.fail_sample = False
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'sales.csv')
+        with open(self.path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'region', 'amount', 'note'])
+            for i in range(1, 3001):
+                # "Islands" is rare: 1 row in 500
+                region = 'Islands' if i % 500 == 0 else ('North' if i % 5 < 3 else 'South')
+                writer.writerow([i, region, f"{i * 0.5:.1f}", '' if i % 2 else 'x'])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_profile_and_sample(self):
+        """The profile is exact over the whole file and the sample covers every stratum"""
+        sample_path = os.path.join(self.tmpdir.name, 'sample.csv')
+        profile = profile_and_sample(self.path, 300, sample_path, seed=1)
+
+        self.assertEqual(profile['total_rows'], 3000)
+        self.assertEqual(profile['strata_column'], 'region')
+        columns = {column['name']: column for column in profile['columns']}
+        self.assertEqual(columns['id']['type'], 'integer')
+        self.assertEqual(columns['amount']['type'], 'number')
+        self.assertAlmostEqual(columns['amount']['sum'], sum(i * 0.5 for i in range(1, 3001)))
+        self.assertEqual(columns['amount']['max'], 1500.0)
+        self.assertEqual(columns['note']['empty'], 1500)
+        self.assertEqual(columns['id']['distinct'], '>1000')
+
+        with open(sample_path, newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['id', 'region', 'amount', 'note'])
+        self.assertAlmostEqual(len(rows) - 1, 300, delta=3)
+        self.assertEqual(profile['sample_rows'], len(rows) - 1)
+        self.assertIn('Islands', {row[1] for row in rows[1:]})
+        ids = [int(row[0]) for row in rows[1:]]
+        self.assertEqual(ids, sorted(ids))
+
+        text = format_profile(profile)
+        self.assertIn("- amount (number): 3,000 non-empty", text)
+        self.assertIn("top: North (1,", text)
+
+    async def test_preliminary_then_complete(self):
+        """The preliminary answer is recorded, then replaced by the applied full analysis"""
+        claude = ClaudeCore(api_key='test-key')
+        analyzer = ProgressiveAnalyzer(sample_rows=100, min_bytes=0, enabled=True)
+        self.assertTrue(analyzer.should_progress(self.path))
+
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            preliminary = await analyzer.preliminary(claude, "Share of North sales?", self.path)
+            self.assertEqual(preliminary['preliminary']['total_rows'], 3000)
+            self.assertIn("stratified by region", FakeChild.prompts[0])
+            self.assertIn("sum 2,250,750, mean 750.25", FakeChild.prompts[0])
+            self.assertEqual(claude.conversation_history[-1]['content'], "Roughly 60% North")
+            # A token count cached for the short preliminary entry
+            claude.conversation_history[-1]['_tokens'] = 7
+            # The entry is matched by its tag, not identity: a copy with an equal string still matches
+            claude.conversation_history[-1] = dict(claude.conversation_history[-1],
+                                                   content=''.join(["Roughly 60% ", "North"]))
+
+            final = await analyzer.complete(claude, "Share of North sales?", self.path, 'sales.csv')
+            self.assertEqual(claude.conversation_history[-1]['content'], "Roughly 60% North")
+
+        self.assertTrue(analyzer.apply(claude, "Share of North sales?", 'sales.csv', preliminary, final))
+        self.assertEqual(final['assistant_message'], "Exactly 59.8% North")
+        self.assertIsNone(final['preliminary'])
+        self.assertEqual(len(claude.conversation_history), 2)
+        self.assertEqual(claude.conversation_history[-1], {"role": "assistant", "content": "Exactly 59.8% North"})
+        self.assertEqual(claude.usage_totals['input_tokens'], 1010)
+        self.assertEqual(analyzer.get_stats()['full_runs'], 1)
+        self.assertEqual(FakeChild.code_execution, [True, True])
+
+    async def test_apply_after_compaction_or_reset(self):
+        """A compacted preliminary answer gets the full one appended; a reset conversation gets nothing"""
+        claude = ClaudeCore(api_key='test-key')
+        analyzer = ProgressiveAnalyzer(sample_rows=100, min_bytes=0, enabled=True)
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            preliminary = await analyzer.preliminary(claude, "Share of North sales?", self.path,
+                                                     use_code_execution=False)
+            final = await analyzer.complete(claude, "Share of North sales?", self.path, 'sales.csv',
+                                            use_code_execution=False)
+        self.assertEqual(FakeChild.code_execution, [False, False])
+
+        # Compaction folded (copies of) the preliminary exchange into a summary
+        claude.history_archive.extend(dict(entry) for entry in claude.conversation_history)
+        claude.conversation_history[:] = [{"role": "user", "content": "[Summary]"},
+                                          {"role": "assistant", "content": "Understood."}]
+        self.assertTrue(analyzer.apply(claude, "Share of North sales?", 'sales.csv', preliminary, final))
+        self.assertEqual([m['role'] for m in claude.conversation_history], ['user', 'assistant'] * 2)
+        self.assertIn("Full analysis of sales.csv", claude.conversation_history[2]['content'])
+        self.assertEqual(claude.conversation_history[3]['content'], "Exactly 59.8% North")
+        self.assertEqual(analyzer.get_stats()['appended_after_compaction'], 1)
+
+        claude.reset_conversation()
+        claude.history_archive.clear()
+        self.assertFalse(analyzer.apply(claude, "Share of North sales?", 'sales.csv', preliminary, final))
+        self.assertEqual(claude.conversation_history, [])
+
+    async def test_complete_failure(self):
+        """A failed full analysis raises and keeps the preliminary answer in history"""
+        claude = ClaudeCore(api_key='test-key')
+        analyzer = ProgressiveAnalyzer(sample_rows=100, min_bytes=0, enabled=True)
+        FakeChild.fail_full = True
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            preliminary = await analyzer.preliminary(claude, "Share of North sales?", self.path)
+            with self.assertRaises(RuntimeError):
+                await analyzer.complete(claude, "Share of North sales?", self.path, 'sales.csv')
+        self.assertEqual(preliminary['preliminary']['total_rows'], 3000)
+        self.assertEqual(claude.conversation_history[-1]['content'], preliminary['assistant_message'])
+        self.assertEqual(analyzer.get_stats()['full_failures'], 1)
+
+    async def test_failed_sample_is_not_recorded(self):
+        """A failed sample run is returned as is, without recording or counting it"""
+        claude = ClaudeCore(api_key='test-key')
+        analyzer = ProgressiveAnalyzer(sample_rows=100, min_bytes=0, enabled=True)
+        FakeChild.fail_sample = True
+        with patch.object(ClaudeCore, 'spawn', side_effect=lambda: FakeChild()):
+            preliminary = await analyzer.preliminary(claude, "Share of North sales?", self.path)
+
+        self.assertTrue(preliminary['error'])
+        self.assertIsNone(preliminary['preliminary'])
+        self.assertEqual(claude.conversation_history, [])
+        self.assertEqual(analyzer.get_stats()['preliminary_runs'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
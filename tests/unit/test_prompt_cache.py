@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test suite for prompt cache breakpoint placement
+"""
+
+import unittest
+import copy
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.prompt_cache import (
+    apply_cache_breakpoints, cache_hit_rate, MAX_CACHE_BREAKPOINTS
+)
+
+
+def count_markers(messages, tools):
+    """Count cache_control markers in a request"""
+    count = sum(1 for tool in tools or [] if 'cache_control' in tool)
+    for message in messages:
+        if isinstance(message['content'], list):
+            count += sum(1 for block in message['content'] if 'cache_control' in block)
+    return count
+
+
+class TestPromptCache(unittest.TestCase):
+    """Test cases for apply_cache_breakpoints"""
+    
+    def setUp(self):
+        """Set up a multi-turn history with a file attachment"""
+        self.history = [
+            {"role": "user", "content": [
+                {"type": "text", "text": "Analyse this"},
+                {"type": "file", "file": {"file_id": "file123"}}
+            ]},
+            {"role": "assistant", "content": "Done."},
+            {"role": "user", "content": [{"type": "text", "text": "And now?"}]},
+            {"role": "assistant", "content": "Sure."},
+            {"role": "user", "content": [{"type": "text", "text": "Last question"}]}
+        ]
+        self.tools = [{"type": "code_execution_20250522", "name": "code_execution"}]
+    
+    def test_marks_tools_and_recent_user_turns(self):
+        """Test markers land on the tools and the two latest user turns"""
+        messages, tools = apply_cache_breakpoints(self.history, self.tools)
+        
+        self.assertEqual(tools[-1]['cache_control'], {"type": "ephemeral"})
+        self.assertIn('cache_control', messages[4]['content'][-1])
+        self.assertIn('cache_control', messages[2]['content'][-1])
+        self.assertNotIn('cache_control', messages[0]['content'][-1])
+        self.assertEqual(count_markers(messages, tools), 3)
+    
+    def test_does_not_mutate_history(self):
+        """Test the stored history and tools are left untouched"""
+        original_history = copy.deepcopy(self.history)
+        original_tools = copy.deepcopy(self.tools)
+        apply_cache_breakpoints(self.history, self.tools)
+        self.assertEqual(self.history, original_history)
+        self.assertEqual(self.tools, original_tools)
+    
+    def test_marker_limit_and_ttl(self):
+        """Test the total never exceeds the API limit and ttl is applied"""
+        messages, tools = apply_cache_breakpoints(self.history, self.tools,
+                                                  message_breakpoints=10, ttl="1h")
+        self.assertLessEqual(count_markers(messages, tools), MAX_CACHE_BREAKPOINTS)
+        self.assertEqual(messages[0]['content'][-1]['cache_control'], {"type": "ephemeral", "ttl": "1h"})
+    
+    def test_string_content_is_converted(self):
+        """Test string content becomes a marked text block"""
+        messages, _ = apply_cache_breakpoints([{"role": "user", "content": "Hi"}])
+        self.assertEqual(messages[0]['content'],
+                         [{"type": "text", "text": "Hi", "cache_control": {"type": "ephemeral"}}])
+    
+    def test_cache_hit_rate(self):
+        """Test hit rate is cache reads over all prompt tokens"""
+        usage = {'input_tokens': 100, 'cache_creation_input_tokens': 100,
+                 'cache_read_input_tokens': 800, 'output_tokens': 50}
+        self.assertEqual(cache_hit_rate(usage), 0.8)
+        self.assertEqual(cache_hit_rate({}), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test suite for the process-wide RPM/TPM rate limiter
+"""
+
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+import anthropic
+from src.core import ClaudeCore
+from src.core.rate_limit import RateLimiter, RateLimitExceeded
+from src.core.resilience import ResilienceLayer
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    """Test cases for RateLimiter"""
+
+    async def test_disabled_by_default(self):
+        """Without limits every turn is admitted immediately"""
+        with patch.dict(os.environ, {}, clear=True):
+            limiter = RateLimiter()
+        self.assertFalse(limiter.enabled)
+        reservation = await limiter.acquire(10 ** 9, 10 ** 9)
+        self.assertEqual(reservation['wait'], 0.0)
+
+    async def test_requests_per_minute_queue(self):
+        """Requests beyond the RPM burst wait for refill, first come first served"""
+        limiter = RateLimiter(requests_per_minute=2, max_wait_seconds=120)
+        waits = [limiter.reserve(0, 0)['wait'] for _ in range(4)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 30.0, delta=0.1)
+        self.assertAlmostEqual(waits[3], 60.0, delta=0.1)
+        self.assertEqual(limiter.get_stats()['delayed'], 2)
+
+    async def test_input_tokens_bound_wait(self):
+        """A turn whose wait would exceed max_wait is rejected without debiting"""
+        limiter = RateLimiter(input_tokens_per_minute=6000, max_wait_seconds=10)
+        limiter.reserve(6000, 0)
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.reserve(3000, 0)
+        self.assertAlmostEqual(raised.exception.retry_in, 30.0, delta=0.1)
+        self.assertAlmostEqual(limiter.reserve(500, 0)['wait'], 5.0, delta=0.1)
+        self.assertEqual(limiter.get_stats()['rejected'], 1)
+
+    async def test_settle_refunds_overestimates(self):
+        """Actual usage below the estimate is returned to the bucket"""
+        limiter = RateLimiter(output_tokens_per_minute=1000)
+        reservation = limiter.reserve(0, 1000)
+        limiter.settle(reservation, 0, 200)
+        self.assertAlmostEqual(limiter.buckets['output_tokens'].balance, 800, delta=1)
+        self.assertLess(limiter.estimate_output_tokens(4096), 1024)
+
+    async def test_acquire_waits(self):
+        """acquire() sleeps for the reserved wait"""
+        limiter = RateLimiter(requests_per_minute=60)
+        limiter.reserve(0, 0)
+        limiter.buckets['requests'].balance = 0.0
+        with patch('src.core.rate_limit.asyncio.sleep', new=AsyncMock()) as mock_sleep:
+            reservation = await limiter.acquire(0, 0)
+        mock_sleep.assert_awaited_once()
+        self.assertAlmostEqual(reservation['wait'], 1.0, delta=0.05)
+
+    async def test_release_can_keep_the_request(self):
+        """A request the API answered keeps its RPM charge when its tokens are refunded"""
+        limiter = RateLimiter(requests_per_minute=10, input_tokens_per_minute=1000)
+        limiter.release(limiter.reserve(100, 0), keep_request=True)
+        self.assertAlmostEqual(limiter.buckets['requests'].balance, 9, delta=0.01)
+        self.assertAlmostEqual(limiter.buckets['input_tokens'].balance, 1000, delta=1)
+        limiter.release(limiter.reserve(100, 0))
+        self.assertAlmostEqual(limiter.buckets['requests'].balance, 9, delta=0.01)
+
+
+class TestClaudeCoreRateLimit(unittest.IsolatedAsyncioTestCase):
+    """Test cases for ClaudeCore admission through the limiter"""
+
+    def make_claude(self, limiter, failures=()):
+        async def event_stream():
+            yield Mock(type="content_block_delta", delta=Mock(text="ok"))
+
+        outcomes = list(failures)
+
+        async def create(**kwargs):
+            if outcomes:
+                raise outcomes.pop(0)
+            return event_stream()
+
+        async_client = Mock()
+        async_client.messages.create = AsyncMock(side_effect=create)
+        return ClaudeCore(api_key="test-api-key", async_client=async_client, rate_limiter=limiter,
+                          resilience=ResilienceLayer(base_delay=0.0))
+
+    async def test_wait_is_reported(self):
+        """The queued time is returned in response_data"""
+        limiter = RateLimiter(requests_per_minute=60)
+        claude = self.make_claude(limiter)
+        with patch('src.core.rate_limit.asyncio.sleep', new=AsyncMock()):
+            first = await claude.achat("one", use_code_execution=False)
+            limiter.buckets['requests'].balance = 0.0
+            second = await claude.achat("two", use_code_execution=False)
+        self.assertEqual(first['rate_limit_wait'], 0.0)
+        self.assertGreater(second['rate_limit_wait'], 0.5)
+
+    async def test_rejection_is_friendly(self):
+        """A full queue returns an unavailable response without calling the API"""
+        limiter = RateLimiter(requests_per_minute=1, max_wait_seconds=1)
+        claude = self.make_claude(limiter)
+        await claude.achat("one", use_code_execution=False)
+        response = await claude.achat("two", use_code_execution=False)
+        self.assertTrue(response['unavailable'])
+        self.assertIn("lot of requests", response['assistant_message'])
+        self.assertEqual(claude.async_client.messages.create.call_count, 1)
+
+    async def test_every_attempt_is_charged(self):
+        """A retried request is charged per attempt; the failed attempt's tokens are refunded"""
+        limiter = RateLimiter(requests_per_minute=60, input_tokens_per_minute=100000)
+        overloaded = anthropic.APIStatusError("overloaded", response=Mock(status_code=529, headers={}), body=None)
+        claude = self.make_claude(limiter, [overloaded])
+        response = await claude.achat("one", use_code_execution=False)
+
+        self.assertEqual(response['assistant_message'], "ok")
+        self.assertEqual(claude.async_client.messages.create.call_count, 2)
+        self.assertAlmostEqual(limiter.buckets['requests'].balance, 58, delta=0.1)
+        self.assertEqual(limiter.get_stats()['admitted'], 2)
+
+    async def test_failure_before_sending_releases_budget(self):
+        """A request that fails locally before reaching the API gives its budget back"""
+        limiter = RateLimiter(requests_per_minute=60, input_tokens_per_minute=100000)
+        claude = self.make_claude(limiter, [RuntimeError("could not build request")])
+        response = await claude.achat("one", use_code_execution=False)
+
+        self.assertIn("could not build request", response['assistant_message'])
+        self.assertAlmostEqual(limiter.buckets['requests'].balance, 60, delta=0.1)
+        self.assertAlmostEqual(limiter.buckets['input_tokens'].balance, 100000, delta=1)
+
+    async def test_cancelled_attempt_releases_budget(self):
+        """Cancelling an attempt waiting on the API (/cancel, a losing hedge) gives its budget back"""
+        limiter = RateLimiter(requests_per_minute=60, input_tokens_per_minute=100000)
+        sent = asyncio.Event()
+
+        async def create(**kwargs):
+            sent.set()
+            await asyncio.sleep(10)
+
+        claude = self.make_claude(limiter)
+        claude.async_client.messages.create = AsyncMock(side_effect=create)
+        turn = asyncio.ensure_future(claude.achat("one", use_code_execution=False))
+        await sent.wait()
+        self.assertLess(limiter.buckets['requests'].balance, 60)
+
+        turn.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await turn
+        self.assertAlmostEqual(limiter.buckets['requests'].balance, 60, delta=0.1)
+        self.assertAlmostEqual(limiter.buckets['input_tokens'].balance, 100000, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test suite for retry, hedging and circuit breaking around API calls
+"""
+
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+import anthropic
+from src.core import ClaudeCore
+from src.core.resilience import (
+    CircuitBreaker, CircuitOpenError, ResilienceLayer, RetryBudget, is_retryable, retry_after_seconds
+)
+
+
+def status_error(status_code, headers=None):
+    """Build an APIStatusError with the given status and headers"""
+    response = Mock(status_code=status_code, headers=headers or {})
+    return anthropic.APIStatusError("upstream error", response=response, body=None)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test cases for retry classification and backoff"""
+
+    def test_retryable_errors(self):
+        """Overloaded, 5xx, 429 and connection errors are retried; 400 is not"""
+        self.assertTrue(is_retryable(status_error(529)))
+        self.assertTrue(is_retryable(status_error(503)))
+        self.assertTrue(is_retryable(status_error(429)))
+        self.assertTrue(is_retryable(anthropic.APIConnectionError(request=Mock())))
+        self.assertFalse(is_retryable(status_error(400)))
+        self.assertFalse(is_retryable(ValueError("bug")))
+
+    def test_backoff_honors_retry_after(self):
+        """retry-after wins over computed backoff, capped at max_delay"""
+        layer = ResilienceLayer(max_delay=5.0)
+        self.assertEqual(retry_after_seconds(status_error(429, {'retry-after-ms': '1500'})), 1.5)
+        self.assertEqual(layer.backoff_delay(status_error(429, {'retry-after': '2'}), 1), 2.0)
+        self.assertEqual(layer.backoff_delay(status_error(429, {'retry-after': '60'}), 1), 5.0)
+        for attempt in range(1, 6):
+            self.assertLessEqual(layer.backoff_delay(status_error(529), attempt), min(5.0, 0.5 * 2 ** (attempt - 1)))
+
+    @patch('src.core.resilience.time.sleep')
+    def test_retries_then_succeeds(self, mock_sleep):
+        """Transient failures are retried until a call succeeds"""
+        layer = ResilienceLayer(max_attempts=4)
+        fn = Mock(side_effect=[status_error(529), status_error(500), "ok"])
+
+        self.assertEqual(layer.call(fn), "ok")
+        self.assertEqual(fn.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        stats = layer.get_stats()
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(stats['retry_reasons'], {'529': 1, '500': 1})
+
+    @patch('src.core.resilience.time.sleep')
+    def test_non_retryable_error_raises_immediately(self, mock_sleep):
+        """Client errors are not retried"""
+        layer = ResilienceLayer()
+        fn = Mock(side_effect=status_error(400))
+        with self.assertRaises(anthropic.APIStatusError):
+            layer.call(fn)
+        self.assertEqual(fn.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    @patch('src.core.resilience.time.sleep')
+    def test_retry_budget_limits_retries(self, mock_sleep):
+        """Once the budget is spent, failures are returned without retrying"""
+        layer = ResilienceLayer(max_attempts=10, retry_budget=RetryBudget(ratio=0.0, min_retries=2),
+                                breaker=CircuitBreaker(failure_threshold=100))
+        fn = Mock(side_effect=status_error(529))
+        with self.assertRaises(anthropic.APIStatusError):
+            layer.call(fn)
+        self.assertEqual(fn.call_count, 3)
+        self.assertEqual(layer.get_stats()['budget_exhausted'], 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the circuit breaker"""
+
+    @patch('src.core.resilience.time.sleep')
+    def test_opens_and_fails_fast(self, mock_sleep):
+        """After enough failures calls are rejected without reaching upstream"""
+        layer = ResilienceLayer(max_attempts=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30))
+        fn = Mock(side_effect=status_error(503))
+        for _ in range(2):
+            with self.assertRaises(anthropic.APIStatusError):
+                layer.call(fn)
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            layer.call(fn)
+        self.assertEqual(fn.call_count, 2)
+        self.assertGreater(raised.exception.retry_in, 0)
+        stats = layer.get_stats()['breaker']
+        self.assertEqual(stats['state'], 'open')
+        self.assertEqual(stats['opens'], 1)
+        self.assertEqual(stats['rejected'], 1)
+
+    def test_half_open_probe_closes(self):
+        """One probe is let through after the timeout; success closes the breaker"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_local_error_does_not_close_half_open_breaker(self):
+        """A probe that fails before reaching upstream frees the probe slot without closing"""
+        layer = ResilienceLayer(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0))
+        layer.breaker.record_failure()
+        with self.assertRaises(RuntimeError):
+            layer.call(Mock(side_effect=RuntimeError("rate limit queue full")))
+        self.assertEqual(layer.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(layer.breaker.allow())
+
+
+class TestHedging(unittest.IsolatedAsyncioTestCase):
+    """Test cases for hedged connect attempts"""
+
+    async def test_slow_attempt_is_hedged(self):
+        """A second attempt starts after hedge_delay and the faster one wins"""
+        layer = ResilienceLayer(hedge_delay=0.01)
+        delays = [0.5, 0.0]
+
+        async def connect():
+            delay = delays.pop(0)
+            await asyncio.sleep(delay)
+            return delay
+
+        self.assertEqual(await layer.acall(connect, hedge=True), 0.0)
+        stats = layer.get_stats()
+        self.assertEqual(stats['hedges_started'], 1)
+        self.assertEqual(stats['hedges_won'], 1)
+
+    async def test_fast_attempt_is_not_hedged(self):
+        """No hedge is sent when the first attempt answers in time"""
+        layer = ResilienceLayer(hedge_delay=1.0)
+        fn = AsyncMock(return_value="ok")
+        self.assertEqual(await layer.acall(fn, hedge=True), "ok")
+        self.assertEqual(fn.call_count, 1)
+        self.assertEqual(layer.get_stats()['hedges_started'], 0)
+
+
+class TestClaudeCoreResilience(unittest.IsolatedAsyncioTestCase):
+    """Test cases for ClaudeCore's use of the resilience layer"""
+
+    async def test_connect_failure_is_retried(self):
+        """An overloaded connect is retried and the turn completes"""
+        async def event_stream():
+            yield Mock(type="content_block_delta", delta=Mock(text="recovered"))
+
+        async_client = Mock()
+        async_client.messages.create = AsyncMock(side_effect=[status_error(529), event_stream()])
+        claude = ClaudeCore(api_key="test-api-key", async_client=async_client,
+                            resilience=ResilienceLayer(base_delay=0.0))
+
+        response = await claude.achat("Hello", use_code_execution=False)
+
+        self.assertEqual(response['assistant_message'], "recovered")
+        self.assertEqual(claude.resilience.get_stats()['retries'], 1)
+
+    async def test_open_circuit_gives_friendly_response(self):
+        """An open breaker returns an unavailable response without calling the API"""
+        async_client = Mock()
+        async_client.messages.create = AsyncMock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        claude = ClaudeCore(api_key="test-api-key", async_client=async_client,
+                            resilience=ResilienceLayer(breaker=breaker))
+
+        response = await claude.achat("Hello")
+
+        self.assertTrue(response['unavailable'])
+        self.assertIn("temporarily unavailable", response['assistant_message'])
+        self.assertGreater(response['retry_in'], 0)
+        async_client.messages.create.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
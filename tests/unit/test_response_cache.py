@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test suite for the tool-free response cache
+"""
+
+import unittest
+from unittest.mock import patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.response_cache import ResponseCache, normalize_prompt, context_fingerprint
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ResponseCache"""
+    
+    def setUp(self):
+        """Set up a small cache"""
+        self.cache = ResponseCache(max_entries=2, ttl_seconds=60, max_bytes=10000)
+    
+    def test_normalize_prompt(self):
+        """Test case, whitespace and trailing punctuation are ignored"""
+        self.assertEqual(normalize_prompt("  What is  GST?? "), "what is gst")
+        self.assertEqual(normalize_prompt("what is gst"), "what is gst")
+    
+    def test_key_depends_on_model_files_and_context(self):
+        """Test each key component changes the key"""
+        base = ResponseCache.make_key("model-a", "What is GST?", ["f1", "f2"], "ctx")
+        self.assertEqual(base, ResponseCache.make_key("model-a", "what is gst", ["f2", "f1"], "ctx"))
+        self.assertNotEqual(base, ResponseCache.make_key("model-b", "What is GST?", ["f1", "f2"], "ctx"))
+        self.assertNotEqual(base, ResponseCache.make_key("model-a", "What is GST?", ["f1"], "ctx"))
+        self.assertNotEqual(base, ResponseCache.make_key("model-a", "What is GST?", ["f1", "f2"], "other"))
+        self.assertEqual(base, ResponseCache.make_key("model-a", "What is GST?", ["f1", "f2"], "ctx", ""))
+        self.assertNotEqual(base, ResponseCache.make_key("model-a", "What is GST?", ["f1", "f2"], "ctx", "ns"))
+    
+    def test_context_fingerprint(self):
+        """Test the fingerprint only looks at recent history"""
+        history = [{"role": "user", "content": f"q{i}"} for i in range(10)]
+        self.assertEqual(context_fingerprint(history), context_fingerprint(history[-4:]))
+        self.assertNotEqual(context_fingerprint(history), context_fingerprint(history[:-1]))
+        self.assertEqual(context_fingerprint([]), context_fingerprint([]))
+    
+    def test_hit_miss_and_copy(self):
+        """Test hits return independent copies and counters update"""
+        self.assertIsNone(self.cache.get("k"))
+        self.cache.put("k", {"assistant_message": "answer"})
+        result = self.cache.get("k")
+        result["assistant_message"] = "mutated"
+        self.assertEqual(self.cache.get("k")["assistant_message"], "answer")
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        self.cache.put("a", {"assistant_message": "1"})
+        self.cache.put("b", {"assistant_message": "2"})
+        self.cache.get("a")
+        self.cache.put("c", {"assistant_message": "3"})
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.evictions, 1)
+    
+    def test_ttl_expiry(self):
+        """Test entries expire after their TTL"""
+        with patch('src.core.response_cache.time.monotonic', return_value=1000.0):
+            self.cache.put("k", {"assistant_message": "answer"})
+        with patch('src.core.response_cache.time.monotonic', return_value=1061.0):
+            self.assertIsNone(self.cache.get("k"))
+        self.assertEqual(self.cache.expirations, 1)
+        self.assertEqual(len(self.cache), 0)
+    
+    def test_size_cap(self):
+        """Test oversized entries are rejected and the byte cap is enforced"""
+        self.assertFalse(self.cache.put("big", {"assistant_message": "x" * 20000}))
+        cache = ResponseCache(max_entries=100, ttl_seconds=60, max_bytes=300)
+        for i in range(5):
+            cache.put(str(i), {"assistant_message": "y" * 100})
+        self.assertLessEqual(cache.current_bytes, 300)
+        self.assertLess(len(cache), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
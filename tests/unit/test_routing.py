@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test suite for quick/analysis model routing
+"""
+
+import unittest
+from unittest.mock import Mock, patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core.routing import ModelRouter, ROUTE_QUICK, ROUTE_ANALYSIS, estimate_cost
+
+
+class TestModelRouter(unittest.TestCase):
+    """Test cases for ModelRouter"""
+
+    def setUp(self):
+        self.router = ModelRouter(quick_model="quick-model", analysis_model="big-model", enabled=True)
+
+    def test_classification(self):
+        """Cheap heuristics separate trivial turns from analysis"""
+        cases = [
+            ("thanks!", True, None, False, (ROUTE_QUICK, 'chit_chat')),
+            ("Good morning", True, None, True, (ROUTE_QUICK, 'chit_chat')),
+            ("What is the capital of France?", True, None, False, (ROUTE_QUICK, 'simple')),
+            ("hi", True, [{"file_id": "f1", "file_name": "a.csv"}], False, (ROUTE_ANALYSIS, 'attachments')),
+            ("Plot revenue by month", True, None, False, (ROUTE_ANALYSIS, 'keywords')),
+            ("what does sorted(x) return", True, None, False, (ROUTE_ANALYSIS, 'code')),
+            ("and for Q3?", True, None, True, (ROUTE_ANALYSIS, 'follow_up')),
+            ("x" * 500, True, None, False, (ROUTE_ANALYSIS, 'length')),
+        ]
+        for text, use_code, files, file_context, expected in cases:
+            with self.subTest(text=text[:30]):
+                self.assertEqual(self.router.classify(text, use_code, files, file_context), expected)
+
+    def test_nocode_keywords_stay_quick(self):
+        """Analysis keywords alone do not force the big model for /nocode turns"""
+        self.assertEqual(self.router.classify("explain what a median is", False), (ROUTE_QUICK, 'simple'))
+
+    def test_override_and_disabled(self):
+        """A conversation override wins; disabled routing always picks analysis"""
+        self.assertEqual(self.router.select("thanks", True, override=ROUTE_ANALYSIS)[:2], ("big-model", ROUTE_ANALYSIS))
+        disabled = ModelRouter(quick_model="quick-model", analysis_model="big-model", enabled=False)
+        self.assertEqual(disabled.select("thanks", True)[1:], (ROUTE_ANALYSIS, 'routing_disabled'))
+
+    def test_stats(self):
+        """Per-route turns, latency and cost are tracked"""
+        self.router.select("thanks", True)
+        self.router.record(ROUTE_QUICK, "claude-3-5-haiku-20241022", 0.4,
+                           {"input_tokens": 1000, "output_tokens": 100})
+        stats = self.router.get_stats()['routes'][ROUTE_QUICK]
+        self.assertEqual(stats['turns'], 1)
+        self.assertEqual(stats['reasons'], {'chit_chat': 1})
+        self.assertEqual(stats['p50_latency_seconds'], 0.4)
+        self.assertAlmostEqual(stats['cost_usd'], 0.0012)
+
+    def test_estimate_cost(self):
+        """Cache reads and writes are priced relative to input tokens"""
+        usage = {"input_tokens": 0, "output_tokens": 0,
+                 "cache_creation_input_tokens": 1_000_000, "cache_read_input_tokens": 1_000_000}
+        self.assertAlmostEqual(estimate_cost("claude-opus-4-20250514", usage), 15 * 1.25 + 1.5)
+
+
+class TestClaudeCoreRouting(unittest.TestCase):
+    """Test cases for routing inside ClaudeCore"""
+
+    @patch('src.core.claude_core.Anthropic')
+    def test_chat_uses_routed_model(self, mock_anthropic_class):
+        """chat() sends each turn to the routed model and records the route"""
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        mock_client.messages.create.side_effect = lambda **kwargs: [
+            Mock(type="content_block_delta", delta=Mock(text="ok"))
+        ]
+        router = ModelRouter(quick_model="quick-model", analysis_model="big-model", enabled=True)
+        claude = ClaudeCore(api_key="test-api-key", router=router)
+
+        quick = claude.chat("thanks")
+        analysis = claude.chat("calculate the average of 3, 5 and 8")
+        claude.set_route_override(ROUTE_ANALYSIS)
+        pinned = claude.chat("thanks")
+
+        models = [call[1]['model'] for call in mock_client.messages.create.call_args_list]
+        self.assertEqual(models, ["quick-model", "big-model", "big-model"])
+        self.assertEqual((quick['route'], analysis['route'], pinned['route']),
+                         (ROUTE_QUICK, ROUTE_ANALYSIS, ROUTE_ANALYSIS))
+        self.assertEqual(router.get_stats()['routes'][ROUTE_ANALYSIS]['turns'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test suite for ChatResult and the dispatch-table stream processor
+"""
+
+import unittest
+import copy
+from types import SimpleNamespace as NS
+from unittest.mock import Mock
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.stream_processor import ChatResult, StreamProcessor
+
+
+class TestChatResult(unittest.TestCase):
+    """Test cases for the dict-compatible ChatResult"""
+
+    def test_mapping_interface(self):
+        """Item access, get(), iteration and equality behave like the old dict"""
+        result = ChatResult(assistant_message="hi", model="m")
+        self.assertEqual(result['assistant_message'], "hi")
+        self.assertEqual(result.get('tool_used'), None)
+        self.assertEqual(result.get('missing', 'default'), 'default')
+        self.assertIn('generated_figures', result)
+        self.assertEqual(dict(result), result.to_dict())
+        self.assertEqual(result, result.to_dict())
+
+        result['cached'] = True
+        self.assertTrue(result.cached)
+
+    def test_fixed_keys(self):
+        """Unknown keys are rejected and instances carry no __dict__"""
+        result = ChatResult()
+        with self.assertRaises(KeyError):
+            result['typo'] = 1
+        with self.assertRaises(KeyError):
+            result['typo']
+        self.assertFalse(hasattr(result, '__dict__'))
+
+    def test_defaults_are_not_shared(self):
+        """Mutable defaults are fresh per instance and deep-copyable"""
+        first, second = ChatResult(), ChatResult()
+        first.generated_figures.append({"figure_name": "a.png"})
+        self.assertEqual(second.generated_figures, [])
+        clone = copy.deepcopy(first)
+        self.assertEqual(clone, first)
+        self.assertIsNot(clone.generated_figures, first.generated_figures)
+
+
+class TestStreamProcessor(unittest.TestCase):
+    """Test cases for StreamProcessor"""
+
+    def test_typed_events(self):
+        """SDK-style typed deltas are dispatched without attribute probing"""
+        result = ChatResult()
+        progress = []
+        processor = StreamProcessor(result, lambda kind, text: progress.append((kind, text)))
+        events = [
+            NS(type="message_start", message=NS(usage=NS(input_tokens=12, output_tokens=1))),
+            NS(type="content_block_start", content_block=NS(type="text")),
+            NS(type="content_block_delta", delta=NS(type="text_delta", text="Let me check. ")),
+            NS(type="content_block_stop"),
+            NS(type="content_block_start", content_block=NS(type="server_tool_use", name="code_execution")),
+            NS(type="content_block_delta", delta=NS(type="input_json_delta", partial_json='{"code": "print(1)"}')),
+            NS(type="content_block_stop"),
+            NS(type="server_tool_result", result=NS(stdout="1\nFigure saved to: /tmp/out/plot.png", stderr="")),
+            NS(type="message_delta", usage=NS(output_tokens=40)),
+            NS(type="message_stop")
+        ]
+        for event in events:
+            processor.process(event)
+
+        self.assertEqual(result.usage['input_tokens'], 12)
+        self.assertEqual(result.usage['output_tokens'], 40)
+        self.assertEqual(result.tool_used, "code_execution")
+        self.assertEqual(result.executed_code, "print(1)")
+        self.assertEqual(result.code_output, "1\nFigure saved to: /tmp/out/plot.png")
+        self.assertEqual(result.generated_figures, [{"figure_name": "plot.png", "path_or_url": "/tmp/out/plot.png"}])
+        self.assertTrue(processor.assistant_message.startswith("Let me check. \n\n[Executed code:"))
+        self.assertIn("[Code Output]:", processor.assistant_message)
+        self.assertEqual(progress, [("text", "Let me check. "), ("code_start", ""), ("code", "print(1)")])
+
+    def test_web_search_hook(self):
+        """Finished searches are parsed through the hook and recorded"""
+        result = ChatResult()
+        hook = Mock(return_value=[{"title": "T", "url": "u", "snippet": ""}])
+        processor = StreamProcessor(result, search_hook=hook)
+        block = Mock(type="server_tool_use")
+        block.name = "web_search"
+        for event in [
+            Mock(type="content_block_start", content_block=block),
+            Mock(type="content_block_delta", delta=Mock(spec=['partial_json'], partial_json='{"query": "weather"}')),
+            Mock(type="server_tool_result", result=Mock(content='[{"title": "T"}]'))
+        ]:
+            processor.process(event)
+
+        hook.assert_called_once_with("weather", '[{"title": "T"}]')
+        self.assertEqual(result.web_searches, [{"query": "weather", "results": hook.return_value}])
+        self.assertEqual(result.tool_used, "web_search")
+
+    def test_unknown_events_ignored(self):
+        """Event types without a handler are skipped"""
+        processor = StreamProcessor(ChatResult())
+        processor.process(NS(type="ping"))
+        self.assertEqual(processor.assistant_message, "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test suite for progressive in-place Teams message updates
+"""
+
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from botbuilder.core import MessageFactory
+from src.bot.streaming import StreamingResponder, StreamingStats
+
+
+class TestStreamingResponder(unittest.IsolatedAsyncioTestCase):
+    """Test cases for StreamingResponder"""
+
+    def setUp(self):
+        """Set up a mock turn context"""
+        self.turn_context = Mock()
+        self.turn_context.send_activity = AsyncMock(return_value=Mock(id="activity-1"))
+        self.turn_context.update_activity = AsyncMock()
+        self.stats = StreamingStats()
+
+    async def test_placeholder_posted_on_first_delta(self):
+        """First text delta posts a placeholder and records time to first token"""
+        responder = StreamingResponder(self.turn_context, self.stats, min_update_interval=0.01)
+        responder.on_progress("text", "Hello")
+        await asyncio.sleep(0)
+
+        self.turn_context.send_activity.assert_awaited_once()
+        placeholder = self.turn_context.send_activity.call_args[0][0]
+        self.assertIn("Hello", placeholder.text)
+        self.assertEqual(responder.activity_id, "activity-1")
+        self.assertIsNotNone(responder.first_visible_seconds)
+
+        await responder.finish(MessageFactory.text("Done"))
+        self.assertEqual(self.stats.get_stats()['time_to_first_visible_token']['samples'], 1)
+
+    def test_reset_discards_streamed_text(self):
+        """A reset (turn retried with the tool) clears the preview"""
+        responder = StreamingResponder(self.turn_context, self.stats)
+        responder._pump = Mock()
+        responder.on_progress("text", "I would need to run code")
+        responder.on_progress("reset", "")
+        responder.on_progress("text", "Running it now")
+        self.assertEqual(responder.render(), "Running it now ▌")
+
+    async def test_updates_are_throttled_and_final_swapped_in(self):
+        """Many deltas produce few updates; the final reply replaces the placeholder"""
+        responder = StreamingResponder(self.turn_context, self.stats, min_update_interval=0.05)
+        for i in range(50):
+            responder.on_progress("text", f"{i} ")
+            await asyncio.sleep(0.002)
+        responder.on_progress("code_start", "")
+        responder.on_progress("code", "print('x')")
+        await asyncio.sleep(0.08)
+
+        final = MessageFactory.text("Final answer")
+        await responder.finish(final)
+
+        updates = [call[0][0] for call in self.turn_context.update_activity.call_args_list]
+        self.assertLess(len(updates), 10)
+        self.assertTrue(any("print('x')" in (u.text or "") for u in updates[:-1]))
+        self.assertIs(updates[-1], final)
+        self.assertEqual(final.id, "activity-1")
+        self.turn_context.send_activity.assert_awaited_once()
+
+    async def test_no_deltas_sends_final_normally(self):
+        """Without any streamed content the final reply is sent as a new message"""
+        responder = StreamingResponder(self.turn_context, self.stats)
+        final = MessageFactory.text("Cached answer")
+        await responder.finish(final)
+
+        self.turn_context.send_activity.assert_awaited_once_with(final)
+        self.turn_context.update_activity.assert_not_called()
+        self.assertEqual(self.stats.streams_without_deltas, 1)
+
+    async def test_failed_update_falls_back_to_send(self):
+        """If the final in-place update fails the reply is still delivered"""
+        self.turn_context.update_activity = AsyncMock(side_effect=RuntimeError("not supported"))
+        responder = StreamingResponder(self.turn_context, self.stats, min_update_interval=10)
+        responder.on_progress("text", "partial")
+        await asyncio.sleep(0)
+
+        final = MessageFactory.text("Final")
+        await responder.finish(final)
+
+        self.assertEqual(self.turn_context.send_activity.await_count, 2)
+        self.assertIs(self.turn_context.send_activity.call_args[0][0], final)
+        self.assertEqual(self.stats.update_failures, 1)
+
+    async def test_cancel_replaces_placeholder_and_stops_updates(self):
+        """Cancelling swaps the placeholder for a notice and ends the update task"""
+        responder = StreamingResponder(self.turn_context, self.stats, min_update_interval=10)
+        responder.on_progress("text", "partial")
+        await asyncio.sleep(0)
+
+        await responder.cancel()
+
+        self.assertTrue(responder._pump.done())
+        self.assertIn("Cancelled", self.turn_context.update_activity.call_args[0][0].text)
+        self.turn_context.send_activity.assert_awaited_once()
+
+    async def test_cancel_without_placeholder_sends_nothing(self):
+        """Cancelling before anything was streamed posts no message"""
+        await StreamingResponder(self.turn_context, self.stats).cancel()
+        self.turn_context.send_activity.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test suite for local token estimation and the context window
+"""
+
+import unittest
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core.tokens import (
+    TOKEN_CACHE_KEY, TRUNCATION_NOTICE, cached_message_tokens, estimate_message_tokens,
+    fit_to_budget, input_budget_for_model
+)
+
+
+def turn(role, chars, marker=""):
+    """Build a history entry with roughly chars/4 tokens"""
+    text = marker + "x" * (chars - len(marker))
+    if role == "user":
+        return {"role": "user", "content": [{"type": "text", "text": text}]}
+    return {"role": role, "content": text}
+
+
+class TestTokenEstimation(unittest.TestCase):
+    """Test cases for the token estimator and fit_to_budget"""
+    
+    def test_estimate_is_cached_on_entry(self):
+        """Test estimates are computed once and stored on the entry"""
+        message = turn("user", 400)
+        tokens = cached_message_tokens(message)
+        self.assertEqual(tokens, estimate_message_tokens(message))
+        self.assertEqual(message[TOKEN_CACHE_KEY], tokens)
+        message['content'][0]['text'] = ""
+        self.assertEqual(cached_message_tokens(message), tokens)
+    
+    def test_file_blocks_have_fixed_cost(self):
+        """Test attachments count even though their content is not local"""
+        with_file = {"role": "user", "content": [
+            {"type": "text", "text": "hi"},
+            {"type": "file", "file": {"file_id": "file123"}}
+        ]}
+        self.assertGreater(estimate_message_tokens(with_file), 1000)
+    
+    def test_everything_fits(self):
+        """Test nothing is dropped when under budget"""
+        history = [turn("user", 40), turn("assistant", 40), turn("user", 40)]
+        window, info = fit_to_budget(history, 1000)
+        self.assertEqual(window, history)
+        self.assertEqual(info['dropped_messages'], 0)
+        self.assertFalse(info['truncated'])
+    
+    def test_drops_oldest_and_starts_on_user(self):
+        """Test the oldest turns go first and the window opens on a user turn"""
+        history = [turn("user", 400, "u0"), turn("assistant", 400, "a0"),
+                   turn("user", 400, "u1"), turn("assistant", 400, "a1"),
+                   turn("user", 400, "u2")]
+        window, info = fit_to_budget(history, 320)
+        self.assertEqual(window, history[2:])
+        self.assertEqual(info['dropped_messages'], 2)
+        self.assertEqual(window[0]['role'], "user")
+        self.assertLessEqual(info['estimated_tokens'], 320)
+    
+    def test_odd_budget_does_not_start_on_assistant(self):
+        """Test a budget that would open on an assistant turn skips it"""
+        history = [turn("user", 400), turn("assistant", 400),
+                   turn("user", 400), turn("assistant", 400), turn("user", 400)]
+        window, info = fit_to_budget(history, 230)
+        self.assertEqual(window, history[4:])
+        self.assertEqual(info['dropped_messages'], 4)
+    
+    def test_oversized_latest_turn_is_truncated(self):
+        """Test a single turn larger than the budget is truncated, not dropped"""
+        history = [turn("user", 400), turn("assistant", 400), turn("user", 40000)]
+        window, info = fit_to_budget(history, 1000)
+        self.assertTrue(info['truncated'])
+        self.assertEqual(len(window), 1)
+        text = window[0]['content'][0]['text']
+        self.assertTrue(text.endswith(TRUNCATION_NOTICE))
+        self.assertLessEqual(estimate_message_tokens(window[0]), 1000)
+        self.assertEqual(len(history[2]['content'][0]['text']), 40000)
+    
+    def test_summary_pair_is_pinned(self):
+        """Test a compaction summary stays at the head of the window"""
+        summary = [dict(turn("user", 200, "summary"), _summary=True),
+                   dict(turn("assistant", 40), _summary=True)]
+        history = summary + [turn("user", 400), turn("assistant", 400),
+                             turn("user", 400), turn("assistant", 400), turn("user", 400)]
+        window, info = fit_to_budget(history, 400)
+        self.assertEqual(window[:2], summary)
+        self.assertEqual(window[2:], history[4:])
+        self.assertEqual(info['dropped_messages'], 2)
+    
+    def test_input_budget_for_model(self):
+        """Test per-model budgets leave room for output and can be overridden"""
+        budget = input_budget_for_model("claude-opus-4-20250514", 4096)
+        self.assertLess(budget, 200000 - 4096)
+        os.environ['MAX_INPUT_TOKENS'] = "1234"
+        try:
+            self.assertEqual(input_budget_for_model("claude-opus-4-20250514"), 1234)
+        finally:
+            del os.environ['MAX_INPUT_TOKENS']
+
+
+if __name__ == '__main__':
+    unittest.main()
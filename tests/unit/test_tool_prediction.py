@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test suite for lazy code execution tool inclusion
+"""
+
+import unittest
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
+import os
+import sys
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+from src.core import ClaudeCore
+from src.core.tool_prediction import ToolPredictor
+
+
+def text_events(text, tool=False):
+    """Streaming events for a reply, optionally preceded by a code execution block"""
+    events = []
+    if tool:
+        block = Mock(type="server_tool_use")
+        block.name = "code_execution"
+        events.append(Mock(type="content_block_start", content_block=block))
+        events.append(Mock(type="content_block_stop"))
+    events.append(Mock(type="content_block_delta", delta=Mock(text=text)))
+    return events
+
+
+class TestToolPredictor(unittest.TestCase):
+    """Test cases for ToolPredictor"""
+
+    def setUp(self):
+        self.predictor = ToolPredictor(enabled=True)
+
+    def test_predict(self):
+        """Attachments, data terms, arithmetic and recent tool use keep the tool"""
+        cases = [
+            ("What's the capital of Peru?", None, None, (False, 'no_signal')),
+            ("thanks!", None, 5, (False, 'no_signal')),
+            ("summarize this", [{"file_id": "f1"}], None, (True, 'attachments')),
+            ("and the next one?", None, 0, (True, 'recent_tool_use')),
+            ("Plot the distribution", None, None, (True, 'data_terms')),
+            ("what is 1234 * 5678", None, None, (True, 'data_terms')),
+        ]
+        for text, files, since, expected in cases:
+            with self.subTest(text=text):
+                self.assertEqual(self.predictor.predict(text, files, since), expected)
+
+    def test_needs_tool(self):
+        """Answers asking for computation trigger a retry with the tool"""
+        self.assertTrue(self.predictor.needs_tool("To be exact I would need to run the numbers."))
+        self.assertTrue(self.predictor.needs_tool("I can't execute code in this mode."))
+        self.assertFalse(self.predictor.needs_tool("Lima is the capital of Peru."))
+        self.assertFalse(ToolPredictor(enabled=True, auto_retry=False).needs_tool("I can't execute code."))
+
+    def test_disabled_always_includes(self):
+        """With prediction disabled the tool is always sent"""
+        self.assertEqual(ToolPredictor(enabled=False).predict("hello"), (True, 'prediction_disabled'))
+
+
+class TestClaudeCoreLazyTools(unittest.TestCase):
+    """Test cases for lazy tool inclusion in ClaudeCore"""
+
+    def make_claude(self, mock_anthropic_class, replies):
+        mock_client = Mock()
+        mock_anthropic_class.return_value = mock_client
+        mock_client.messages.create.side_effect = replies
+        predictor = ToolPredictor(enabled=True)
+        return ClaudeCore(api_key="test-api-key", tool_predictor=predictor), mock_client, predictor
+
+    @patch('src.core.claude_core.Anthropic')
+    def test_tool_omitted_for_plain_question(self, mock_anthropic_class):
+        """A plain question is sent without tools and counts as an avoided sandbox"""
+        claude, client, predictor = self.make_claude(mock_anthropic_class, [text_events("Lima.")])
+
+        response = claude.chat("What's the capital of Peru?")
+
+        self.assertEqual(response['assistant_message'], "Lima.")
+        self.assertNotIn('tools', client.messages.create.call_args[1])
+        self.assertEqual(predictor.get_stats()['sandboxes_avoided'], 1)
+
+    @patch('src.core.claude_core.Anthropic')
+    def test_retry_with_tool_when_computation_requested(self, mock_anthropic_class):
+        """A tool-free answer that asks to compute is retried with the tool"""
+        claude, client, predictor = self.make_claude(mock_anthropic_class, [
+            text_events("I would need to run this to be sure."),
+            text_events("It is 42.", tool=True)
+        ])
+
+        response = claude.chat("How many Sundays were there in 1987?")
+
+        calls = client.messages.create.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertNotIn('tools', calls[0][1])
+        self.assertEqual(calls[1][1]['tools'][0]['name'], "code_execution")
+        self.assertEqual(calls[0][1]['messages'], calls[1][1]['messages'])
+        self.assertTrue(response["assistant_message"].endswith("It is 42."))
+        self.assertEqual(response['tool_used'], "code_execution")
+        self.assertEqual(len(claude.conversation_history), 2)
+        self.assertEqual(predictor.get_stats()['retries_with_tool'], 1)
+        self.assertEqual(claude.turns_since_tool_use, 0)
+
+    @patch('src.core.claude_core.Anthropic')
+    def test_nocode_is_not_retried(self, mock_anthropic_class):
+        """/nocode turns never get the tool, even when the answer asks for it"""
+        claude, client, predictor = self.make_claude(mock_anthropic_class, [text_events("I can't execute code.")])
+
+        claude.chat("Explain recursion", use_code_execution=False)
+
+        self.assertEqual(client.messages.create.call_count, 1)
+        self.assertEqual(predictor.get_stats()['omitted'], 0)
+
+    @patch('src.core.claude_core.AsyncAnthropic')
+    def test_achat_retry_resets_progress(self, mock_async_anthropic_class):
+        """achat tells the UI to discard the tool-free preview before retrying"""
+        async def stream(events):
+            for event in events:
+                yield event
+
+        mock_async_client = Mock()
+        mock_async_anthropic_class.return_value = mock_async_client
+        mock_async_client.messages.create = AsyncMock(side_effect=[
+            stream(text_events("I would need to calculate that.")),
+            stream(text_events("Done.", tool=True))
+        ])
+        progress = []
+        claude = ClaudeCore(api_key="test-api-key", tool_predictor=ToolPredictor(enabled=True))
+
+        response = asyncio.run(claude.achat("How far is it?", on_progress=lambda k, t: progress.append(k)))
+
+        self.assertTrue(response["assistant_message"].endswith("Done."))
+        self.assertIn("reset", progress)
+        self.assertLess(progress.index("reset"), progress.index("code_start"))
+
+
+if __name__ == '__main__':
+    unittest.main()